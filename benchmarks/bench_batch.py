@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / 'chapters'))
+import argparse
+import multiprocessing
+import time
+from multiprocessing import Pool
+import chap07
+import pattern_test_Ch10
+
+
+def run(jobs=12, workers=4, width=40, height=20):
+    # Times a batch of small renders with a new pool of workers for every job against one pool shared by the batch
+    scenes = [module.build_scene(width, height) for module in (chap07, pattern_test_Ch10)] * (jobs // 2)
+
+    start = time.perf_counter()
+    separate = [camera.render(world, workers=workers) for world, camera in scenes]
+    separate_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        shared = [camera.render(world, workers=workers, pool=pool) for world, camera in scenes]
+    shared_seconds = time.perf_counter() - start
+
+    identical = all((a.pixels == b.pixels).all() for a, b in zip(separate, shared))
+    print(f'{len(scenes)} jobs of {width}x{height} with {workers} {multiprocessing.get_start_method()} workers')
+    print(f'pool per job: {separate_seconds:.3f} s ({separate_seconds / len(scenes) * 1000:.1f} ms per job)')
+    print(f'shared pool:  {shared_seconds:.3f} s ({shared_seconds / len(scenes) * 1000:.1f} ms per job)')
+    print(f'identical images: {identical}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batch rendering with a pool per job against one shared pool')
+    parser.add_argument('--jobs', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--width', type=int, default=40)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--start-method', choices=multiprocessing.get_all_start_methods(),
+                        help='how workers are started (spawn is the default on Windows and macOS)')
+    arguments = parser.parse_args()
+    if arguments.start_method is not None:
+        multiprocessing.set_start_method(arguments.start_method)
+    run(arguments.jobs, arguments.workers, arguments.width, arguments.height)
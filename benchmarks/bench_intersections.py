@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / 'chapters'))
+import argparse
+import importlib
+import time
+import tracemalloc
+from intersections import Intersection, IntersectionBuffer
+
+
+SCENES = ('chap08', 'chap10', 'chap11_water')
+
+
+def hit_from_lists(world, ray):
+    # The list-based path colour_at took before intersection buffers: a list of Intersection objects per shape,
+    # flattened and fully sorted for every ray
+    intersections = [obj.intersects(ray) for obj in world.candidates(ray)]
+    intersections = sorted(world.flatten(intersections), key=lambda x: x.t)
+    hits = [i for i in intersections if i.t >= 0]
+    if len(hits) == 0:
+        return None
+    return min(hits).prepare_computations(ray, intersections)
+
+
+def hit_from_buffer(world, ray):
+    buffer = world.intersect_world_into(ray, IntersectionBuffer.for_thread())
+    index = buffer.hit()
+    if index is None:
+        return None
+    order = buffer.sorted_indices(buffer.t[index] + world.EPSILON)
+    intersections = [Intersection(buffer.t[i], buffer.objects[i]) for i in order]
+    return intersections[order.index(index)].prepare_computations(ray, intersections)
+
+
+def measure(find_hit, world, rays):
+    # Seconds per ray, and the peak memory one ray allocates above what is already live, averaged over the rays. The
+    # first, untimed pass warms up caches so whichever path runs first isn't penalised.
+    for ray in rays:
+        find_hit(world, ray)
+    start = time.perf_counter()
+    for ray in rays:
+        find_hit(world, ray)
+    seconds = (time.perf_counter() - start) / len(rays)
+
+    tracemalloc.start()
+    peak = 0
+    for ray in rays:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        find_hit(world, ray)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return seconds, peak / len(rays)
+
+
+def run(scenes=SCENES, width=80, height=40):
+    print(f'{"scene":<16}{"path":<10}{"us/ray":>10}{"peak B/ray":>12}')
+    for scene in scenes:
+        world, camera = importlib.import_module(scene).build_scene(width, height)
+        world.prepare()
+        rays = list(camera.rays_for_image())
+        results = {label: measure(find_hit, world, rays)
+                   for label, find_hit in (('lists', hit_from_lists), ('buffer', hit_from_buffer))}
+        for label, (seconds, peak) in results.items():
+            print(f'{scene:<16}{label:<10}{seconds * 1e6:>10.1f}{peak:>12.0f}')
+        print(f'{"":<16}{"reduction":<10}{results["lists"][0] / results["buffer"][0]:>9.2f}x'
+              f'{results["lists"][1] / results["buffer"][1]:>11.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the list and buffer paths for finding each ray\'s hit')
+    parser.add_argument('scenes', nargs='*', help=f'scenes to use, from {", ".join(SCENES)} (default: all)')
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--height', type=int, default=40)
+    arguments = parser.parse_args()
+    run(arguments.scenes or SCENES, arguments.width, arguments.height)
@@ -0,0 +1,88 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from intersections import IntersectionBuffer
+from mesh import load_obj
+from rays import Ray
+from tuples import Point, Vector
+
+
+def write_sphere(file_name, triangles, normals=False):
+    # A unit UV sphere of about the given number of triangles, written as OBJ with or without vertex normals
+    n = max(2, int(round(np.sqrt(triangles / 4))))
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, n + 1), np.linspace(0, 2 * np.pi, 2 * n + 1), indexing='ij')
+    vertices = np.stack((np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)), axis=-1)
+    i, j = np.meshgrid(np.arange(n), np.arange(2 * n), indexing='ij')
+    a = (i * (2 * n + 1) + j).ravel() + 1
+    b, c = a + 1, a + 2 * n + 1
+    faces = np.concatenate((np.stack((a, c, b), axis=1), np.stack((b, c, c + 1), axis=1)))
+    with open(file_name, 'w') as f:
+        f.write('# generated UV sphere\n')
+        np.savetxt(f, vertices.reshape(-1, 3), fmt='v %.6f %.6f %.6f')
+        if normals:
+            np.savetxt(f, vertices.reshape(-1, 3), fmt='vn %.6f %.6f %.6f')
+            np.savetxt(f, np.repeat(faces, 2, axis=1), fmt='f %d//%d %d//%d %d//%d')
+        else:
+            np.savetxt(f, faces, fmt='f %d %d %d')
+    return len(faces)
+
+
+def mesh_size(mesh):
+    return sum(array.nbytes for array in (mesh.vertices, mesh.faces, mesh.triangles, mesh.normals, mesh.normal_faces)
+               if array is not None)
+
+
+def bvh_size(bvh):
+    # The node list and its tuples and floats, and the leaf order list; small ints are shared and not counted
+    floats = sum(sys.getsizeof(value) for node in bvh.nodes for value in node[:6])
+    return (sys.getsizeof(bvh.nodes) + sum(sys.getsizeof(node) for node in bvh.nodes) + floats
+            + sys.getsizeof(bvh.order) + sum(sys.getsizeof(index) for index in bvh.order if index > 256))
+
+
+def run(sizes=(1000, 10000, 100000, 1000000), rays=2000, normals=False):
+    print(f'{"triangles":>10}{"MB":>8}{"load s":>9}{"tri/s":>11}{"B/tri":>8}{"bvh s":>8}{"bvh B/tri":>10}'
+          f'{"us/ray":>9}{"tests/ray":>10}')
+    rng = np.random.default_rng(0)
+    origins = rng.uniform(-0.9, 0.9, (rays, 2)).tolist()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            file_name = os.path.join(directory, f'sphere{size}.obj')
+            count = write_sphere(file_name, size, normals)
+
+            start = time.perf_counter()
+            mesh = load_obj(file_name)
+            load_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            mesh.bvh()
+            bvh_seconds = time.perf_counter() - start
+            mesh_bytes = mesh_size(mesh)
+            bvh_bytes = bvh_size(mesh.bvh())
+
+            buffer = IntersectionBuffer()
+            tests = 0
+            start = time.perf_counter()
+            for x, y in origins:
+                ray = Ray(Point(x, y, -5), Vector(0, 0, 1))
+                buffer.clear()
+                mesh.intersects_into(ray, buffer)
+            ray_seconds = (time.perf_counter() - start) / rays
+            for x, y in origins[:200]:
+                tests += len(mesh.bvh().candidates(Ray(Point(x, y, -5), Vector(0, 0, 1))))
+            print(f'{count:>10}{os.path.getsize(file_name) / 1e6:>8.1f}{load_seconds:>9.2f}'
+                  f'{count / load_seconds:>11.0f}{mesh_bytes / count:>8.0f}{bvh_seconds:>8.2f}'
+                  f'{bvh_bytes / count:>10.0f}{ray_seconds * 1e6:>9.1f}{tests / min(rays, 200):>10.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='OBJ loading throughput, memory per triangle and mesh intersection '
+                                                 'time for UV spheres of increasing size')
+    parser.add_argument('sizes', nargs='*', type=int, help='triangle counts (default: 1000 10000 100000 1000000)')
+    parser.add_argument('--rays', type=int, default=2000)
+    parser.add_argument('--normals', action='store_true', help='write and load vertex normals')
+    arguments = parser.parse_args()
+    run(arguments.sizes or (1000, 10000, 100000, 1000000), arguments.rays, arguments.normals)
@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import argparse
+import tempfile
+import time
+import numpy as np
+import noisevolume
+from noise import pnoise3
+from noisevolume import NoiseVolume
+from patterns import PerturbedPattern, StripePattern, WHITE, BLACK
+from tuples import Point
+
+
+def per_point(pattern, points):
+    start = time.perf_counter()
+    for x, y, z in points.tolist():
+        pattern.pattern_at(Point(x, y, z))
+    return (time.perf_counter() - start) / len(points)
+
+
+def per_batch(pattern, points):
+    start = time.perf_counter()
+    pattern.pattern_at_batch(points)
+    return (time.perf_counter() - start) / len(points)
+
+
+def displacement_errors(volume, pattern, points):
+    # Largest and mean absolute difference between the baked and live displacements
+    settings = dict(octaves=pattern.octaves, persistence=pattern.persistence, lacunarity=pattern.lacunarity)
+    live = np.array([(pnoise3(x, y + 1, z + 1, **settings), pnoise3(x + 1, y, z + 1, **settings),
+                      pnoise3(x + 1, y + 1, z, **settings)) for x, y, z in points.tolist()]) * pattern.scale
+    error = np.abs(volume.displacement_batch(points) - live)
+    return error.max(), error.mean()
+
+
+def run(resolutions=(4, 8, 16), octaves=3, count=20000):
+    points = np.random.default_rng(0).uniform(-3.9, 3.9, (count, 3))
+    live = PerturbedPattern(StripePattern(WHITE, BLACK), octaves=octaves)
+    print(f'live pnoise3: {per_point(live, points) * 1e6:.2f} us per single point, '
+          f'{per_batch(live, points) * 1e6:.2f} us per point in a batch')
+    print(f'{"resolution":<12}{"bake s":>9}{"load s":>9}{"MB":>8}{"max err":>10}{"mean err":>10}{"point us":>10}'
+          f'{"batch us":>10}')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for resolution in resolutions:
+            pattern = PerturbedPattern(StripePattern(WHITE, BLACK), octaves=octaves)
+            start = time.perf_counter()
+            volume = pattern.bake(resolution, cache_dir=cache_dir)
+            bake_seconds = time.perf_counter() - start
+
+            # Forget the volume in memory so the second request has to load it from the disk cache
+            noisevolume._volumes.clear()
+            start = time.perf_counter()
+            NoiseVolume.for_pattern(pattern, resolution, cache_dir=cache_dir)
+            load_seconds = time.perf_counter() - start
+
+            largest, mean = displacement_errors(volume, pattern, points)
+            print(f'{resolution:<12}{bake_seconds:>9.2f}{load_seconds:>9.3f}{volume.values.nbytes / 1e6:>8.1f}'
+                  f'{largest:>10.5f}{mean:>10.5f}{per_point(pattern, points) * 1e6:>10.2f}'
+                  f'{per_batch(pattern, points) * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Accuracy and speed of baked noise volumes against live pnoise3')
+    parser.add_argument('resolutions', nargs='*', type=int, help='grid cells per unit (default: 4 8 16)')
+    parser.add_argument('--octaves', type=int, default=3)
+    parser.add_argument('--count', type=int, default=20000, help='number of sample points')
+    arguments = parser.parse_args()
+    run(arguments.resolutions or (4, 8, 16), arguments.octaves, arguments.count)
@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from canvas import Canvas
+
+
+SIZES = {'1k': (1000, 1000), '4k': (3840, 2160)}
+
+
+def time_write(write, file_name):
+    start = time.perf_counter()
+    write(file_name)
+    elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(file_name)
+
+
+def run(sizes=('1k', '4k')):
+    rng = np.random.default_rng(0)
+    print(f'{"size":<12}{"format":<10}{"seconds":>10}{"MB":>10}{"MB/s":>10}')
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'bench.ppm')
+        for size in sizes:
+            width, height = SIZES[size]
+            canvas = Canvas(width, height)
+            canvas.pixels[:] = rng.uniform(-0.1, 1.1, (height, width, 3))
+            for label, write in (('P3', canvas.canvas_to_ppm),
+                                 ('P6', lambda name: canvas.canvas_to_ppm(name, binary=True)),
+                                 ('PIL', canvas.write_to_ppm)):
+                elapsed, file_size = time_write(write, file_name)
+                megabytes = file_size / 1e6
+                print(f'{f"{width}x{height}":<12}{label:<10}{elapsed:>10.3f}{megabytes:>10.1f}{megabytes / elapsed:>10.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time PPM output for large canvases')
+    parser.add_argument('sizes', nargs='*', help=f'canvas sizes to write, from {", ".join(SIZES)} (default: all)')
+    arguments = parser.parse_args()
+    unknown = set(arguments.sizes) - set(SIZES)
+    if unknown:
+        parser.error(f'unknown sizes: {", ".join(sorted(unknown))}')
+    run(arguments.sizes or list(SIZES))
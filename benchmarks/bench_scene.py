@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import argparse
+import json
+import time
+import numpy as np
+from scene import SceneLoader
+
+
+def generate(count, seed=0):
+    # A scene of count spheres and cubes scattered over a plane, sharing a handful of named materials and a named
+    # base transform, with every fifth object given its own inline material
+    rng = np.random.default_rng(seed)
+    items = [
+        {'add': 'camera', 'width': 100, 'height': 50, 'field-of-view': 1.0, 'from': [0, 20, -60], 'to': [0, 0, 0],
+         'up': [0, 1, 0]},
+        {'add': 'light', 'at': [-50, 100, -50], 'intensity': [1, 1, 1]},
+        {'define': 'base', 'value': {'color': [1, 1, 1], 'diffuse': 0.7, 'specular': 0.2}},
+        {'define': 'small', 'value': [['scale', 0.2, 0.2, 0.2]]},
+        {'add': 'plane', 'material': {'pattern': {'type': 'checkers', 'colors': [[1, 1, 1], [0, 0, 0]]}}},
+    ]
+    names = []
+    for i in range(8):
+        names.append(f'material-{i}')
+        items.append({'define': names[-1], 'extend': 'base', 'value': {'color': rng.random(3).round(3).tolist()}})
+    positions = rng.uniform(-50, 50, (count, 2)).round(3).tolist()
+    for i, (x, z) in enumerate(positions):
+        item = {'add': 'sphere' if i % 2 else 'cube', 'transform': ['small', ['translate', x, 0.2, z]]}
+        item['material'] = {'color': [0.5, 0.5, 0.5], 'reflective': 0.3} if i % 5 == 0 else names[i % len(names)]
+        items.append(item)
+    return items
+
+
+def run(count=10000, repeat=3):
+    items = generate(count)
+    texts = {'json': json.dumps(items)}
+    try:
+        import yaml
+        texts['yaml'] = yaml.dump(items, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+    except ImportError:
+        print('PyYAML is not installed, so only the JSON scene is timed')
+
+    print(f'{count} objects')
+    print(f'{"format":<8}{"MB":>8}{"parse s":>10}{"build s":>10}{"total s":>10}{"bvh s":>10}')
+    for format, text in texts.items():
+        parse_seconds = []
+        build_seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = json.loads(text) if format == 'json' else yaml.load(text, Loader=getattr(yaml, 'CSafeLoader',
+                                                                                           yaml.SafeLoader))
+            parse_seconds.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            world, camera = SceneLoader().load(data)
+            build_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        world.prepare()
+        bvh_seconds = time.perf_counter() - start
+        print(f'{format:<8}{len(text) / 1e6:>8.2f}{min(parse_seconds):>10.3f}{min(build_seconds):>10.3f}'
+              f'{min(parse_seconds) + min(build_seconds):>10.3f}{bvh_seconds:>10.3f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time loading a large generated scene from JSON and YAML')
+    parser.add_argument('--count', type=int, default=10000, help='number of objects')
+    parser.add_argument('--repeat', type=int, default=3)
+    arguments = parser.parse_args()
+    run(arguments.count, arguments.repeat)
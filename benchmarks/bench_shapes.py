@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import argparse
+import time
+import numpy as np
+from intersections import IntersectionBuffer
+from matrices import Matrix
+from mesh import Mesh
+from primitives import Sphere, Plane, Cube, Cylinder, Cone, Triangle, SmoothTriangle, Group
+from rays import Ray
+from tuples import Point, Vector
+
+
+def closed(shape, minimum, maximum):
+    shape.minimum = minimum
+    shape.maximum = maximum
+    shape.closed = True
+    return shape
+
+
+def octahedron():
+    vertices = [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
+    faces = [(0, 2, 4), (2, 1, 4), (1, 3, 4), (3, 0, 4), (2, 0, 5), (1, 2, 5), (3, 1, 5), (0, 3, 5)]
+    return Mesh(vertices, faces)
+
+
+SHAPES = {
+    'sphere': Sphere,
+    'plane': Plane,
+    'cube': Cube,
+    'cylinder': lambda: closed(Cylinder(), -1, 1),
+    'cone': lambda: closed(Cone(), -1, 0),
+    'triangle': lambda: Triangle(Point(0, 1, 0), Point(-1, 0, 0), Point(1, 0, 0)),
+    'smooth-triangle': lambda: SmoothTriangle(Point(0, 1, 0), Point(-1, 0, 0), Point(1, 0, 0),
+                                              Vector(0, 1, 0), Vector(-1, 0, 0), Vector(1, 0, 0)),
+    'mesh': octahedron,
+    'group': lambda: Group([Sphere()]),
+}
+
+
+def make_rays(count, seed=0):
+    # Rays from a sphere of radius 5 towards points near the origin, so most of them hit
+    rng = np.random.default_rng(seed)
+    origins = rng.normal(size=(count, 3))
+    origins = 5 * origins / np.linalg.norm(origins, axis=1, keepdims=True)
+    directions = rng.uniform(-0.5, 0.5, (count, 3)) - origins
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    return [Ray(Point(*o), Vector(*d)) for o, d in zip(origins.tolist(), directions.tolist())]
+
+
+def best_of(repeat, function, items):
+    # Seconds per item of the fastest of several passes, since other work on the machine only ever adds time
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(items)
+        best = min(best, time.perf_counter() - start)
+    return best / max(len(items), 1)
+
+
+def run(shapes=tuple(SHAPES), count=20000, repeat=5):
+    # Microseconds per ray to intersect each shape, and per hit to prepare its computations (whose normal is where
+    # the object-space point is needed again)
+    rays = make_rays(count)
+    buffer = IntersectionBuffer()
+    print(f'{"shape":<16}{"rays/s":>10}{"us/ray":>9}{"us/hit":>9}{"hits":>7}')
+    for name in shapes:
+        shape = SHAPES[name]()
+        shape.transform = Matrix.translation(0.1, 0.2, 0.3) * Matrix.rotation_y(0.5) * Matrix.scaling(1.5, 1.5, 1.5)
+
+        def intersect(rays):
+            for ray in rays:
+                buffer.clear()
+                shape.intersects_into(ray, buffer)
+
+        def prepare(hits):
+            for ray, hit in hits:
+                hit.prepare_computations(ray)
+
+        intersect_seconds = best_of(repeat, intersect, rays)
+
+        hits = []
+        for ray in rays:
+            buffer.clear()
+            shape.intersects_into(ray, buffer)
+            index = buffer.hit()
+            if index is not None:
+                hits.append((ray, buffer.intersection(index)))
+        hit_seconds = best_of(repeat, prepare, hits)
+        print(f'{name:<16}{1 / intersect_seconds:>10.0f}{intersect_seconds * 1e6:>9.2f}{hit_seconds * 1e6:>9.2f}'
+              f'{len(hits) / len(rays):>7.0%}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Intersection throughput and hit preparation time per shape type')
+    parser.add_argument('shapes', nargs='*', help=f'shapes to measure, from {", ".join(SHAPES)} (default: all)')
+    parser.add_argument('--rays', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5, help='passes to take the fastest of (default: 5)')
+    arguments = parser.parse_args()
+    run(arguments.shapes or tuple(SHAPES), arguments.rays, arguments.repeat)
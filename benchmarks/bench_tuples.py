@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import timeit
+import tracemalloc
+from tuples import *
+from colours import Colour
+
+
+OPERATIONS = {
+    'Point()': 'Point(1.5, 2.5, 3.5)',
+    'Vector()': 'Vector(1.5, 2.5, 3.5)',
+    'Colour()': 'Colour(0.5, 0.25, 0.125)',
+    'point - point': 'p - q',
+    'point + vector': 'p + v',
+    'vector * scalar': 'v * 2.5',
+    '-vector': '-v',
+    'vector.dot': 'v.dot(u)',
+    'vector.mag': 'v.mag',
+    'vector.normalise': 'v.normalise()',
+    'vector.cross': 'v.cross(u)',
+    'vector.reflect': 'v.reflect(u)',
+    'colour + colour': 'c + d',
+    'colour * colour': 'c * d',
+    'colour * scalar': 'c * 0.5',
+}
+
+SETUP = {'p': Point(1, 2, 3), 'q': Point(-4, 5, 0.5), 'v': Vector(1, 2, 3), 'u': Vector(0, 1, 0),
+         'c': Colour(0.5, 0.25, 0.125), 'd': Colour(0.9, 0.8, 0.7), 'Point': Point, 'Vector': Vector,
+         'Colour': Colour}
+
+
+def time_operations(number=100000):
+    return {name: timeit.timeit(statement, globals=SETUP, number=number) / number * 1e9
+            for name, statement in OPERATIONS.items()}
+
+
+def bytes_per_object(factory, count=10000):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del objects
+    return allocated / count
+
+
+def run():
+    print(f'{"operation":<20}{"ns/op":>10}')
+    for name, nanoseconds in time_operations().items():
+        print(f'{name:<20}{nanoseconds:>10.0f}')
+
+    print()
+    print(f'{"object":<20}{"bytes":>10}')
+    for name, factory in (('Point', lambda i: Point(i, 2.0, 3.0)),
+                          ('Vector', lambda i: Vector(i, 2.0, 3.0)),
+                          ('Colour', lambda i: Colour(i, 0.5, 0.5))):
+        print(f'{name:<20}{bytes_per_object(factory):>10.0f}')
+
+
+if __name__ == '__main__':
+    run()
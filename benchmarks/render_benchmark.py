@@ -0,0 +1,177 @@
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / 'chapters'))
+import argparse
+import importlib
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from profiling import Profiler
+
+
+# Scene name -> (module in chapters/, reflection depth its run() renders with)
+SCENES = {
+    'chap07': ('chap07', 5),
+    'chap08': ('chap08', 5),
+    'chap09': ('chap09', 5),
+    'chap10': ('chap10', 5),
+    'chap11_image': ('chap11_image', 5),
+    'chap11_testing': ('chap11_testing', 8),
+    'chap11_water': ('chap11_water', 8),
+    'pattern_test_Ch10': ('pattern_test_Ch10', 1),
+}
+
+# Render phases and the profiler timings they are taken from
+PHASES = {
+    'ray_generation': 'ray_generation',
+    'intersection': 'intersect_world',
+    'shading': 'lighting',
+    'shadow': 'is_shadowed',
+    'pattern': 'pattern',
+}
+
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def build(scene, width, height):
+    module = importlib.import_module(SCENES[scene][0])
+    return module.build_scene(width, height)
+
+
+def benchmark(scene, width, height, depth=None, workers=None, repeat=5, min_seconds=2.0):
+    depth = SCENES[scene][1] if depth is None else depth
+
+    # The fastest of at least repeat renders spread over at least min_seconds, each of a freshly built scene. Whatever
+    # else the machine is doing only ever slows a render down, and a short render can fall entirely within a slow
+    # spell, so the fastest render over a longer window is the figure that holds steady from run to run.
+    render_seconds = float('inf')
+    renders = 0
+    began = time.perf_counter()
+    while renders < repeat or time.perf_counter() - began < min_seconds:
+        world, camera = build(scene, width, height)
+        start = time.perf_counter()
+        canvas = camera.render(world, depth, workers=workers)
+        render_seconds = min(render_seconds, time.perf_counter() - start)
+        renders += 1
+
+    # A second, instrumented render counts rays and splits the time into phases
+    world, camera = build(scene, width, height)
+    profiler = Profiler()
+    tracemalloc.start()
+    camera.render(world, depth, workers=workers, profiler=profiler)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = profiler.report()
+    phases = {name: report['seconds'][timing] for name, timing in PHASES.items()}
+    # Patterns are looked up within lighting for secondary rays, and in batches ahead of it for primary rays
+    phases['shading'] -= phases['pattern']
+    phases['pattern'] += report['seconds']['pattern_batch']
+    # Primary rays are intersected in batches, leaving at most the nearest object to test ray by ray
+    phases['intersection'] += report['seconds']['intersect_batch']
+    # Profiling slows everything down, so phases are reported as their share of the uninstrumented render time
+    phases = {name: seconds / report['render_seconds'] * render_seconds for name, seconds in phases.items()}
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        canvas.canvas_to_ppm(os.path.join(directory, f'{scene}.ppm'))
+        phases['output'] = time.perf_counter() - start
+
+    rays = sum(report['rays'].values())
+    return {
+        'scene': scene,
+        'width': width,
+        'height': height,
+        'depth': depth,
+        'workers': workers or 1,
+        'renders': renders,
+        'render_seconds': render_seconds,
+        'rays': rays,
+        'ray_counts': report['rays'],
+        'intersection_tests': report['intersection_tests'],
+        'shadow_cache': report['shadow_cache'],
+        'rays_per_second': rays / render_seconds,
+        'phase_seconds': phases,
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Returns a message for every scene slower than its baseline by more than the tolerance. Baselines recorded at a
+    # different resolution, depth or worker count are not comparable and are skipped.
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['scene'])
+        if previous is None or any(previous[key] != result[key] for key in ('width', 'height', 'depth', 'workers')):
+            continue
+        floor = previous['rays_per_second'] * (1 - tolerance)
+        if result['rays_per_second'] < floor:
+            regressions.append(f'{result["scene"]}: {result["rays_per_second"]:.0f} rays/s is below '
+                               f'{floor:.0f} ({previous["rays_per_second"]:.0f} baseline - {tolerance:.0%})')
+    return regressions
+
+
+def report(result):
+    phases = ', '.join(f'{name} {seconds:.3f}s' for name, seconds in result['phase_seconds'].items())
+    print(f'{result["scene"]:<20}{result["width"]}x{result["height"]} depth {result["depth"]}: '
+          f'{result["render_seconds"]:.2f}s (best of {result["renders"]}), {result["rays"]} rays, '
+          f'{result["rays_per_second"]:.0f} rays/s, peak {result["peak_memory_bytes"] / 1e6:.1f} MB')
+    print(f'{"":<20}{phases}')
+
+
+def run(arguments):
+    scenes = arguments.scenes or list(SCENES)
+    results = [benchmark(scene, arguments.width, arguments.height, arguments.depth, arguments.workers,
+                         arguments.repeat, arguments.min_seconds) for scene in scenes]
+    for result in results:
+        report(result)
+
+    if arguments.json:
+        Path(arguments.json).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(arguments.baseline)
+    if arguments.save_baseline:
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        baseline.update({result['scene']: result for result in results})
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f'Baseline written to {baseline_path}')
+        return 0
+
+    if baseline_path.exists():
+        regressions = compare(results, json.loads(baseline_path.read_text()), arguments.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Render the chapters/ scenes and compare against a baseline')
+    parser.add_argument('scenes', nargs='*', help=f'scenes to render, from {", ".join(SCENES)} (default: all)')
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--height', type=int, default=40)
+    parser.add_argument('--depth', type=int, default=None, help="reflection depth (default: each scene's own)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='least number of renders of each scene, of which the fastest is reported (default: 5)')
+    parser.add_argument('--min-seconds', type=float, default=2.0,
+                        help='keep rendering each scene until this long has passed (default: 2)')
+    parser.add_argument('--baseline', default=str(BASELINE))
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed fractional slowdown (default: 0.2)')
+    parser.add_argument('--save-baseline', action='store_true', help='record these results as the new baseline')
+    parser.add_argument('--json', help='also write the full results to this file')
+    arguments = parser.parse_args(argv)
+    unknown = set(arguments.scenes) - set(SCENES)
+    if unknown:
+        parser.error(f'unknown scenes: {", ".join(sorted(unknown))}')
+    if arguments.repeat < 1:
+        parser.error('--repeat must be at least 1')
+    return arguments
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_arguments()))
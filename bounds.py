@@ -0,0 +1,78 @@
+from tuples import Point
+from math import inf, isfinite
+
+
+def ray_hits_box(ox, oy, oz, ix, iy, iz, min_x, min_y, min_z, max_x, max_y, max_z):
+    # Slab test on raw coordinates, given the reciprocal of each direction component (a huge value in place of
+    # infinity where the component is zero). The whole line of the ray counts, so boxes behind the origin are hit.
+    t_min = (min_x - ox) * ix
+    t_max = (max_x - ox) * ix
+    if t_min > t_max:
+        t_min, t_max = t_max, t_min
+    t0 = (min_y - oy) * iy
+    t1 = (max_y - oy) * iy
+    if t0 > t1:
+        t0, t1 = t1, t0
+    if t0 > t_min:
+        t_min = t0
+    if t1 < t_max:
+        t_max = t1
+    if t_min > t_max:
+        return False
+    t0 = (min_z - oz) * iz
+    t1 = (max_z - oz) * iz
+    if t0 > t1:
+        t0, t1 = t1, t0
+    if t0 > t_min:
+        t_min = t0
+    if t1 < t_max:
+        t_max = t1
+    return t_min <= t_max
+
+
+def reciprocal(d):
+    return 1 / d if abs(d) > 1e-300 else 1e300
+
+
+class BoundingBox:
+    def __init__(self, minimum=None, maximum=None):
+        self.minimum = Point(inf, inf, inf) if minimum is None else minimum
+        self.maximum = Point(-inf, -inf, -inf) if maximum is None else maximum
+
+    def __eq__(self, other):
+        return self.minimum == other.minimum and self.maximum == other.maximum
+
+    @property
+    def is_finite(self):
+        return all(isfinite(v) for v in (self.minimum.x, self.minimum.y, self.minimum.z,
+                                         self.maximum.x, self.maximum.y, self.maximum.z))
+
+    def add_point(self, point):
+        self.minimum = Point(min(self.minimum.x, point.x), min(self.minimum.y, point.y), min(self.minimum.z, point.z))
+        self.maximum = Point(max(self.maximum.x, point.x), max(self.maximum.y, point.y), max(self.maximum.z, point.z))
+
+    def add_box(self, box):
+        self.add_point(box.minimum)
+        self.add_point(box.maximum)
+
+    def corners(self):
+        return [Point(x, y, z) for x in (self.minimum.x, self.maximum.x)
+                for y in (self.minimum.y, self.maximum.y)
+                for z in (self.minimum.z, self.maximum.z)]
+
+    def transform(self, matrix):
+        # Transforming all eight corners and re-boxing them gives a conservative axis-aligned box
+        if not self.is_finite:
+            return BoundingBox(Point(-inf, -inf, -inf), Point(inf, inf, inf))
+        box = BoundingBox()
+        for corner in self.corners():
+            box.add_point(matrix * corner)
+        return box
+
+    def intersects(self, ray):
+        direction = ray.direction
+        minimum = self.minimum
+        maximum = self.maximum
+        return ray_hits_box(ray.origin.x, ray.origin.y, ray.origin.z,
+                            reciprocal(direction.x), reciprocal(direction.y), reciprocal(direction.z),
+                            minimum.x, minimum.y, minimum.z, maximum.x, maximum.y, maximum.z)
@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class BVH:
+    """Bounding volume hierarchy over a set of axis-aligned boxes, stored as a flat list of nodes"""
+    LEAF_SIZE = 4
+
+    def __init__(self, lower, upper, items=None, leaf_size=None):
+        lower = np.asarray(lower, dtype=float).reshape(-1, 3)
+        upper = np.asarray(upper, dtype=float).reshape(-1, 3)
+        self.leaf_size = self.LEAF_SIZE if leaf_size is None else leaf_size
+        # Without items, leaves hold the boxes' own indices
+        self.items = None if items is None else list(items)
+        # Each node is (min x, min y, min z, max x, max y, max z, first, count, right). Leaves have count > 0 and
+        # cover order[first:first + count]; interior nodes have their left child immediately after them.
+        self.nodes = []
+        self.order = []
+        if len(lower) > 0:
+            self._build(np.arange(len(lower)), lower, upper, (lower + upper) / 2)
+
+    def __len__(self):
+        return len(self.order)
+
+    def _build(self, indices, lower, upper, centroids):
+        node_index = len(self.nodes)
+        box = (*lower[indices].min(axis=0).tolist(), *upper[indices].max(axis=0).tolist())
+        self.nodes.append(None)
+
+        if len(indices) <= self.leaf_size:
+            self.nodes[node_index] = (*box, len(self.order), len(indices), 0)
+            if self.items is None:
+                self.order.extend(indices.tolist())
+            else:
+                self.order.extend(self.items[i] for i in indices.tolist())
+            return
+
+        # Median split along the axis with the widest spread of box centres
+        centres = centroids[indices]
+        axis = int(np.argmax(centres.max(axis=0) - centres.min(axis=0)))
+        half = len(indices) // 2
+        split = np.argpartition(centres[:, axis], half)
+        self._build(indices[split[:half]], lower, upper, centroids)
+        right = len(self.nodes)
+        self._build(indices[split[half:]], lower, upper, centroids)
+        self.nodes[node_index] = (*box, 0, 0, right)
+
+    def candidates(self, ray):
+        # Items whose leaf boxes are crossed by the infinite line through the ray. Nothing is culled by the sign of
+        # t, so callers see every intersection they would get from testing all items.
+        if not self.nodes:
+            return []
+
+        ox, oy, oz = ray.origin.x, ray.origin.y, ray.origin.z
+        ix, iy, iz = (1 / d if abs(d) > 1e-300 else 1e300
+                      for d in (ray.direction.x, ray.direction.y, ray.direction.z))
+        nodes = self.nodes
+        order = self.order
+        found = []
+        stack = [0]
+        while stack:
+            index = stack.pop()
+            min_x, min_y, min_z, max_x, max_y, max_z, first, count, right = nodes[index]
+
+            t_min = (min_x - ox) * ix
+            t_max = (max_x - ox) * ix
+            if t_min > t_max:
+                t_min, t_max = t_max, t_min
+            t0 = (min_y - oy) * iy
+            t1 = (max_y - oy) * iy
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > t_min:
+                t_min = t0
+            if t1 < t_max:
+                t_max = t1
+            if t_min > t_max:
+                continue
+            t0 = (min_z - oz) * iz
+            t1 = (max_z - oz) * iz
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > t_min:
+                t_min = t0
+            if t1 < t_max:
+                t_max = t1
+            if t_min > t_max:
+                continue
+
+            if count:
+                found.extend(order[first:first + count])
+            else:
+                stack.append(right)
+                stack.append(index + 1)
+        return found
+
+    def candidates_batch(self, origins, directions):
+        # candidates() for a whole batch of rays at once, given as (N, 3) or (N, 4) arrays. Returns a dict from each
+        # item to the indices of the rays whose lines cross its leaf box, found by descending the tree with every ray
+        # still inside each node together. The slab test is the same arithmetic as candidates(), so each ray finds
+        # exactly the items the scalar query would.
+        found = {}
+        if not self.nodes or not len(origins):
+            return found
+        origins = np.asarray(origins, dtype=float)[:, :3]
+        directions = np.asarray(directions, dtype=float)[:, :3]
+        with np.errstate(divide='ignore'):
+            inverse = np.where(np.abs(directions) > 1e-300, 1 / directions, 1e300)
+        nodes = self.nodes
+        order = self.order
+        stack = [(0, np.arange(len(origins)))]
+        while stack:
+            index, rays = stack.pop()
+            node = nodes[index]
+            o = origins[rays]
+            i = inverse[rays]
+            t0 = (np.array(node[0:3]) - o) * i
+            t1 = (np.array(node[3:6]) - o) * i
+            t_min = np.minimum(t0, t1).max(axis=1)
+            t_max = np.maximum(t0, t1).min(axis=1)
+            rays = rays[t_min <= t_max]
+            if not len(rays):
+                continue
+            first, count, right = node[6:]
+            if count:
+                for item in order[first:first + count]:
+                    found[item] = rays
+            else:
+                stack.append((right, rays))
+                stack.append((index + 1, rays))
+        return found
@@ -1,13 +1,69 @@
+import numpy as np
+import os
+import pickle
+import tempfile
 from math import tan
+from uuid import uuid4
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from matrices import Matrix
 from tuples import *
-from rays import Ray
+from rays import Ray, RayBatch
 from canvas import Canvas
 
 
+# Ways of running a render's workers
+BACKENDS = ('process', 'thread')
+
+# Per-process render state, populated once in each pool worker by _init_worker so the pickled world is only
+# transferred when the worker starts rather than with every tile.
+_worker_state = {}
+
+
+def _init_worker(camera, world, reflect_depth, profiler_class=None):
+    _worker_state['camera'] = camera
+    _worker_state['world'] = world
+    _worker_state['reflect_depth'] = reflect_depth
+    _worker_state['profiler'] = None
+    if profiler_class is not None:
+        _worker_state['profiler'] = profiler_class()
+        _worker_state['profiler'].enable()
+
+
+def _load_job(key, file_name, profiler_class):
+    # Workers in a pool shared between renders load each render's scene from its file the first time they are given
+    # one of its tiles, replacing the previous render's scene
+    if _worker_state.get('key') == key:
+        return
+    if _worker_state.get('profiler') is not None:
+        _worker_state['profiler'].disable()
+    with open(file_name, 'rb') as f:
+        _init_worker(*pickle.load(f), profiler_class)
+    _worker_state['key'] = key
+
+
+def _render_job_tile(job):
+    key, file_name, profiler_class, tile = job
+    _load_job(key, file_name, profiler_class)
+    return _render_tile(tile)
+
+
+def _render_tile(tile):
+    # Returns the tile's colours and, when profiling, the worker's counts for this tile alone
+    colours = _worker_state['camera'].render_tile(_worker_state['world'], tile, _worker_state['reflect_depth'])
+    profiler = _worker_state['profiler']
+    if profiler is None:
+        return tile, colours, None
+    report = profiler.report()
+    profiler.reset()
+    return tile, colours, report
+
+
 class Camera:
     _transform = None
     _transform_inverse = None
+    _origin = None
 
     def __init__(self, horizontal_size, vertical_size, field_of_view):
         self.hsize = horizontal_size
@@ -18,6 +74,7 @@ class Camera:
         self.half_height = 0
         self._transform = Matrix.identity(4)
         self._transform_inverse = Matrix.identity(4)
+        self._origin = Point(0, 0, 0)
         self.initialise()
 
     @property
@@ -28,6 +85,11 @@ class Camera:
     def transform(self, value):
         self._transform = value
         self._transform_inverse = self.transform.inverse()
+        self._origin = Point.from_tuple(self._transform_inverse * Point(0, 0, 0))
+
+    @property
+    def origin(self):
+        return self._origin
 
     def initialise(self):
         half_view = tan(self.field_of_view / 2)
@@ -40,28 +102,209 @@ class Camera:
             self.half_height = half_view
         self.pixel_size = self.half_width * 2 / self.hsize
 
-    def ray_for_pixel(self, px, py):
-        x_offset = (px + 0.5) * self.pixel_size
-        y_offset = (py + 0.5) * self.pixel_size
+    def ray_for_pixel(self, px, py, sub_x=0.5, sub_y=0.5):
+        # sub_x and sub_y place the ray within the pixel, from 0 at its top-left corner to 1 at its bottom-right
+        x_offset = (px + sub_x) * self.pixel_size
+        y_offset = (py + sub_y) * self.pixel_size
 
         world_x = self.half_width - x_offset
         world_y = self.half_height - y_offset
 
         pixel = self._transform_inverse * Point(world_x, world_y, -1)
-        origin = Point.from_tuple(self._transform_inverse * Point(0, 0, 0))
-        direction = Vector.from_tuple(pixel - origin).normalise()
+        direction = Vector.from_tuple(pixel - self._origin).normalise()
+
+        return Ray(self._origin, direction)
+
+    def rays_for_tile(self, x0, y0, x1, y1):
+        # Primary rays for every pixel in the region, in row-major order. x1 and y1 are exclusive.
+        # The inverse transform is affine, so each world-space pixel position is a column term depending only on x plus
+        # a row term depending only on y. Evaluating them element-wise keeps every ray bit-for-bit identical no matter
+        # how the image is divided into regions.
+        inverse = self._transform_inverse.matrix
+        world_x = self.half_width - (np.arange(x0, x1) + 0.5) * self.pixel_size
+        world_y = self.half_height - (np.arange(y0, y1) + 0.5) * self.pixel_size
+        columns = world_x[:, None] * inverse[:3, 0]
+        rows = world_y[:, None] * inverse[:3, 1] + (inverse[:3, 3] - inverse[:3, 2])
+        directions = (rows[:, None, :] + columns[None, :, :]).reshape(-1, 3) - self._origin.vec[:3]
+        directions /= np.sqrt(directions[:, 0] ** 2 + directions[:, 1] ** 2 + directions[:, 2] ** 2)[:, None]
+
+        count = len(directions)
+        origins = np.empty((count, 4))
+        origins[:] = self._origin.vec
+        return RayBatch(origins, np.hstack((directions, np.zeros((count, 1)))))
+
+    def rays_for_image(self):
+        return self.rays_for_tile(0, 0, self.hsize, self.vsize)
+
+    def tiles(self, tile_size):
+        # Yields (x0, y0, x1, y1) regions covering the image in row-major order. x1 and y1 are exclusive.
+        for y0 in range(0, self.vsize, tile_size):
+            for x0 in range(0, self.hsize, tile_size):
+                yield x0, y0, min(x0 + tile_size, self.hsize), min(y0 + tile_size, self.vsize)
+
+    def render_tile(self, world, tile, reflect_depth=5):
+        # Returns the tile's colours as an (h, w, 3) array
+        x0, y0, x1, y1 = tile
+        if world.shadow_cache is not None:
+            world.shadow_cache.reset()
+        colours = [(colour.red, colour.green, colour.blue)
+                   for colour in world.colours_at(self.rays_for_tile(*tile), reflect_depth)]
+        return np.array(colours).reshape(y1 - y0, x1 - x0, 3)
 
-        return Ray(origin, direction)
+    def render(self, world, reflect_depth=5, show_progress=False, workers=None, tile_size=16, profiler=None,
+               pool=None, backend='process'):
+        # profiler is an optional profiling.Profiler. It is only enabled for the duration of the render and its
+        # report() covers everything the render did. With more than one worker, backend chooses between worker
+        # processes and threads.
+        if backend not in BACKENDS:
+            raise ValueError(f'unknown backend {backend!r}, expected one of {", ".join(BACKENDS)}')
+        if backend == 'thread' and workers is not None and workers > 1:
+            return self.render_threaded(world, reflect_depth, show_progress, workers, tile_size, profiler)
+        if pool is not None or (workers is not None and workers > 1):
+            return self.render_parallel(world, reflect_depth, show_progress, workers, tile_size, profiler, pool)
 
-    def render(self, world, reflect_depth=5, show_progress=False):
+        start = perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            world.prepare()
+            image = Canvas(self.hsize, self.vsize)
+
+            for y in range(self.vsize):
+                image.write_rows(y, self.render_tile(world, (0, y, self.hsize, y + 1), reflect_depth))
+                if show_progress:
+                    print(f'{int(100 * y / self.vsize)}% complete')
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.render_seconds += perf_counter() - start
+
+        return image
+
+    def render_adaptive(self, world, reflect_depth=5, threshold=0.1, max_samples=16, seed=0, show_progress=False,
+                        workers=None, tile_size=16, profiler=None, backend='process'):
+        # Renders one sample per pixel, then supersamples only the pixels which differ from a neighbour by more than
+        # threshold in any channel. Those pixels take a jittered 2x2 grid of samples first, and if the samples still
+        # disagree by more than threshold, a further jittered grid of the largest square number of samples left.
+        # max_samples caps the samples a pixel takes in all, counting its first centre sample, so anything between
+        # one sample and the centre sample plus the 2x2 grid is refused.
+        if max_samples < 1 or 1 < max_samples < 5:
+            raise ValueError('max_samples must be 1, for no supersampling, or at least 5')
+        image = self.render(world, reflect_depth, show_progress, workers, tile_size, profiler, backend=backend)
+        if max_samples == 1:
+            return image
+
+        start = perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            edges = self.edges(image, threshold)
+            for y, x in zip(*np.nonzero(edges)):
+                rng = np.random.default_rng((seed, y, x))
+                samples = np.vstack((image.pixels[y, x], self.jittered_samples(world, x, y, 4, rng, reflect_depth)))
+                spread = np.ptp(np.clip(samples, 0, 1), axis=0).max()
+                if spread > threshold and max_samples > 5:
+                    samples = np.vstack((samples, self.jittered_samples(world, x, y, max_samples - 5, rng,
+                                                                        reflect_depth)))
+                image.pixels[y, x] = samples.mean(axis=0)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.render_seconds += perf_counter() - start
+
+        return image
+
+    @staticmethod
+    def edges(image, threshold):
+        # Pixels differing from their right or lower neighbour by more than threshold in any channel, compared after
+        # clamping to the displayable range. Both pixels either side of an edge are marked.
+        pixels = np.clip(image.pixels, 0, 1)
+        across = np.abs(pixels[:, 1:] - pixels[:, :-1]).max(axis=2) > threshold
+        down = np.abs(pixels[1:] - pixels[:-1]).max(axis=2) > threshold
+        edges = np.zeros(pixels.shape[:2], dtype=bool)
+        edges[:, 1:] |= across
+        edges[:, :-1] |= across
+        edges[1:] |= down
+        edges[:-1] |= down
+        return edges
+
+    def jittered_samples(self, world, px, py, count, rng, reflect_depth=5):
+        # Colours of rays through a randomly jittered point in each cell of an n x n grid over the pixel, where n is
+        # the largest whole number with n * n <= count
+        n = max(1, int(np.sqrt(count)))
+        cells = np.arange(n)
+        jitter = rng.random((2, n, n))
+        sub_x = (cells[None, :] + jitter[0]) / n
+        sub_y = (cells[:, None] + jitter[1]) / n
+        samples = []
+        for sub_x, sub_y in zip(sub_x.ravel().tolist(), sub_y.ravel().tolist()):
+            colour = world.colour_at(self.ray_for_pixel(px, py, sub_x, sub_y), reflect_depth)
+            samples.append((colour.red, colour.green, colour.blue))
+        return np.array(samples)
+
+    def render_parallel(self, world, reflect_depth=5, show_progress=False, workers=2, tile_size=16, profiler=None,
+                        pool=None):
+        # Every pixel is computed by exactly the same code as the serial path, so the canvas is identical
+        # regardless of worker count or the order in which tiles complete. pool is an optional multiprocessing pool
+        # with no initializer, such as one shared by a batch of renders, used in place of starting workers here.
+        start = perf_counter()
+        world.prepare()
         image = Canvas(self.hsize, self.vsize)
+        tiles = list(self.tiles(tile_size))
+        profiler_class = None if profiler is None else type(profiler)
 
-        for y in range(self.vsize):
-            for x in range(self.hsize):
-                ray = self.ray_for_pixel(x, y)
-                colour = world.colour_at(ray, reflect_depth)
-                image.write_pixel(x, y, colour)
-            if show_progress:
-                print(f'{int(100 * y / self.vsize)}% complete')
+        if pool is None:
+            with Pool(workers, initializer=_init_worker, initargs=(self, world, reflect_depth, profiler_class)) as pool:
+                self.collect_tiles(image, pool.imap_unordered(_render_tile, tiles), len(tiles), show_progress, profiler)
+        else:
+            # The scene is passed to the workers through a file rather than with every tile
+            with tempfile.NamedTemporaryFile(suffix='.pickle', delete=False) as f:
+                pickle.dump((self, world, reflect_depth), f, pickle.HIGHEST_PROTOCOL)
+            try:
+                key = uuid4().hex
+                jobs = [(key, f.name, profiler_class, tile) for tile in tiles]
+                self.collect_tiles(image, pool.imap_unordered(_render_job_tile, jobs), len(tiles), show_progress,
+                                   profiler)
+            finally:
+                os.remove(f.name)
 
+        if profiler is not None:
+            profiler.render_seconds += perf_counter() - start
         return image
+
+    def render_threaded(self, world, reflect_depth=5, show_progress=False, workers=2, tile_size=16, profiler=None):
+        # Tiles rendered by a pool of threads sharing the one world. Nothing a ray needs is kept on the scene's shapes
+        # or patterns, and the intersection buffers and shadow cache are per thread, so the canvas is identical to the
+        # serial one. Threads only run in parallel on a free-threaded Python, or where NumPy releases the GIL. When
+        # profiling, each tile is counted by a profiler of its own and the reports merged, as render_parallel does.
+        start = perf_counter()
+        world.prepare()
+        image = Canvas(self.hsize, self.vsize)
+        tiles = list(self.tiles(tile_size))
+
+        def render_tile(tile):
+            if profiler is None:
+                return tile, self.render_tile(world, tile, reflect_depth), None
+            with profiler.thread() as tile_profiler:
+                colours = self.render_tile(world, tile, reflect_depth)
+            return tile, colours, tile_profiler.report()
+
+        if profiler is not None:
+            profiler.enable()
+        try:
+            with ThreadPoolExecutor(workers) as executor:
+                self.collect_tiles(image, executor.map(render_tile, tiles), len(tiles), show_progress, profiler)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.render_seconds += perf_counter() - start
+        return image
+
+    @staticmethod
+    def collect_tiles(image, results, count, show_progress=False, profiler=None):
+        for done, (tile, colours, report) in enumerate(results, 1):
+            image.write_tile(tile[0], tile[1], colours)
+            if report is not None:
+                profiler.merge(report)
+            if show_progress:
+                print(f'{int(100 * done / count)}% complete')
@@ -1,47 +1,75 @@
+import numpy as np
+import re
 from PIL import Image
 from colours import Colour
 
 
+# The text of each 8-bit value followed by a space, zero-padded to four bytes, and the greedy pattern used to wrap a
+# row of values into lines of at most 69 characters
+_PPM_TEXT = np.zeros((256, 4), dtype=np.uint8)
+for _value in range(256):
+    _text = f'{_value} '.encode('ascii')
+    _PPM_TEXT[_value, :len(_text)] = list(_text)
+_PPM_LINE = re.compile(rb'(.{1,69})(?: |$)')
+
+
 class Canvas:
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.image = Image.new('RGB', (width, height))
+        # Colours are kept as unclamped floats, so values above 1 survive until the image is quantised for output
+        self.pixels = np.zeros((height, width, 3), dtype=np.float32)
+
+    @property
+    def image(self):
+        # The buffer handed to PIL is shared with the quantised array rather than copied again
+        return Image.frombuffer('RGB', (self.width, self.height), self.to_bytes(), 'raw', 'RGB', 0, 1)
 
     def get_image_data(self, band=None):
-        return [Colour(c[0], c[1], c[2]) for c in self.image.getdata(band)]
+        if band is not None:
+            return self.pixels[:, :, band].ravel().tolist()
+        return [Colour(*c) for c in self.pixels.reshape(-1, 3).tolist()]
 
     def get_pixel(self, x, y):
-        colour = self.image.getpixel((x, y))
-        return Colour(colour[0] / 255, colour[1] / 255, colour[2] / 255)
+        return Colour(*self.pixels[y, x].tolist())
 
     def write_pixel(self, x, y, colour):
         if x < 0 or x >= self.width:
             return
         if y < 0 or y >= self.height:
             return
-        red = min(max(int(round(colour.red * 255)), 0), 255)
-        green = min(max(int(round(colour.green * 255)), 0), 255)
-        blue = min(max(int(round(colour.blue * 255)), 0), 255)
-        self.image.putpixel((x, y), (red, green, blue))
-
-    def canvas_to_ppm(self, file_name):
-        with open(file_name, 'w') as f:
-            f.write('P3\n')
-            f.write(f'{self.width} {self.height}\n')
-            f.write('255\n')
-            for y in range(self.height):
-                line = ''
-                for x in range(self.width):
-                    colour = self.image.getpixel((x, y))
-                    line += f'{colour[0]} {colour[1]} {colour[2]} '
-                    if len(line) > 70:
-                        space_index = line[:70][::-1].index(' ')
-                        break_at = 70 - space_index - 1
-                        test = line[:break_at]
-                        f.write(test + '\n')
-                        line = line[break_at + 1:]
-                f.write(line[:-1] + '\n')
+        self.pixels[y, x] = (colour.red, colour.green, colour.blue)
+
+    def write_tile(self, x, y, colours):
+        # colours is an (h, w, 3) array written with its top-left corner at (x, y)
+        colours = np.asarray(colours)
+        self.pixels[y:y + colours.shape[0], x:x + colours.shape[1]] = colours
+
+    def write_rows(self, y, colours):
+        self.write_tile(0, y, np.asarray(colours).reshape(-1, self.width, 3))
+
+    def to_bytes(self):
+        # Quantise to 8 bits per channel, rounding halves to even as Python's round() does
+        return np.clip(np.rint(self.pixels * 255), 0, 255).astype(np.uint8)
+
+    def canvas_to_ppm(self, file_name, binary=False):
+        with open(file_name, 'wb', buffering=1 << 20) as f:
+            self.write_ppm(f, binary)
+
+    def write_ppm(self, stream, binary=False):
+        # Plain (P3) output wraps each row's text at 69 columns, breaking only between values and starting a new line
+        # for every row. Binary (P6) output is the raw quantised bytes.
+        data = self.to_bytes()
+        stream.write(f'{"P6" if binary else "P3"}\n{self.width} {self.height}\n255\n'.encode('ascii'))
+        if binary:
+            stream.write(data.tobytes())
+            return
+
+        for row in data.reshape(self.height, -1):
+            # Look up the text of every value, a space included, and drop the padding bytes in one operation
+            text = _PPM_TEXT[row].ravel()
+            text = text[text != 0].tobytes()
+            stream.write(b'\n'.join(_PPM_LINE.findall(text[:-1])) + b'\n')
 
     def write_to_ppm(self, file_name):
         self.image.save(file_name, format='PPM')
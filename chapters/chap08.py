@@ -8,9 +8,10 @@ from matrices import Matrix
 from camera import Camera
 from transformations import Transformations
 from math import pi
+import os
 
 
-def run():
+def build_scene(width=500, height=250):
     world = World.default_world()
 
     floor = Sphere()
@@ -54,10 +55,15 @@ def run():
     world.lights.append(PointLight(Point(0, 10, -10), Colour(0, 0.5, 0.5)))
     world.lights.append(PointLight(Point(10, 10, -10), Colour(0.5, 0, 0.5)))
     world.objects = [floor, left_wall, right_wall, middle, left, right]
-    camera = Camera(500, 250, pi / 3)
+    camera = Camera(width, height, pi / 3)
     camera.transform = Transformations.view_transform(Point(0, 1.5, -5), Point(0, 1, 0), Vector(0, 1, 0))
+    return world, camera
+
+
+def run():
+    world, camera = build_scene()
     canvas = camera.render(world)
-    canvas.write_to_ppm('..\\images\\camera_spheres_shadows_3lights.ppm')
+    canvas.write_to_ppm(os.path.join('..', 'images', 'camera_spheres_shadows_3lights.ppm'))
 
 
 if __name__ == '__main__':
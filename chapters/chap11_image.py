@@ -6,9 +6,10 @@ from camera import Camera
 from transformations import Transformations
 from patterns import *
 from math import pi
+import os
 
 
-def run():
+def build_scene(width=1000, height=1000):
     world = World()
 
     ground = Plane()
@@ -40,10 +41,15 @@ def run():
 
     world.lights.append(PointLight(Point(20, 10, 0), Colour(1, 1, 1)))
     world.objects = [ground, glass, middle]
-    camera = Camera(1000, 1000, pi / 3)
+    camera = Camera(width, height, pi / 3)
     camera.transform = Transformations.view_transform(Point(0, 2.5, 0), Point(0, 0, 0), Vector(1, 0, 0))
+    return world, camera
+
+
+def run():
+    world, camera = build_scene()
     canvas = camera.render(world, 5, True)
-    canvas.write_to_ppm('..\\images\\glass_sphere_on_checker.ppm')
+    canvas.write_to_ppm(os.path.join('..', 'images', 'glass_sphere_on_checker.ppm'))
 
 
 if __name__ == '__main__':
@@ -6,9 +6,10 @@ from camera import Camera
 from transformations import Transformations
 from patterns import *
 from math import pi
+import os
 
 
-def run():
+def build_scene(width=1600, height=900):
     world = World.default_world()
 
     ground = Plane()
@@ -86,10 +87,15 @@ def run():
     # world.lights.append(PointLight(Point(0, 10, -10), Colour(0.5, 0.5, 0.5)))
     # world.lights.append(PointLight(Point(10, 10, -10), Colour(0.5, 0, 0.5)))
     world.objects = [ground, left_wall, right_wall, middle, left, right]
-    camera = Camera(1600, 900, pi / 3)
+    camera = Camera(width, height, pi / 3)
     camera.transform = Transformations.view_transform(Point(0, 1.5, -5), Point(0, 1, 0), Vector(0, 1, 0))
+    return world, camera
+
+
+def run():
+    world, camera = build_scene()
     canvas = camera.render(world, 8, True)
-    canvas.write_to_ppm('..\\images\\glass_spheres_on_planes.ppm')
+    canvas.write_to_ppm(os.path.join('..', 'images', 'glass_spheres_on_planes.ppm'))
 
 
 if __name__ == '__main__':
@@ -6,9 +6,10 @@ from camera import Camera
 from transformations import Transformations
 from patterns import *
 from math import pi
+import os
 
 
-def run():
+def build_scene(width=800, height=600):
     world = World.default_world()
 
     ground = Plane()
@@ -32,15 +33,18 @@ def run():
     water.material.refractive_index = 1.333
 
     left_wall = Plane()
-    left_wall.transform = Matrix.translation(0, 0, 5) * Matrix.rotation_y(-pi / 4) * Matrix.rotation_x(pi / 2)
+    left_wall.transform = Matrix.rotation_y(-pi / 4) * Matrix.rotation_x(pi / 2)
     left_wall.material = Material()
     left_wall.material.pattern = ground_pattern
 
     right_wall = Plane()
-    right_wall.transform = Matrix.translation(0, 0, 5) * Matrix.rotation_y(pi / 4) * Matrix.rotation_x(pi / 2)
+    right_wall.transform = Matrix.rotation_y(pi / 4) * Matrix.rotation_x(pi / 2)
     right_wall.material = Material()
     right_wall.material.pattern = ground_pattern
 
+    walls = Group([left_wall, right_wall])
+    walls.transform = Matrix.translation(0, 0, 5)
+
     middle = Sphere()
     middle.transform = Matrix.translation(-0.25, 0.75, 0.5) * Matrix.scaling(0.75, 0.75, 0.75)
     middle.material = Material()
@@ -72,11 +76,16 @@ def run():
     left.material.refractive_index = 1.52
 
     world.lights[0] = PointLight(Point(-10, 10, -10), Colour(1, 1, 1))
-    world.objects = [ground, water, left_wall, right_wall, middle, left, right]
-    camera = Camera(800, 600, pi / 3)
+    world.objects = [ground, water, walls, middle, left, right]
+    camera = Camera(width, height, pi / 3)
     camera.transform = Transformations.view_transform(Point(0, 3, -5), Point(0, 1, 0), Vector(0, 1, 0))
+    return world, camera
+
+
+def run():
+    world, camera = build_scene()
     canvas = camera.render(world, 8, True)
-    canvas.write_to_ppm('..\\images\\chapter11_water.ppm')
+    canvas.write_to_ppm(os.path.join('..', 'images', 'chapter11_water.ppm'))
 
 
 if __name__ == '__main__':
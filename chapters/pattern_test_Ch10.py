@@ -6,10 +6,13 @@ from camera import Camera
 from transformations import Transformations
 from patterns import *
 from math import pi
+import os
 
 
-def run():
-    # Chapter10 final image created with values scale=0.6, octaves=2, persistence=3, lacunarity=3
+def build_scene(width=800, height=600, bake_noise=False):
+    # Chapter10 final image created with values scale=0.6, octaves=2, persistence=3, lacunarity=3. With bake_noise, the
+    # perturbed patterns share a baked noise volume, which takes about a second to bake and pays for itself at full
+    # size.
     scale = 0.6
     octaves = 2
     persistence = 3
@@ -41,14 +44,22 @@ def run():
     middle.material.diffuse = 0.7
     middle.material.specular = 0.3
     middle.material.pattern = sphere_pattern
+    if bake_noise:
+        for pattern in (ground_pattern1, ground_pattern2, sphere_pattern):
+            pattern.bake()
 
     world.lights[0] = PointLight(Point(-10, 10, -10), Colour(1, 1, 1))
     # world.lights.append(PointLight(Point(0, 10, -10), Colour(0.5, 0.5, 0.5)))
     world.objects = [ground, middle]
-    camera = Camera(800, 600, pi / 3)
+    camera = Camera(width, height, pi / 3)
     camera.transform = Transformations.view_transform(Point(0, 1.5, -5), Point(0, 1, 0), Vector(0, 1, 0))
+    return world, camera
+
+
+def run():
+    world, camera = build_scene(bake_noise=True)
     canvas = camera.render(world, True)
-    canvas.write_to_ppm('..\\images\\pattern_test.ppm')
+    canvas.write_to_ppm(os.path.join('..', 'images', 'pattern_test.ppm'))
 
 
 if __name__ == '__main__':
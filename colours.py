@@ -3,28 +3,54 @@ from math import fabs
 
 
 class Colour(Vector):
+    __slots__ = ()
+
     def __init__(self, red, green, blue):
-        Vector.__init__(self, red, green, blue)
-        self.red = red
-        self.green = green
-        self.blue = blue
+        self.x = red
+        self.y = green
+        self.z = blue
+        self.w = 0.0
+
+    @property
+    def red(self):
+        return self.x
+
+    @red.setter
+    def red(self, value):
+        self.x = value
+
+    @property
+    def green(self):
+        return self.y
+
+    @green.setter
+    def green(self, value):
+        self.y = value
+
+    @property
+    def blue(self):
+        return self.z
+
+    @blue.setter
+    def blue(self, value):
+        self.z = value
 
     def __eq__(self, other, epsilon=0.00001):
-        return fabs(self.red - other.red) < epsilon and \
-            fabs(self.green - other.green) < epsilon and \
-            fabs(self.blue - other.blue) < epsilon
+        return fabs(self.x - other.red) < epsilon and \
+            fabs(self.y - other.green) < epsilon and \
+            fabs(self.z - other.blue) < epsilon
 
     def __add__(self, other):
-        added_tuple = super().__add__(other)
-        return Colour(added_tuple.x, added_tuple.y, added_tuple.z)
+        return Colour(self.x + other.x, self.y + other.y, self.z + other.z)
 
     def __sub__(self, other):
-        added_tuple = super().__sub__(other)
-        return Colour(added_tuple.x, added_tuple.y, added_tuple.z)
+        return Colour(self.x - other.x, self.y - other.y, self.z - other.z)
 
     def __mul__(self, other):
         if type(other) is Colour:
-            return Colour(self.red * other.red, self.green * other.green, self.blue * other.blue)
+            return Colour(self.x * other.x, self.y * other.y, self.z * other.z)
         else:
-            added_tuple = super().__mul__(other)
-            return Colour(added_tuple.x, added_tuple.y, added_tuple.z)
+            return Colour(self.x * other, self.y * other, self.z * other)
+
+    def __rmul__(self, other):
+        return Colour(self.x * other, self.y * other, self.z * other)
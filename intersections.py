@@ -1,8 +1,13 @@
+import threading
 from dataclasses import dataclass
 from tuples import *
 from math import sqrt
 
 
+# One reusable buffer per thread, handed out by IntersectionBuffer.for_thread
+_thread_buffers = threading.local()
+
+
 @dataclass
 class Comps:
     """Class for pre-computed intersection state values"""
@@ -15,16 +20,52 @@ class Comps:
     inside: bool = None
     over_point: Point = None
     under_point: Point = None
-    n1: float = 0.0
-    n2: float = 0.0
+    hit: object = None
+    intersections: list = None
+    # The pattern's colour at over_point, when looked up for a batch of hits at once
+    surface_colour: object = None
+    _refractive_indices: tuple = None
+
+    # The refractive indices either side of the hit are only worked out the first time they're needed, since opaque
+    # materials never use them
+    @property
+    def n1(self):
+        return self.refractive_indices()[0]
+
+    @n1.setter
+    def n1(self, value):
+        self._refractive_indices = (value, self.refractive_indices()[1])
+
+    @property
+    def n2(self):
+        return self.refractive_indices()[1]
+
+    @n2.setter
+    def n2(self, value):
+        self._refractive_indices = (self.refractive_indices()[0], value)
+
+    def refractive_indices(self):
+        if self._refractive_indices is None:
+            if self.hit is None:
+                self._refractive_indices = (1.0, 1.0)
+            else:
+                self._refractive_indices = self.hit.calculate_refractive_normals(self.intersections)
+        return self._refractive_indices
 
 
 class Intersection:
     EPSILON = 0.00001
 
-    def __init__(self, t, intersect_object):
+    def __init__(self, t, intersect_object, u=None, v=None, face=None, local_ray=None):
         self.t = t
         self.object = intersect_object
+        # Where a triangle was hit, for shapes whose normals depend on it: u and v are the barycentric coordinates
+        # relative to its second and third vertices, and face the triangle's index within a mesh
+        self.u = u
+        self.v = v
+        self.face = face
+        # The ray in the object's space, when known, from which normal_at finds the hit's object-space point
+        self.local_ray = local_ray
 
     def __lt__(self, other):
         return self.t < other.t
@@ -35,7 +76,7 @@ class Intersection:
         comps.object = self.object
         comps.point = ray.position(self.t)
         comps.eye_vector = -ray.direction
-        comps.normal_vector = comps.object.normal_at(comps.point)
+        comps.normal_vector = comps.object.normal_at(comps.point, self)
         comps.reflect_vector = ray.direction.reflect(comps.normal_vector)
         if comps.normal_vector.dot(comps.eye_vector) < 0:
             comps.inside = True
@@ -44,26 +85,26 @@ class Intersection:
             comps.inside = False
         comps.over_point = Point.from_tuple(comps.point + comps.normal_vector * self.EPSILON)
         comps.under_point = Point.from_tuple(comps.point - comps.normal_vector * self.EPSILON)
-        if all_intersections is None:
-            all_intersections = [self]
-        comps.n1, comps.n2 = self.calculate_refractive_normals(all_intersections)
+        comps.hit = self
+        comps.intersections = [self] if all_intersections is None else all_intersections
         return comps
 
     def calculate_refractive_normals(self, intersection_list):
-        containers = []
+        # The objects the ray is inside of, in the order it entered them, keyed by identity so entering and leaving
+        # are constant-time whatever the depth of nesting
+        containers = {}
         n1 = 1
         n2 = 1
         for intersect in intersection_list:
-            if fabs(intersect.t - self.t) < self.EPSILON:
-                if len(containers) > 0:
-                    n1 = containers[-1].material.refractive_index
-            if intersect.object in containers:
-                containers.remove(intersect.object)
+            at_hit = fabs(intersect.t - self.t) < self.EPSILON
+            if at_hit and containers:
+                n1 = next(reversed(containers.values())).material.refractive_index
+            if id(intersect.object) in containers:
+                del containers[id(intersect.object)]
             else:
-                containers.append(intersect.object)
-            if fabs(intersect.t - self.t) < self.EPSILON:
-                if len(containers) > 0:
-                    n2 = containers[-1].material.refractive_index
+                containers[id(intersect.object)] = intersect.object
+            if at_hit and containers:
+                n2 = next(reversed(containers.values())).material.refractive_index
         return n1, n2
 
     @staticmethod
@@ -90,3 +131,83 @@ class Intersection:
 
         r0 = ((comps.n1 - comps.n2) / (comps.n1 + comps.n2)) ** 2
         return r0 + (1 - r0) * (1 - cosine) ** 5
+
+
+class IntersectionBuffer:
+    """Parallel lists of t values and objects which shapes append their intersections to.
+
+    The lists are allocated once and reused, so a query creates no Intersection objects until the caller asks for
+    them. The buffer's contents are only valid until the next query clears it."""
+
+    def __init__(self, capacity=64):
+        self.t = [0.0] * capacity
+        self.objects = [None] * capacity
+        # The object-space ray each intersection was found with. Shapes set local_ray before appending, and it's
+        # recorded with each intersection so the hit's normal needn't transform the point again.
+        self.rays = [None] * capacity
+        self.local_ray = None
+        # (u, v, face) for intersections appended by append_details. Only read for shapes with hit_details set, which
+        # always append that way, so other appends leave their entries stale rather than clearing them.
+        self.details = [None] * capacity
+        self.count = 0
+
+    @classmethod
+    def for_thread(cls):
+        buffer = getattr(_thread_buffers, 'buffer', None)
+        if buffer is None:
+            buffer = _thread_buffers.buffer = cls()
+        return buffer
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def append(self, t, obj):
+        if self.count == len(self.t):
+            self.grow()
+        self.t[self.count] = t
+        self.objects[self.count] = obj
+        self.rays[self.count] = self.local_ray
+        self.count += 1
+
+    def append_details(self, t, obj, u, v, face=None):
+        if self.count == len(self.t):
+            self.grow()
+        self.t[self.count] = t
+        self.objects[self.count] = obj
+        self.rays[self.count] = self.local_ray
+        self.details[self.count] = (u, v, face)
+        self.count += 1
+
+    def grow(self):
+        self.t.extend([0.0] * len(self.t))
+        self.objects.extend([None] * len(self.objects))
+        self.rays.extend([None] * len(self.rays))
+        self.details.extend([None] * len(self.details))
+
+    def intersection(self, index):
+        obj = self.objects[index]
+        if obj.hit_details:
+            return Intersection(self.t[index], obj, *self.details[index], self.rays[index])
+        return Intersection(self.t[index], obj, local_ray=self.rays[index])
+
+    def hit(self):
+        # Index of the nearest non-negative intersection, the earliest appended if several share its t, or None
+        index = None
+        nearest = float('inf')
+        t = self.t
+        for i in range(self.count):
+            if 0 <= t[i] < nearest:
+                nearest = t[i]
+                index = i
+        return index
+
+    def sorted_indices(self, limit=float('inf')):
+        # Indices of the intersections with t below limit in ascending order of t, ties kept in the order appended
+        t = self.t
+        return sorted((i for i in range(self.count) if t[i] < limit), key=t.__getitem__)
+
+    def intersections(self, limit=float('inf')):
+        return [self.intersection(i) for i in self.sorted_indices(limit)]
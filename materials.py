@@ -55,8 +55,12 @@ class Material:
                self.casts_shadow == other.casts_shadow and \
                fabs(self.shadow_transmission - other.shadow_transmission) < epsilon
 
-    def lighting(self, obj, light, point, eye_vector, normal_vector, in_shadow=False):
-        colour = self.pattern.pattern_at_shape(obj, point) if self.pattern is not None else self.colour
+    def lighting(self, obj, light, point, eye_vector, normal_vector, in_shadow=False, surface_colour=None):
+        # surface_colour is the pattern's colour at point when it has already been looked up
+        if surface_colour is not None:
+            colour = surface_colour
+        else:
+            colour = self.pattern.pattern_at_shape(obj, point) if self.pattern is not None else self.colour
         effective_colour = colour * light.intensity
         light_vector = Vector.from_tuple(light.position - point).normalise()
         ambient = effective_colour * self.ambient
@@ -3,28 +3,63 @@ from tuples import Tuple
 from math import sin, cos
 
 
+_IDENTITY_4 = np.identity(4)
+
+
 class Matrix:
+    # Derived values (rows as floats, inverse and transpose) are cached on first use, so a matrix must not be modified
+    # in place once it has been used.
     def __init__(self, matrix):
         self.matrix = np.array(matrix)
         self.is_invertible = None
+        self._rows = None
+        self._affine = False
+        self._inverse = None
+        self._transpose = None
 
     def __eq__(self, other):
         return np.allclose(self.matrix, other.matrix, rtol=0.0001)
 
     def __mul__(self, other):
         if type(other) is Matrix:
-            result = np.matmul(self.matrix, other.matrix)
-            return Matrix(result.tolist())
-        else:
+            return Matrix(np.matmul(self.matrix, other.matrix))
+        rows = self.rows
+        if rows is None:
             result = self.matrix.dot(other.vec)
             return Tuple(*result.tolist())
 
+        (a, b, c, d), (e, f, g, h), (i, j, k, l), (m, n, o, p) = rows
+        x, y, z, w = other.x, other.y, other.z, other.w
+        return Tuple(a * x + b * y + c * z + d * w,
+                     e * x + f * y + g * z + h * w,
+                     i * x + j * y + k * z + l * w,
+                     w if self._affine else m * x + n * y + o * z + p * w)
+
+    @property
+    def rows(self):
+        # The elements of a 4x4 matrix as nested lists of floats, used to multiply tuples without going through NumPy
+        if self._rows is None:
+            rows = self.matrix.astype(float).tolist() if self.matrix.shape == (4, 4) else False
+            # Set before the rows, so another thread never sees the rows without knowing whether they're affine
+            self._affine = bool(rows) and rows[3] == [0, 0, 0, 1]
+            self._rows = rows
+        return self._rows or None
+
+    @property
+    def is_affine(self):
+        # A 4x4 matrix whose bottom row is (0, 0, 0, 1), which leaves w unchanged and has a closed-form inverse
+        return self.rows is not None and self._affine
+
     @staticmethod
     def identity(size):
-        return Matrix(np.identity(size).tolist())
+        # The constructor copies its argument, so the shared 4x4 identity is never modified
+        return Matrix(_IDENTITY_4 if size == 4 else np.identity(size))
 
     def transpose(self):
-        return Matrix(np.transpose(self.matrix).tolist())
+        if self._transpose is None:
+            self._transpose = Matrix(np.transpose(self.matrix))
+            self._transpose._transpose = self
+        return self._transpose
 
     def determinant(self):
         result = np.linalg.det(self.matrix)
@@ -65,7 +100,28 @@ class Matrix:
         return Matrix(new.tolist())
 
     def inverse(self):
-        return Matrix(np.linalg.inv(self.matrix).tolist())
+        if self._inverse is None:
+            self._inverse = self.affine_inverse() if self.is_affine else Matrix(np.linalg.inv(self.matrix))
+            self._inverse._inverse = self
+        return self._inverse
+
+    def affine_inverse(self):
+        # Closed form: the inverse of [A | t] is [A^-1 | -A^-1 t], with A^-1 found from the 3x3 adjugate
+        (a, b, c, tx), (d, e, f, ty), (g, h, i, tz), _ = self.rows
+        cofactor_a = e * i - f * h
+        cofactor_b = f * g - d * i
+        cofactor_c = d * h - e * g
+        determinant = a * cofactor_a + b * cofactor_b + c * cofactor_c
+        if determinant == 0:
+            raise np.linalg.LinAlgError('Singular matrix')
+
+        r00, r01, r02 = cofactor_a / determinant, (c * h - b * i) / determinant, (b * f - c * e) / determinant
+        r10, r11, r12 = cofactor_b / determinant, (a * i - c * g) / determinant, (c * d - a * f) / determinant
+        r20, r21, r22 = cofactor_c / determinant, (b * g - a * h) / determinant, (a * e - b * d) / determinant
+        return Matrix([[r00, r01, r02, -(r00 * tx + r01 * ty + r02 * tz)],
+                       [r10, r11, r12, -(r10 * tx + r11 * ty + r12 * tz)],
+                       [r20, r21, r22, -(r20 * tx + r21 * ty + r22 * tz)],
+                       [0.0, 0.0, 0.0, 1.0]])
 
     @staticmethod
     def translation(x, y, z):
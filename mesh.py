@@ -0,0 +1,171 @@
+import numpy as np
+from array import array
+from bounds import BoundingBox
+from bvh import BVH
+from primitives import Shape, triangle_hit
+from tuples import Point, Vector
+
+
+class Mesh(Shape):
+    """Triangles sharing one array-backed vertex store, intersected through a bounding volume hierarchy of their own.
+
+    Vertices are an (n, 3) array and faces an (m, 3) array of vertex indices, with each triangle's first vertex and
+    edge vectors precomputed into one row of an (m, 9) array. A hit records the index of the triangle it struck and
+    its u and v, so no per-triangle objects are ever made. With vertex normals and an (m, 3) array of normal indices
+    for each face, normals are interpolated across each face as SmoothTriangle does; a face whose normal indices are
+    -1 is flat."""
+    hit_details = True
+    LEAF_SIZE = 8
+
+    def __init__(self, vertices, faces, normals=None, normal_faces=None):
+        Shape.__init__(self)
+        self.vertices = np.ascontiguousarray(vertices, dtype=float).reshape(-1, 3)
+        self.faces = np.ascontiguousarray(faces, dtype=np.int32).reshape(-1, 3)
+        if len(self.faces) and (self.faces.min() < 0 or self.faces.max() >= len(self.vertices)):
+            raise ValueError('Mesh faces refer to vertices which do not exist')
+        self.normals = None
+        self.normal_faces = None
+        if normal_faces is not None:
+            self.normals = np.ascontiguousarray(normals, dtype=float).reshape(-1, 3)
+            self.normal_faces = np.ascontiguousarray(normal_faces, dtype=np.int32).reshape(-1, 3)
+            if self.normal_faces.shape != self.faces.shape:
+                raise ValueError('Mesh normal indices must match its faces')
+            if len(self.faces) and (self.normal_faces.min() < -1 or self.normal_faces.max() >= len(self.normals)):
+                raise ValueError('Mesh faces refer to normals which do not exist')
+
+        p1, p2, p3 = (self.vertices[self.faces[:, i]] for i in range(3))
+        self.triangles = np.ascontiguousarray(np.hstack((p1, p2 - p1, p3 - p1)))
+        self._bvh = None
+        self._flat = None
+
+    def __len__(self):
+        return len(self.faces)
+
+    def __getstate__(self):
+        # The memoryview used for intersections can't be pickled, and is rebuilt on first use
+        state = self.__dict__.copy()
+        state['_flat'] = None
+        return state
+
+    def __fingerprint__(self):
+        state = Shape.__fingerprint__(self)
+        del state['_flat'], state['_bvh']
+        return state
+
+    def bvh(self):
+        # Built on first use from each triangle's bounding box, slightly padded so grazing hits survive the box test
+        if self._bvh is None:
+            corners = self.vertices[self.faces]
+            self._bvh = BVH(corners.min(axis=1) - self.EPSILON, corners.max(axis=1) + self.EPSILON,
+                            leaf_size=self.LEAF_SIZE)
+        return self._bvh
+
+    def local_intersect(self, local_ray):
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
+        if self._flat is None:
+            # Indexing a memoryview yields Python floats far faster than indexing the array itself
+            self._flat = memoryview(self.triangles).cast('B').cast('d')
+        flat = self._flat
+        ox, oy, oz = local_ray.origin.x, local_ray.origin.y, local_ray.origin.z
+        dx, dy, dz = local_ray.direction.x, local_ray.direction.y, local_ray.direction.z
+        for face in self.bvh().candidates(local_ray):
+            hit = triangle_hit(ox, oy, oz, dx, dy, dz, *flat[9 * face:9 * face + 9], self.EPSILON)
+            if hit is not None:
+                buffer.append_details(hit[0], self, hit[1], hit[2], face)
+
+    def local_normal_at(self, object_point, hit=None):
+        if hit is None or hit.face is None:
+            raise ValueError("A mesh's normal depends on which triangle was hit")
+        if self.normal_faces is not None and self.normal_faces[hit.face, 0] >= 0:
+            n1, n2, n3 = self.normals[self.normal_faces[hit.face]].tolist()
+            u, v = hit.u, hit.v
+            w = 1 - u - v
+            return Vector(n2[0] * u + n3[0] * v + n1[0] * w, n2[1] * u + n3[1] * v + n1[1] * w,
+                          n2[2] * u + n3[2] * v + n1[2] * w)
+        _, e1, e2 = self.triangles[hit.face].reshape(3, 3).tolist()
+        return Vector(*e2).cross(Vector(*e1)).normalise()
+
+    def bounds(self):
+        if not len(self.faces):
+            return BoundingBox()
+        used = self.vertices[self.faces.ravel()]
+        return BoundingBox(Point(*used.min(axis=0).tolist()), Point(*used.max(axis=0).tolist()))
+
+
+def load_obj(file_name):
+    with open(file_name, encoding='utf-8') as f:
+        return parse_obj(f, str(file_name))
+
+
+def parse_obj(lines, source='<obj>'):
+    # Builds a Mesh from the lines of a Wavefront OBJ file, read one at a time so the file is never held in memory.
+    # Vertices, vertex normals and faces are used, polygons being split into fans of triangles, and every other
+    # statement (texture coordinates, groups, materials and so on) is ignored.
+    vertices = array('d')
+    normals = array('d')
+    faces = array('i')
+    normal_faces = array('i')
+    smooth = False
+    for number, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+        kind = parts[0]
+        try:
+            if kind == 'v':
+                vertices.extend((float(parts[1]), float(parts[2]), float(parts[3])))
+            elif kind == 'vn':
+                normals.extend((float(parts[1]), float(parts[2]), float(parts[3])))
+            elif kind == 'f':
+                vertex_count = len(vertices) // 3
+                if len(parts) == 4 and '/' not in line:
+                    # The common case of a triangle given by vertex indices alone
+                    a, b, c = int(parts[1]), int(parts[2]), int(parts[3])
+                    if 0 < a <= vertex_count and 0 < b <= vertex_count and 0 < c <= vertex_count:
+                        faces.extend((a - 1, b - 1, c - 1))
+                        normal_faces.extend((-1, -1, -1))
+                        continue
+                points, point_normals = _face_corners(parts, vertex_count, len(normals) // 3)
+                smooth = smooth or bool(point_normals)
+                for i in range(1, len(points) - 1):
+                    faces.extend((points[0], points[i], points[i + 1]))
+                    if point_normals:
+                        normal_faces.extend((point_normals[0], point_normals[i], point_normals[i + 1]))
+                    else:
+                        normal_faces.extend((-1, -1, -1))
+        except (ValueError, IndexError) as error:
+            message = 'expected three coordinates' if isinstance(error, IndexError) else error
+            raise ValueError(f'{source}, line {number}: {message}') from None
+
+    # The arrays' buffers are shared with the mesh's arrays rather than copied
+    vertices = np.frombuffer(vertices, dtype=float).reshape(-1, 3)
+    faces = np.frombuffer(faces, dtype=np.intc).reshape(-1, 3)
+    if not smooth:
+        return Mesh(vertices, faces)
+    return Mesh(vertices, faces, np.frombuffer(normals, dtype=float).reshape(-1, 3),
+                np.frombuffer(normal_faces, dtype=np.intc).reshape(-1, 3))
+
+
+def _face_corners(parts, vertex_count, normal_count):
+    # Zero-based vertex and normal indices of a face's corners, each written v, v/vt, v//vn or v/vt/vn with negative
+    # indices counting back from the last vertex or normal defined so far
+    if len(parts) < 4:
+        raise ValueError('a face needs at least three vertices')
+    points = []
+    point_normals = []
+    for part in parts[1:]:
+        indices = part.split('/')
+        index = int(indices[0])
+        points.append(index - 1 if index > 0 else vertex_count + index)
+        if len(indices) == 3 and indices[2]:
+            index = int(indices[2])
+            point_normals.append(index - 1 if index > 0 else normal_count + index)
+    if point_normals and len(point_normals) != len(points):
+        raise ValueError('a face must give a normal for every vertex or none')
+    if min(points) < 0 or max(points) >= vertex_count:
+        raise ValueError('a face refers to a vertex which has not been defined')
+    if point_normals and (min(point_normals) < 0 or max(point_normals) >= normal_count):
+        raise ValueError('a face refers to a normal which has not been defined')
+    return points, point_normals
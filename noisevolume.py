@@ -0,0 +1,157 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+from pathlib import Path
+from noise import pnoise3
+from bounds import BoundingBox
+from tuples import Point
+
+
+# Where volumes can be kept between runs, if asked for by passing it as cache_dir
+CACHE_DIR = Path.home() / '.cache' / 'raytracer' / 'noise'
+
+# Volumes already baked or loaded by this process, by their key
+_volumes = {}
+
+
+class NoiseVolume:
+    """The three noise displacements used by PerturbedPattern, baked onto a regular grid over a bounding box.
+
+    Values between grid points are interpolated trilinearly. resolution is the number of grid cells per unit length,
+    so the error falls as it rises, at the cost of a cubic growth in baking time and memory."""
+
+    def __init__(self, scale, octaves, persistence, lacunarity, resolution, bounds, values=None):
+        self.scale = scale
+        self.octaves = octaves
+        self.persistence = persistence
+        self.lacunarity = lacunarity
+        self.resolution = resolution
+        self.bounds = bounds
+        self.lower = (bounds.minimum.x, bounds.minimum.y, bounds.minimum.z)
+        self.cells = tuple(int(np.ceil((upper - lower) * resolution))
+                           for lower, upper in zip(self.lower, (bounds.maximum.x, bounds.maximum.y, bounds.maximum.z)))
+        self.upper = tuple(lower + cells / resolution for lower, cells in zip(self.lower, self.cells))
+        # An (nx + 1, ny + 1, nz + 1, 3) array of the displacements at every grid point, filled in by bake()
+        self.values = values
+        self._flat = None
+
+    def __getstate__(self):
+        # The memoryview used for single lookups can't be pickled, and is rebuilt on first use
+        state = self.__dict__.copy()
+        state['_flat'] = None
+        return state
+
+    def __fingerprint__(self):
+        state = vars(self).copy()
+        del state['_flat']
+        return state
+
+    @property
+    def key(self):
+        return self.scale, self.octaves, self.persistence, self.lacunarity, self.resolution, self.lower, self.upper
+
+    @classmethod
+    def for_pattern(cls, pattern, resolution=8, bounds=None, cache_dir=None):
+        # The volume for a PerturbedPattern's noise settings, shared with any other pattern using the same settings.
+        # With a cache_dir, such as CACHE_DIR, it is loaded from there if it was baked before and saved there if not;
+        # otherwise it is kept in memory only.
+        if bounds is None:
+            bounds = BoundingBox(Point(-4, -4, -4), Point(4, 4, 4))
+        volume = cls(pattern.scale, pattern.octaves, pattern.persistence, pattern.lacunarity, resolution, bounds)
+        key = volume.key
+        if key in _volumes:
+            return _volumes[key]
+
+        file_name = None
+        if cache_dir is not None:
+            file_name = Path(cache_dir) / f'{hashlib.sha256(repr(key).encode()).hexdigest()[:32]}.npz'
+            if file_name.exists():
+                with np.load(file_name) as saved:
+                    if str(saved['key']) == repr(key):
+                        volume.values = saved['values']
+        if volume.values is None:
+            volume.bake()
+            if file_name is not None:
+                volume.save(file_name)
+        _volumes[key] = volume
+        return volume
+
+    def bake(self):
+        values = np.empty(tuple(cells + 1 for cells in self.cells) + (3,))
+        settings = dict(octaves=self.octaves, persistence=self.persistence, lacunarity=self.lacunarity)
+        xs, ys, zs = (list(lower + np.arange(cells + 1) / self.resolution) for lower, cells in
+                      zip(self.lower, self.cells))
+        for i, x in enumerate(xs):
+            for j, y in enumerate(ys):
+                for k, z in enumerate(zs):
+                    values[i, j, k] = (pnoise3(x, y + 1, z + 1, **settings), pnoise3(x + 1, y, z + 1, **settings),
+                                       pnoise3(x + 1, y + 1, z, **settings))
+        self.values = values * self.scale
+        return self
+
+    def save(self, file_name):
+        # Written to a temporary file of its own and renamed, so a reader never sees a partly written volume and
+        # processes baking the same volume at once don't write over each other's files
+        file_name = Path(file_name)
+        file_name.parent.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(suffix='.tmp', prefix=file_name.stem + '.', dir=file_name.parent)
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                np.savez(f, values=self.values, key=repr(self.key))
+            os.replace(temporary, file_name)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def displacement(self, x, y, z):
+        # The interpolated displacement at one point as an (x, y, z) tuple, or None outside the volume
+        lower_x, lower_y, lower_z = self.lower
+        upper_x, upper_y, upper_z = self.upper
+        if not (lower_x <= x <= upper_x and lower_y <= y <= upper_y and lower_z <= z <= upper_z):
+            return None
+        if self._flat is None:
+            # Indexing a memoryview yields Python floats far faster than indexing the array itself
+            self._flat = memoryview(np.ascontiguousarray(self.values)).cast('B').cast('d')
+        flat = self._flat
+        nx, ny, nz = self.cells
+        scaled_x = (x - lower_x) * self.resolution
+        scaled_y = (y - lower_y) * self.resolution
+        scaled_z = (z - lower_z) * self.resolution
+        i = min(int(scaled_x), nx - 1)
+        j = min(int(scaled_y), ny - 1)
+        k = min(int(scaled_z), nz - 1)
+        tx, ty, tz = scaled_x - i, scaled_y - j, scaled_z - k
+        # Offsets of the next grid point along y and x in the flattened array, each point holding three values
+        step_y = (nz + 1) * 3
+        step_x = (ny + 1) * step_y
+        first = i * step_x + j * step_y + k * 3
+        displacement = []
+        for a in range(first, first + 3):
+            c00 = flat[a] + (flat[a + 3] - flat[a]) * tz
+            c01 = flat[a + step_y] + (flat[a + step_y + 3] - flat[a + step_y]) * tz
+            c10 = flat[a + step_x] + (flat[a + step_x + 3] - flat[a + step_x]) * tz
+            c11 = flat[a + step_x + step_y] + (flat[a + step_x + step_y + 3] - flat[a + step_x + step_y]) * tz
+            c0 = c00 + (c01 - c00) * ty
+            c1 = c10 + (c11 - c10) * ty
+            displacement.append(c0 + (c1 - c0) * tx)
+        return tuple(displacement)
+
+    def displacement_batch(self, points):
+        # Trilinearly interpolated displacements at an (N, 3) array of points inside the volume, as an (N, 3) array
+        scaled = (points[:, :3] - self.lower) * self.resolution
+        cell = np.minimum(scaled.astype(int), np.array(self.cells) - 1)
+        t = scaled - cell
+        i, j, k = cell[:, 0], cell[:, 1], cell[:, 2]
+        tx, ty, tz = t[:, 0:1], t[:, 1:2], t[:, 2:3]
+        v = self.values
+        c00 = v[i, j, k] + (v[i, j, k + 1] - v[i, j, k]) * tz
+        c01 = v[i, j + 1, k] + (v[i, j + 1, k + 1] - v[i, j + 1, k]) * tz
+        c10 = v[i + 1, j, k] + (v[i + 1, j, k + 1] - v[i + 1, j, k]) * tz
+        c11 = v[i + 1, j + 1, k] + (v[i + 1, j + 1, k + 1] - v[i + 1, j + 1, k]) * tz
+        c0 = c00 + (c01 - c00) * ty
+        c1 = c10 + (c11 - c10) * ty
+        return c0 + (c1 - c0) * tx
+
+    def contains_batch(self, points):
+        return ((points[:, :3] >= self.lower) & (points[:, :3] <= self.upper)).all(axis=1)
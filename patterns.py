@@ -1,14 +1,54 @@
+import threading
+import numpy as np
 from colours import Colour
 from math import floor, sqrt
 from matrices import Matrix
 from abc import ABC, abstractmethod
 from noise import pnoise3
+from noisevolume import NoiseVolume
 from tuples import Point
 
 
 BLACK = Colour(0, 0, 0)
 WHITE = Colour(1, 1, 1)
 
+# The shape each thread is shading, which blended and nested patterns need to take points back into its space. It is
+# set by their pattern_at_shape and read by their pattern_at, so patterns nested within them see it as well.
+_shading = threading.local()
+
+
+def _homogeneous(points):
+    # Batches of points may be given as (N, 3) coordinates or (N, 4) homogeneous points
+    points = np.asarray(points, dtype=float)
+    if points.shape[1] == 4:
+        return points
+    return np.hstack((points, np.ones((len(points), 1))))
+
+
+def _to_pattern_space(pattern, shape, points):
+    # World-space points to the pattern's space, applying both transforms in a single product
+    to_pattern = pattern.transform_inverse.matrix @ shape.world_to_object.matrix
+    return _homogeneous(points) @ to_pattern.T
+
+
+def _transform_batch(matrix, points):
+    return points @ matrix.matrix.T
+
+
+def _rgb(colour):
+    return np.array((colour.red, colour.green, colour.blue))
+
+
+def _choose(condition, colour_a, colour_b):
+    return np.where(condition[:, None], _rgb(colour_a), _rgb(colour_b))
+
+
+def _blend(point_values, colour_a, colour_b, fraction, ends):
+    # colour_a + (colour_b - colour_a) * fraction, or ends where point_values are exactly 1
+    a = _rgb(colour_a)
+    colours = a + (_rgb(colour_b) - a) * fraction[:, None]
+    return np.where((point_values == 1)[:, None], ends, colours)
+
 
 class Pattern(ABC):
     a = None
@@ -44,10 +84,20 @@ class Pattern(ABC):
 
     @abstractmethod
     def pattern_at_shape(self, shape, point):
-        obj_point = shape.transform_inverse * point
+        obj_point = shape.world_to_object * point
         pattern_point = self._transform_inverse * obj_point
         return self.pattern_at(pattern_point)
 
+    def pattern_at_batch(self, points):
+        # Colours at a batch of pattern-space points, as an (N, 3) array. Fallback for patterns without a vectorised
+        # evaluation: evaluate one point at a time.
+        colours = [self.pattern_at(Point(*point[:3])) for point in _homogeneous(points).tolist()]
+        return np.array([(c.red, c.green, c.blue) for c in colours]).reshape(-1, 3)
+
+    def pattern_at_shape_batch(self, shape, points):
+        # Colours at a batch of world-space points on shape, as an (N, 3) array
+        return self.pattern_at_batch(_to_pattern_space(self, shape, points))
+
 
 class StripePattern(Pattern):
     def __init__(self, colour_a, colour_b):
@@ -56,6 +106,10 @@ class StripePattern(Pattern):
     def pattern_at(self, point):
         return self.a if floor(point.x) % 2 == 0 else self.b
 
+    def pattern_at_batch(self, points):
+        points = _homogeneous(points)
+        return _choose(np.floor(points[:, 0]) % 2 == 0, self.a, self.b)
+
     def pattern_at_shape(self, obj, world_point):
         return super(StripePattern, self).pattern_at_shape(obj, world_point)
 
@@ -69,6 +123,10 @@ class GradientPattern(Pattern):
         fraction = point.x - floor(point.x)
         return self.b if point.x == 1 else self.a + distance * fraction
 
+    def pattern_at_batch(self, points):
+        x = _homogeneous(points)[:, 0]
+        return _blend(x, self.a, self.b, x - np.floor(x), _rgb(self.b))
+
     def pattern_at_shape(self, obj, world_point):
         return super(GradientPattern, self).pattern_at_shape(obj, world_point)
 
@@ -82,6 +140,10 @@ class DoubleGradientPattern(Pattern):
         fraction = 1 - abs((point.x - floor(point.x) - 0.5) * 2)
         return self.a if point.x == 1 else self.a + distance * fraction
 
+    def pattern_at_batch(self, points):
+        x = _homogeneous(points)[:, 0]
+        return _blend(x, self.a, self.b, 1 - np.abs((x - np.floor(x) - 0.5) * 2), _rgb(self.a))
+
     def pattern_at_shape(self, obj, world_point):
         return super(DoubleGradientPattern, self).pattern_at_shape(obj, world_point)
 
@@ -93,6 +155,11 @@ class RingPattern(Pattern):
     def pattern_at(self, point):
         return self.a if floor(sqrt(point.x * point.x + point.z * point.z)) % 2 == 0 else self.b
 
+    def pattern_at_batch(self, points):
+        points = _homogeneous(points)
+        distance = np.sqrt(points[:, 0] * points[:, 0] + points[:, 2] * points[:, 2])
+        return _choose(np.floor(distance) % 2 == 0, self.a, self.b)
+
     def pattern_at_shape(self, obj, world_point):
         return super(RingPattern, self).pattern_at_shape(obj, world_point)
 
@@ -107,6 +174,11 @@ class GradientRingPattern(Pattern):
         fraction = point_dist - floor(point_dist)
         return self.b if point_dist == 1 else self.a + distance * fraction
 
+    def pattern_at_batch(self, points):
+        points = _homogeneous(points)
+        point_dist = np.sqrt(points[:, 0] * points[:, 0] + points[:, 2] * points[:, 2])
+        return _blend(point_dist, self.a, self.b, point_dist - np.floor(point_dist), _rgb(self.b))
+
     def pattern_at_shape(self, obj, world_point):
         return super(GradientRingPattern, self).pattern_at_shape(obj, world_point)
 
@@ -121,6 +193,12 @@ class DoubleGradientRingPattern(Pattern):
         fraction = 1 - abs((point_dist - floor(point_dist) - 0.5) * 2)
         return self.a if point_dist == 1 else self.a + distance * fraction
 
+    def pattern_at_batch(self, points):
+        points = _homogeneous(points)
+        point_dist = np.sqrt(points[:, 0] * points[:, 0] + points[:, 2] * points[:, 2])
+        fraction = 1 - np.abs((point_dist - np.floor(point_dist) - 0.5) * 2)
+        return _blend(point_dist, self.a, self.b, fraction, _rgb(self.a))
+
     def pattern_at_shape(self, obj, world_point):
         return super(DoubleGradientRingPattern, self).pattern_at_shape(obj, world_point)
 
@@ -132,34 +210,49 @@ class CheckersPattern(Pattern):
     def pattern_at(self, point):
         return self.a if (floor(point.x) + floor(point.y) + floor(point.z)) % 2 == 0 else self.b
 
+    def pattern_at_batch(self, points):
+        points = _homogeneous(points)
+        return _choose(np.floor(points[:, :3]).sum(axis=1) % 2 == 0, self.a, self.b)
+
     def pattern_at_shape(self, obj, world_point):
         return super(CheckersPattern, self).pattern_at_shape(obj, world_point)
 
 
 class BlendedPattern(Pattern):
     def __init__(self, pattern_a, pattern_b):
-        self.obj = None
         Pattern.__init__(self, pattern_a, pattern_b)
 
     def pattern_at(self, point):
-        obj_point = self.obj.transform_inverse * point
+        obj_point = _shading.obj.world_to_object * point
         pattern_point_a = self.a.transform_inverse * obj_point
         pattern_point_b = self.b.transform_inverse * obj_point
         return Colour.from_tuple((self.a.pattern_at(pattern_point_a) + self.b.pattern_at(pattern_point_b)) / 2)
 
     def pattern_at_shape(self, obj, world_point):
-        self.obj = obj
+        _shading.obj = obj
         return super(BlendedPattern, self).pattern_at_shape(obj, world_point)
 
+    def pattern_at_batch(self, points):
+        return self.blend_batch(_shading.obj, _homogeneous(points))
+
+    def pattern_at_shape_batch(self, obj, points):
+        _shading.obj = obj
+        return super(BlendedPattern, self).pattern_at_shape_batch(obj, points)
+
+    def blend_batch(self, obj, points):
+        obj_points = _transform_batch(obj.world_to_object, points)
+        colours_a = self.a.pattern_at_batch(_transform_batch(self.a.transform_inverse, obj_points))
+        colours_b = self.b.pattern_at_batch(_transform_batch(self.b.transform_inverse, obj_points))
+        return (colours_a + colours_b) / 2
+
 
 class NestedPattern(Pattern):
     def __init__(self, parent_pattern, pattern_a, pattern_b):
-        self.obj = None
         self.parent_pattern = parent_pattern
         Pattern.__init__(self, pattern_a, pattern_b)
 
     def pattern_at(self, point):
-        obj_point = self.obj.transform_inverse * point
+        obj_point = _shading.obj.world_to_object * point
         pattern_point = self.parent_pattern.transform_inverse * obj_point
         parent_pattern_point = self.parent_pattern.pattern_at(pattern_point)
         pattern_point_a = self.a.transform_inverse * obj_point
@@ -168,9 +261,27 @@ class NestedPattern(Pattern):
             else Colour.from_tuple(self.b.pattern_at(pattern_point_b))
 
     def pattern_at_shape(self, obj, world_point):
-        self.obj = obj
+        _shading.obj = obj
         return super(NestedPattern, self).pattern_at_shape(obj, world_point)
 
+    def pattern_at_batch(self, points):
+        return self.nest_batch(_shading.obj, _homogeneous(points))
+
+    def pattern_at_shape_batch(self, obj, points):
+        _shading.obj = obj
+        return super(NestedPattern, self).pattern_at_shape_batch(obj, points)
+
+    def nest_batch(self, obj, points):
+        # Points where the parent pattern shows its first colour, to the tolerance Colour equality uses, take pattern a
+        # and the rest pattern b
+        obj_points = _transform_batch(obj.world_to_object, points)
+        parent = self.parent_pattern.pattern_at_batch(_transform_batch(self.parent_pattern.transform_inverse,
+                                                                       obj_points))
+        use_a = (np.abs(parent - _rgb(self.parent_pattern.a)) < 0.00001).all(axis=1)
+        colours_a = self.a.pattern_at_batch(_transform_batch(self.a.transform_inverse, obj_points))
+        colours_b = self.b.pattern_at_batch(_transform_batch(self.b.transform_inverse, obj_points))
+        return np.where(use_a[:, None], colours_a, colours_b)
+
 
 class PerturbedPattern(Pattern):
     def __init__(self, pattern_to_perturb, scale=0.4, octaves=1, persistence=0.5, lacunarity=2):
@@ -181,8 +292,21 @@ class PerturbedPattern(Pattern):
         self.lacunarity = lacunarity
         Pattern.__init__(self, pattern_to_perturb.a, pattern_to_perturb.b)
         self.transform = pattern_to_perturb.transform
+        self.volume = None
+
+    def bake(self, resolution=8, bounds=None, cache_dir=None):
+        # Replaces live noise inside bounds (by default -4 to 4 on every axis of pattern space) with a baked
+        # NoiseVolume of resolution cells per unit, for single points and batches alike. Points outside the bounds
+        # still use live noise. cache_dir, such as noisevolume.CACHE_DIR, keeps the volume on disk between runs.
+        self.volume = NoiseVolume.for_pattern(self, resolution, bounds, cache_dir)
+        return self.volume
 
     def pattern_at(self, point):
+        if self.volume is not None:
+            displacement = self.volume.displacement(point.x, point.y, point.z)
+            if displacement is not None:
+                return self.pattern.pattern_at(Point(point.x + displacement[0], point.y + displacement[1],
+                                                     point.z + displacement[2]))
         new_x = point.x + pnoise3(point.x, point.y + 1, point.z + 1, octaves=self.octaves,
                                   persistence=self.persistence, lacunarity=self.lacunarity) * self.scale
         new_y = point.y + pnoise3(point.x + 1, point.y, point.z + 1, octaves=self.octaves,
@@ -193,3 +317,23 @@ class PerturbedPattern(Pattern):
 
     def pattern_at_shape(self, obj, world_point):
         return super(PerturbedPattern, self).pattern_at_shape(obj, world_point)
+
+    def pattern_at_batch(self, points):
+        # Baked noise is looked up for the whole batch at once. pnoise3 only takes one point at a time, so live noise
+        # is evaluated per point, and the perturbed pattern as a batch either way.
+        points = _homogeneous(points)
+        perturbed = points.copy()
+        live = np.ones(len(points), dtype=bool)
+        if self.volume is not None:
+            baked = self.volume.contains_batch(points)
+            perturbed[baked, :3] += self.volume.displacement_batch(points[baked])
+            live = ~baked
+        for row, (x, y, z, _) in zip(np.flatnonzero(live).tolist(), points[live].tolist()):
+            perturbed[row, :3] = (
+                x + pnoise3(x, y + 1, z + 1, octaves=self.octaves, persistence=self.persistence,
+                            lacunarity=self.lacunarity) * self.scale,
+                y + pnoise3(x + 1, y, z + 1, octaves=self.octaves, persistence=self.persistence,
+                            lacunarity=self.lacunarity) * self.scale,
+                z + pnoise3(x + 1, y + 1, z, octaves=self.octaves, persistence=self.persistence,
+                            lacunarity=self.lacunarity) * self.scale)
+        return self.pattern.pattern_at_batch(perturbed)
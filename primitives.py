@@ -1,17 +1,28 @@
+import numpy as np
 from tuples import *
 from uuid import uuid4
 from math import sqrt
-from intersections import Intersection
+from intersections import IntersectionBuffer
 from matrices import Matrix
 from materials import Material
+from bounds import BoundingBox
 from abc import ABC, abstractmethod
 
 
 class Shape(ABC):
     EPSILON = 0.00001
-    _saved_ray = None
+    # Set by shapes whose intersections record u, v and face, which normal_at is then passed the hit to use
+    hit_details = False
     _transform = None
     _transform_inverse = None
+    # The group this shape belongs to, if any, and the world-space matrices flattened from the chain of groups
+    parent = None
+    _world_to_object = None
+    _normal_to_world = None
+    _world_bounds = None
+    # Counts every change to a shape's transform or bounds, so a world can tell its hierarchy is out of date without
+    # walking its objects
+    changes = 0
 
     def __init__(self, x=0, y=0, z=0):
         self.origin = Point(x, y, z)
@@ -20,6 +31,14 @@ class Shape(ABC):
         self._transform_inverse = Matrix.identity(4)
         self.material = Material()
 
+    def __fingerprint__(self):
+        # Attributes describing the shape for progressive.scene_fingerprint, without its parent, the matrices and
+        # bounds cached from the chain of groups, or its id, which is new each time the scene is built
+        state = vars(self).copy()
+        for name in ('id', 'parent', '_world_to_object', '_normal_to_world', '_world_bounds'):
+            state.pop(name, None)
+        return state
+
     @property
     def transform(self):
         return self._transform
@@ -28,6 +47,7 @@ class Shape(ABC):
     def transform(self, value):
         self._transform = value
         self._transform_inverse = self.transform.inverse()
+        self.transform_changed()
 
     @property
     def transform_inverse(self):
@@ -37,31 +57,102 @@ class Shape(ABC):
     def transform_inverse(self, value):
         self._transform_inverse = value
         self._transform = self.transform_inverse.inverse()
+        self.transform_changed()
+
+    def transform_changed(self):
+        Shape.changes += 1
+        self.clear_world_matrices()
+        if self.parent is not None:
+            self.parent.clear_bounds()
+
+    def bounds_changed(self):
+        # Called by shapes when an attribute other than the transform which bounds() depends on is set, so the boxes
+        # kept by the shape, its groups and the world's hierarchy are all rebuilt
+        Shape.changes += 1
+        self._world_bounds = None
+        if self.parent is not None:
+            self.parent.clear_bounds()
+
+    def clear_world_matrices(self):
+        self._world_to_object = None
+        self._normal_to_world = None
+        self._world_bounds = None
 
     @property
-    def saved_ray(self):
-        return self._saved_ray
+    def world_to_object(self):
+        # This shape's inverse transform and those of the groups above it, multiplied once and kept until one of
+        # them changes
+        if self._world_to_object is None:
+            if self.parent is None:
+                self._world_to_object = self._transform_inverse
+            else:
+                self._world_to_object = self._transform_inverse * self.parent.world_to_object
+        return self._world_to_object
 
-    @saved_ray.setter
-    def saved_ray(self, value):
-        self._saved_ray = value
+    @property
+    def normal_to_world(self):
+        if self._normal_to_world is None:
+            self._normal_to_world = self.world_to_object.transpose()
+        return self._normal_to_world
 
-    @abstractmethod
     def intersects(self, ray):
-        self._saved_ray = ray.transform(self._transform_inverse)
-        return self.local_intersect(self._saved_ray)
+        return self.local_intersect(ray.transform(self._transform_inverse))
 
     @abstractmethod
     def local_intersect(self, local_ray):
         pass
 
-    @abstractmethod
-    def normal_at(self, point):
-        object_point = self._transform_inverse * point
-        object_normal = self.local_normal_at(object_point)
-        world_normal = self._transform_inverse.transpose() * object_normal
-        world_normal.w = 0
-        return Vector.from_tuple(world_normal).normalise()
+    def intersects_into(self, ray, buffer):
+        # Appends the ray's intersections to an IntersectionBuffer rather than returning a list
+        local_ray = ray.transform(self._transform_inverse)
+        buffer.local_ray = local_ray
+        self.local_intersect_into(local_ray, buffer)
+
+    def local_intersect_into(self, local_ray, buffer):
+        # Fallback for shapes which only implement local_intersect
+        for intersection in self.local_intersect(local_ray):
+            buffer.append(intersection.t, intersection.object)
+
+    def collect_intersections(self, local_ray):
+        # local_intersect for shapes which implement local_intersect_into
+        buffer = IntersectionBuffer(4)
+        buffer.local_ray = local_ray
+        self.local_intersect_into(local_ray, buffer)
+        return [buffer.intersection(i) for i in range(buffer.count)]
+
+    def intersects_batch(self, ray_batch):
+        # Returns (t, mask) arrays of shape (N, k) holding every candidate intersection of each ray, in the same order
+        # local_intersect would list them. Entries where mask is False are not intersections and hold inf.
+        return self.local_intersect_batch(ray_batch.transform(self._transform_inverse))
+
+    def local_intersect_batch(self, local_batch):
+        # Fallback for shapes without a vectorised intersection: intersect one ray at a time
+        xs = [[i.t for i in self.local_intersect(ray)] for ray in local_batch]
+        t = np.full((len(xs), max((len(x) for x in xs), default=0)), np.inf)
+        for row, ts in enumerate(xs):
+            t[row, :len(ts)] = ts
+        return t, np.isfinite(t)
+
+    @staticmethod
+    def masked(t, mask):
+        return np.where(mask, t, np.inf), mask
+
+    def normal_at(self, point, hit=None):
+        local_ray = None if hit is None else hit.local_ray
+        if local_ray is None:
+            object_point = self.world_to_object * point
+        else:
+            # The hit is t along the object-space ray it was found with, so no matrix is needed to find it again
+            t = hit.t
+            origin = local_ray.origin
+            direction = local_ray.direction
+            object_point = Point(origin.x + direction.x * t, origin.y + direction.y * t, origin.z + direction.z * t)
+        if hit is None or not self.hit_details:
+            object_normal = self.local_normal_at(object_point)
+        else:
+            object_normal = self.local_normal_at(object_point, hit)
+        world_normal = self.normal_to_world * object_normal
+        return Vector(world_normal.x, world_normal.y, world_normal.z).normalise()
 
     @abstractmethod
     def local_normal_at(self, local_point):
@@ -70,6 +161,19 @@ class Shape(ABC):
     def set_transform(self, new_transform):
         self.transform = new_transform
 
+    def bounds(self):
+        # Object-space extents. Shapes which cannot describe their extents are treated as unbounded.
+        return BoundingBox(Point(-float('inf'), -float('inf'), -float('inf')),
+                           Point(float('inf'), float('inf'), float('inf')))
+
+    def world_bounds(self):
+        # bounds() carried through this shape's transform and its groups', kept until one of them or the shape's
+        # bounds change
+        if self._world_bounds is None:
+            to_world = self._transform if self.parent is None else self.world_to_object.inverse()
+            self._world_bounds = self.bounds().transform(to_world)
+        return self._world_bounds
+
 
 class Sphere(Shape):
     def __init__(self, x=0, y=0, z=0):
@@ -96,24 +200,41 @@ class Sphere(Shape):
         return super().intersects(ray)
 
     def local_intersect(self, local_ray):
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
         primitive_to_ray = local_ray.origin - self.origin
         a = local_ray.direction.dot(local_ray.direction)
         b = 2 * local_ray.direction.dot(primitive_to_ray)
         c = primitive_to_ray.dot(primitive_to_ray) - 1
         discriminant = b * b - 4 * a * c
-        if discriminant < 0:
-            return []
-        else:
-            t1 = (-b - sqrt(discriminant)) / (2 * a)
-            t2 = (-b + sqrt(discriminant)) / (2 * a)
-            return [Intersection(t1, self), Intersection(t2, self)]
+        if discriminant >= 0:
+            buffer.append((-b - sqrt(discriminant)) / (2 * a), self)
+            buffer.append((-b + sqrt(discriminant)) / (2 * a), self)
+
+    def local_intersect_batch(self, local_batch):
+        primitive_to_ray = local_batch.origins[:, :3] - self.origin.vec[:3]
+        direction = local_batch.directions[:, :3]
+        a = np.einsum('ij,ij->i', direction, direction)
+        b = 2 * np.einsum('ij,ij->i', direction, primitive_to_ray)
+        c = np.einsum('ij,ij->i', primitive_to_ray, primitive_to_ray) - 1
+        discriminant = b * b - 4 * a * c
+        hit = discriminant >= 0
+        root = np.sqrt(np.where(hit, discriminant, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.stack(((-b - root) / (2 * a), (-b + root) / (2 * a)), axis=1)
+        return self.masked(t, np.stack((hit, hit), axis=1))
 
-    def normal_at(self, world_point):
-        return super(Sphere, self).normal_at(world_point)
+    def normal_at(self, world_point, hit=None):
+        return super(Sphere, self).normal_at(world_point, hit)
 
     def local_normal_at(self, object_point):
         return Vector.from_tuple(object_point - Point(0, 0, 0))
 
+    def bounds(self):
+        return BoundingBox(Point(self.origin.x - 1, self.origin.y - 1, self.origin.z - 1),
+                           Point(self.origin.x + 1, self.origin.y + 1, self.origin.z + 1))
+
 
 class Plane(Shape):
     def __init__(self, x=0, y=0, z=0):
@@ -128,18 +249,28 @@ class Plane(Shape):
         return super().intersects(ray)
 
     def local_intersect(self, local_ray):
-        if abs(local_ray.direction.y) < self.EPSILON:
-            return []
-        else:
-            t = -local_ray.origin.y / local_ray.direction.y
-            return [Intersection(t, self)]
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
+        if abs(local_ray.direction.y) >= self.EPSILON:
+            buffer.append(-local_ray.origin.y / local_ray.direction.y, self)
+
+    def local_intersect_batch(self, local_batch):
+        direction_y = local_batch.directions[:, 1]
+        hit = np.abs(direction_y) >= self.EPSILON
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = -local_batch.origins[:, 1] / direction_y
+        return self.masked(t.reshape(-1, 1), hit.reshape(-1, 1))
 
-    def normal_at(self, world_point):
-        return super(Plane, self).normal_at(world_point)
+    def normal_at(self, world_point, hit=None):
+        return super(Plane, self).normal_at(world_point, hit)
 
     def local_normal_at(self, object_point):
         return Vector(0, 1, 0)
 
+    def bounds(self):
+        return BoundingBox(Point(-float('inf'), 0, -float('inf')), Point(float('inf'), 0, float('inf')))
+
 
 class Cube(Shape):
     def __init__(self, x=0, y=0, z=0):
@@ -167,15 +298,37 @@ class Cube(Shape):
         return super().intersects(ray)
 
     def local_intersect(self, local_ray):
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
         x_tmin, x_tmax = self.check_axis(local_ray.origin.x, local_ray.direction.x)
         y_tmin, y_tmax = self.check_axis(local_ray.origin.y, local_ray.direction.y)
         z_tmin, z_tmax = self.check_axis(local_ray.origin.z, local_ray.direction.z)
         t_min = max(x_tmin, y_tmin, z_tmin)
         t_max = min(x_tmax, y_tmax, z_tmax)
-        return [Intersection(t_min, self), Intersection(t_max, self)] if t_min <= t_max else []
-
-    def normal_at(self, world_point):
-        return super(Cube, self).normal_at(world_point)
+        if t_min <= t_max:
+            buffer.append(t_min, self)
+            buffer.append(t_max, self)
+
+    def check_axis_batch(self, origin, direction):
+        parallel = np.abs(direction) < self.EPSILON
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(parallel, np.inf, 1 / direction)
+            t_min = (-1 - origin) * scale
+            t_max = (1 - origin) * scale
+        return np.minimum(t_min, t_max), np.maximum(t_min, t_max)
+
+    def local_intersect_batch(self, local_batch):
+        origins = local_batch.origins
+        directions = local_batch.directions
+        axes = [self.check_axis_batch(origins[:, i], directions[:, i]) for i in range(3)]
+        t_min = np.maximum.reduce([axis[0] for axis in axes])
+        t_max = np.minimum.reduce([axis[1] for axis in axes])
+        hit = t_min <= t_max
+        return self.masked(np.stack((t_min, t_max), axis=1), np.stack((hit, hit), axis=1))
+
+    def normal_at(self, world_point, hit=None):
+        return super(Cube, self).normal_at(world_point, hit)
 
     def local_normal_at(self, object_point):
         max_x = fabs(object_point.x)
@@ -190,12 +343,15 @@ class Cube(Shape):
         else:
             return Vector(0, 0, object_point.z)
 
+    def bounds(self):
+        return BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+
 
 class Cylinder(Shape):
     def __init__(self, x=0, y=0, z=0):
         Shape.__init__(self, x, y, z)
-        self.minimum = -float('inf')
-        self.maximum = float('inf')
+        self._minimum = -float('inf')
+        self._maximum = float('inf')
         self.closed = False
 
     def __eq__(self, other, epsilon=0.00001):
@@ -203,20 +359,40 @@ class Cylinder(Shape):
                self.transform == other.transform and \
                self.material == other.material
 
+    @property
+    def minimum(self):
+        return self._minimum
+
+    @minimum.setter
+    def minimum(self, value):
+        self._minimum = value
+        self.bounds_changed()
+
+    @property
+    def maximum(self):
+        return self._maximum
+
+    @maximum.setter
+    def maximum(self, value):
+        self._maximum = value
+        self.bounds_changed()
+
     def intersects(self, ray):
         return super().intersects(ray)
 
     def local_intersect(self, local_ray):
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
         a = local_ray.direction.x ** 2 + local_ray.direction.z ** 2
 
-        xs = []
         if fabs(a) >= self.EPSILON:
             b = 2 * local_ray.origin.x * local_ray.direction.x + 2 * local_ray.origin.z * local_ray.direction.z
             c = local_ray.origin.x ** 2 + local_ray.origin.z ** 2 - 1
             disc = b ** 2 - 4 * a * c
 
             if disc < 0:
-                return []
+                return
 
             t0 = (-b - sqrt(disc)) / (2 * a)
             t1 = (-b + sqrt(disc)) / (2 * a)
@@ -224,29 +400,62 @@ class Cylinder(Shape):
                 t0, t1 = t1, t0
 
             y0 = local_ray.origin.y + t0 * local_ray.direction.y
-            if self.minimum < y0 < self.maximum:
-                xs.append(Intersection(t0, self))
+            if self._minimum < y0 < self._maximum:
+                buffer.append(t0, self)
 
             y1 = local_ray.origin.y + t1 * local_ray.direction.y
-            if self.minimum < y1 < self.maximum:
-                xs.append(Intersection(t1, self))
-
-        self.intersect_caps(local_ray, xs)
-        return xs
-
-    def normal_at(self, world_point):
-        return super(Cylinder, self).normal_at(world_point)
+            if self._minimum < y1 < self._maximum:
+                buffer.append(t1, self)
+
+        self.intersect_caps(local_ray, buffer)
+
+    def local_intersect_batch(self, local_batch):
+        ox, oy, oz = local_batch.origins[:, 0], local_batch.origins[:, 1], local_batch.origins[:, 2]
+        dx, dy, dz = local_batch.directions[:, 0], local_batch.directions[:, 1], local_batch.directions[:, 2]
+        a = dx ** 2 + dz ** 2
+        b = 2 * ox * dx + 2 * oz * dz
+        c = ox ** 2 + oz ** 2 - 1
+        disc = b ** 2 - 4 * a * c
+        sides = np.abs(a) >= self.EPSILON
+        # A ray which misses the infinite cylinder cannot reach the caps either
+        reachable = ~sides | (disc >= 0)
+        sides &= disc >= 0
+
+        root = np.sqrt(np.where(sides, disc, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t0 = (-b - root) / (2 * a)
+            t1 = (-b + root) / (2 * a)
+        t0, t1 = np.minimum(t0, t1), np.maximum(t0, t1)
+        with np.errstate(invalid='ignore'):
+            y0 = oy + t0 * dy
+            y1 = oy + t1 * dy
+        hit0 = sides & (self.minimum < y0) & (y0 < self.maximum)
+        hit1 = sides & (self.minimum < y1) & (y1 < self.maximum)
+
+        caps = reachable & self.closed & (np.abs(dy) >= self.EPSILON)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t2 = (self.minimum - oy) / dy
+            t3 = (self.maximum - oy) / dy
+            hit2 = caps & ((ox + t2 * dx) ** 2 + (oz + t2 * dz) ** 2 <= 1)
+            hit3 = caps & ((ox + t3 * dx) ** 2 + (oz + t3 * dz) ** 2 <= 1)
+        return self.masked(np.stack((t0, t1, t2, t3), axis=1), np.stack((hit0, hit1, hit2, hit3), axis=1))
+
+    def normal_at(self, world_point, hit=None):
+        return super(Cylinder, self).normal_at(world_point, hit)
 
     def local_normal_at(self, object_point):
         dist = object_point.x ** 2 + object_point.z ** 2
 
-        if dist < 1 and object_point.y >= self.maximum - self.EPSILON:
+        if dist < 1 and object_point.y >= self._maximum - self.EPSILON:
             return Vector(0, 1, 0)
-        elif dist < 1 and object_point.y <= self.minimum + self.EPSILON:
+        elif dist < 1 and object_point.y <= self._minimum + self.EPSILON:
             return Vector(0, -1, 0)
         else:
             return Vector(object_point.x, 0, object_point.z)
 
+    def bounds(self):
+        return BoundingBox(Point(-1, self.minimum, -1), Point(1, self.maximum, 1))
+
     @staticmethod
     def check_cap(ray, t):
         # Helper function. Check whether intersection is within a radius of 1 from the y-axis.
@@ -254,26 +463,26 @@ class Cylinder(Shape):
         z = ray.origin.z + t * ray.direction.z
         return x * x + z * z <= 1
 
-    def intersect_caps(self, ray, intersections):
+    def intersect_caps(self, ray, buffer):
         if not self.closed or fabs(ray.direction.y) < self.EPSILON:
             return
 
         # Check intersection with lower end cap by intersecting ray with plane at y=self.minimum
-        t = (self.minimum - ray.origin.y) / ray.direction.y
+        t = (self._minimum - ray.origin.y) / ray.direction.y
         if self.check_cap(ray, t):
-            intersections.append(Intersection(t, self))
+            buffer.append(t, self)
 
         # Check intersection with upper end cap by intersecting ray with plane at y=self.maximum
-        t = (self.maximum - ray.origin.y) / ray.direction.y
+        t = (self._maximum - ray.origin.y) / ray.direction.y
         if self.check_cap(ray, t):
-            intersections.append(Intersection(t, self))
+            buffer.append(t, self)
 
 
 class Cone(Shape):
     def __init__(self, x=0, y=0, z=0):
         Shape.__init__(self, x, y, z)
-        self.minimum = -float('inf')
-        self.maximum = float('inf')
+        self._minimum = -float('inf')
+        self._maximum = float('inf')
         self.closed = False
 
     def __eq__(self, other, epsilon=0.00001):
@@ -281,26 +490,46 @@ class Cone(Shape):
                self.transform == other.transform and \
                self.material == other.material
 
+    @property
+    def minimum(self):
+        return self._minimum
+
+    @minimum.setter
+    def minimum(self, value):
+        self._minimum = value
+        self.bounds_changed()
+
+    @property
+    def maximum(self):
+        return self._maximum
+
+    @maximum.setter
+    def maximum(self, value):
+        self._maximum = value
+        self.bounds_changed()
+
     def intersects(self, ray):
         return super().intersects(ray)
 
     def local_intersect(self, local_ray):
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
         a = local_ray.direction.x ** 2 - local_ray.direction.y ** 2 + local_ray.direction.z ** 2
         b = 2 * local_ray.origin.x * local_ray.direction.x - \
             2 * local_ray.origin.y * local_ray.direction.y + \
             2 * local_ray.origin.z * local_ray.direction.z
         c = local_ray.origin.x ** 2 - local_ray.origin.y ** 2 + local_ray.origin.z ** 2
 
-        xs = []
         if fabs(a) < self.EPSILON:
             if fabs(b) >= self.EPSILON:
                 t = -c / (2 * b)
-                xs.append(Intersection(t, self))
+                buffer.append(t, self)
         else:
             disc = b ** 2 - 4 * a * c
 
             if disc < 0:
-                return []
+                return
 
             t0 = (-b - sqrt(disc)) / (2 * a)
             t1 = (-b + sqrt(disc)) / (2 * a)
@@ -308,30 +537,66 @@ class Cone(Shape):
                 t0, t1 = t1, t0
 
             y0 = local_ray.origin.y + t0 * local_ray.direction.y
-            if self.minimum < y0 < self.maximum:
-                xs.append(Intersection(t0, self))
+            if self._minimum < y0 < self._maximum:
+                buffer.append(t0, self)
 
             y1 = local_ray.origin.y + t1 * local_ray.direction.y
-            if self.minimum < y1 < self.maximum:
-                xs.append(Intersection(t1, self))
-
-        self.intersect_caps(local_ray, xs)
-        return xs
-
-    def normal_at(self, world_point):
-        return super(Cone, self).normal_at(world_point)
+            if self._minimum < y1 < self._maximum:
+                buffer.append(t1, self)
+
+        self.intersect_caps(local_ray, buffer)
+
+    def local_intersect_batch(self, local_batch):
+        ox, oy, oz = local_batch.origins[:, 0], local_batch.origins[:, 1], local_batch.origins[:, 2]
+        dx, dy, dz = local_batch.directions[:, 0], local_batch.directions[:, 1], local_batch.directions[:, 2]
+        a = dx ** 2 - dy ** 2 + dz ** 2
+        b = 2 * ox * dx - 2 * oy * dy + 2 * oz * dz
+        c = ox ** 2 - oy ** 2 + oz ** 2
+        disc = b ** 2 - 4 * a * c
+        parallel = np.abs(a) < self.EPSILON
+        reachable = parallel | (disc >= 0)
+        sides = ~parallel & (disc >= 0)
+
+        root = np.sqrt(np.where(sides, disc, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t0 = (-b - root) / (2 * a)
+            t1 = (-b + root) / (2 * a)
+            single = -c / (2 * b)
+        t0, t1 = np.minimum(t0, t1), np.maximum(t0, t1)
+        with np.errstate(invalid='ignore'):
+            y0 = oy + t0 * dy
+            y1 = oy + t1 * dy
+        # A ray parallel to one of the cone's halves crosses the other half once, at the single root
+        hit0 = (sides & (self.minimum < y0) & (y0 < self.maximum)) | (parallel & (np.abs(b) >= self.EPSILON))
+        hit1 = sides & (self.minimum < y1) & (y1 < self.maximum)
+        t0 = np.where(parallel, single, t0)
+
+        caps = reachable & self.closed & (np.abs(dy) >= self.EPSILON)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t2 = (self.minimum - oy) / dy
+            t3 = (self.maximum - oy) / dy
+            hit2 = caps & ((ox + t2 * dx) ** 2 + (oz + t2 * dz) ** 2 <= fabs(self.minimum))
+            hit3 = caps & ((ox + t3 * dx) ** 2 + (oz + t3 * dz) ** 2 <= fabs(self.maximum))
+        return self.masked(np.stack((t0, t1, t2, t3), axis=1), np.stack((hit0, hit1, hit2, hit3), axis=1))
+
+    def normal_at(self, world_point, hit=None):
+        return super(Cone, self).normal_at(world_point, hit)
 
     def local_normal_at(self, object_point):
         dist = object_point.x ** 2 + object_point.z ** 2
         y = sqrt(dist) if object_point.y <= 0 else -sqrt(dist)
 
-        if dist < 1 and object_point.y >= self.maximum - self.EPSILON:
+        if dist < 1 and object_point.y >= self._maximum - self.EPSILON:
             return Vector(0, 1, 0)
-        elif dist < 1 and object_point.y <= self.minimum + self.EPSILON:
+        elif dist < 1 and object_point.y <= self._minimum + self.EPSILON:
             return Vector(0, -1, 0)
         else:
             return Vector(object_point.x, y, object_point.z)
 
+    def bounds(self):
+        radius = max(fabs(self.minimum), fabs(self.maximum))
+        return BoundingBox(Point(-radius, self.minimum, -radius), Point(radius, self.maximum, radius))
+
     @staticmethod
     def check_cap(ray, t, radius):
         # Helper function. Check whether intersection is within a radius of 1 from the y-axis.
@@ -339,19 +604,170 @@ class Cone(Shape):
         z = ray.origin.z + t * ray.direction.z
         return x * x + z * z <= fabs(radius)
 
-    def intersect_caps(self, ray, intersections):
+    def intersect_caps(self, ray, buffer):
         if not self.closed or fabs(ray.direction.y) < self.EPSILON:
             return
 
         # Check intersection with lower end cap by intersecting ray with plane at y=self.minimum
-        t = (self.minimum - ray.origin.y) / ray.direction.y
-        if self.check_cap(ray, t, self.minimum):
-            intersections.append(Intersection(t, self))
+        t = (self._minimum - ray.origin.y) / ray.direction.y
+        if self.check_cap(ray, t, self._minimum):
+            buffer.append(t, self)
 
         # Check intersection with upper end cap by intersecting ray with plane at y=self.maximum
-        t = (self.maximum - ray.origin.y) / ray.direction.y
-        if self.check_cap(ray, t, self.maximum):
-            intersections.append(Intersection(t, self))
+        t = (self._maximum - ray.origin.y) / ray.direction.y
+        if self.check_cap(ray, t, self._maximum):
+            buffer.append(t, self)
+
+
+def triangle_hit(ox, oy, oz, dx, dy, dz, p1x, p1y, p1z, e1x, e1y, e1z, e2x, e2y, e2z, epsilon=0.00001):
+    # Moller-Trumbore ray/triangle test on raw coordinates. Returns (t, u, v) for a hit, where u and v are the
+    # barycentric coordinates of the hit relative to the second and third vertices, or None for a miss.
+    cx = dy * e2z - dz * e2y
+    cy = dz * e2x - dx * e2z
+    cz = dx * e2y - dy * e2x
+    determinant = e1x * cx + e1y * cy + e1z * cz
+    if -epsilon < determinant < epsilon:
+        return None
+    f = 1 / determinant
+    px = ox - p1x
+    py = oy - p1y
+    pz = oz - p1z
+    u = f * (px * cx + py * cy + pz * cz)
+    if u < 0 or u > 1:
+        return None
+    qx = py * e1z - pz * e1y
+    qy = pz * e1x - px * e1z
+    qz = px * e1y - py * e1x
+    v = f * (dx * qx + dy * qy + dz * qz)
+    if v < 0 or u + v > 1:
+        return None
+    return f * (e2x * qx + e2y * qy + e2z * qz), u, v
+
+
+class Triangle(Shape):
+    hit_details = True
+
+    def __init__(self, p1, p2, p3):
+        Shape.__init__(self)
+        self.p1 = p1
+        self.p2 = p2
+        self.p3 = p3
+        self.e1 = Vector.from_tuple(p2 - p1)
+        self.e2 = Vector.from_tuple(p3 - p1)
+        self.normal = self.e2.cross(self.e1).normalise()
+
+    def intersects(self, ray):
+        return super().intersects(ray)
+
+    def local_intersect(self, local_ray):
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
+        origin = local_ray.origin
+        direction = local_ray.direction
+        hit = triangle_hit(origin.x, origin.y, origin.z, direction.x, direction.y, direction.z,
+                           self.p1.x, self.p1.y, self.p1.z, self.e1.x, self.e1.y, self.e1.z,
+                           self.e2.x, self.e2.y, self.e2.z, self.EPSILON)
+        if hit is not None:
+            buffer.append_details(hit[0], self, hit[1], hit[2])
+
+    def normal_at(self, world_point, hit=None):
+        return super(Triangle, self).normal_at(world_point, hit)
+
+    def local_normal_at(self, object_point, hit=None):
+        return self.normal
+
+    def bounds(self):
+        box = BoundingBox()
+        for point in (self.p1, self.p2, self.p3):
+            box.add_point(point)
+        return box
+
+
+class SmoothTriangle(Triangle):
+    """Triangle whose normal is interpolated across its face from a normal at each vertex"""
+
+    def __init__(self, p1, p2, p3, n1, n2, n3):
+        Triangle.__init__(self, p1, p2, p3)
+        self.n1 = n1
+        self.n2 = n2
+        self.n3 = n3
+
+    def local_normal_at(self, object_point, hit=None):
+        if hit is None:
+            return self.normal
+        return Vector.from_tuple(self.n2 * hit.u + self.n3 * hit.v + self.n1 * (1 - hit.u - hit.v))
+
+
+class Group(Shape):
+    """Shapes sharing a transform. A ray is moved into the group's space once and then passed to each child, and
+    skips every child when it misses the box around them all."""
+
+    def __init__(self, children=()):
+        Shape.__init__(self)
+        self.children = []
+        self._bounds = None
+        for child in children:
+            self.add_child(child)
+
+    def __len__(self):
+        return len(self.children)
+
+    def __fingerprint__(self):
+        state = Shape.__fingerprint__(self)
+        del state['_bounds']
+        return state
+
+    def add_child(self, child):
+        if child.parent is not None:
+            child.parent.remove_child(child)
+        self.children.append(child)
+        child.parent = self
+        child.transform_changed()
+
+    def remove_child(self, child):
+        self.children.remove(child)
+        child.parent = None
+        child.transform_changed()
+        self.clear_bounds()
+
+    def clear_world_matrices(self):
+        Shape.clear_world_matrices(self)
+        for child in self.children:
+            child.clear_world_matrices()
+
+    def clear_bounds(self):
+        self._bounds = None
+        self._world_bounds = None
+        if self.parent is not None:
+            self.parent.clear_bounds()
+
+    def intersects(self, ray):
+        return super().intersects(ray)
+
+    def local_intersect(self, local_ray):
+        return self.collect_intersections(local_ray)
+
+    def local_intersect_into(self, local_ray, buffer):
+        box = self.bounds()
+        if box.is_finite and not box.intersects(local_ray):
+            return
+        for child in self.children:
+            child.intersects_into(local_ray, buffer)
+
+    def normal_at(self, world_point, hit=None):
+        return super(Group, self).normal_at(world_point, hit)
+
+    def local_normal_at(self, object_point, hit=None):
+        raise ValueError("A group has no surface of its own, so normals come from the child which was hit")
+
+    def bounds(self):
+        if self._bounds is None:
+            box = BoundingBox()
+            for child in self.children:
+                box.add_box(child.bounds().transform(child.transform))
+            self._bounds = box
+        return self._bounds
 
 
 # class Blank(Shape):
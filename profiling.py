@@ -0,0 +1,202 @@
+import json
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from camera import Camera
+from intersections import Intersection
+from materials import Material
+from patterns import Pattern
+from primitives import Shape
+from world import ShadowCache, World
+
+
+# Methods timed by the profiler, keyed by the name they are reported under. Recursive methods (shade_hit reaches
+# itself through reflected and refracted rays) are only timed at their outermost call, so each figure is the inclusive
+# time spent in that phase with nothing counted twice.
+TIMED = {
+    'ray_generation': (Camera, 'rays_for_tile'),
+    'intersect_world': (World, 'intersect_world_into'),
+    'intersect_batch': (World, 'nearest_objects'),
+    'shade_hit': (World, 'shade_hit'),
+    'is_shadowed': (World, 'is_shadowed'),
+    'lighting': (Material, 'lighting'),
+    'pattern': (Pattern, 'pattern_at_shape'),
+    'pattern_batch': (Pattern, 'pattern_at_shape_batch'),
+}
+
+RAY_KINDS = ('primary', 'shadow', 'reflection', 'refraction')
+
+# Only one profiler can patch the pipeline at a time
+_active = None
+# Holds the profiler given to a thread by Profiler.thread, which counts that thread's calls in place of the enabled one
+_threads = threading.local()
+
+
+class Profiler:
+    """Counts rays, intersection tests and pattern evaluations, and times the main render phases.
+
+    The pipeline's methods are only wrapped between enable() and disable(), so a render with no profiler runs the
+    original, uninstrumented code. Threads rendering at once each count into a profiler of their own, given to them
+    by thread(), whose reports are merged into the enabled one."""
+
+    def __init__(self):
+        self._originals = []
+        self._kinds = ['primary']
+        self._depth = {}
+        self.reset()
+
+    def reset(self):
+        self.rays = dict.fromkeys(RAY_KINDS, 0)
+        self.intersections = {}
+        self.prepare_computations = 0
+        self.pattern_evaluations = 0
+        self.calls = dict.fromkeys(TIMED, 0)
+        self.seconds = dict.fromkeys(TIMED, 0.0)
+        self.shadow_cache = {'hits': 0, 'misses': 0}
+        self.render_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return _active is self
+
+    def enable(self):
+        global _active
+        if _active is self:
+            return
+        if _active is not None:
+            raise RuntimeError('Another profiler is already enabled')
+        _active = self
+        for name, (owner, method) in TIMED.items():
+            self._patch(owner, method, self._timed(name, getattr(owner, method)))
+        self._patch(World, 'hit_computations', self._ray(World.hit_computations))
+        self._patch(World, 'reflected_colour', self._secondary('reflection', World.reflected_colour))
+        self._patch(World, 'refracted_colour', self._secondary('refraction', World.refracted_colour))
+        self._patch(Shape, 'intersects', self._intersects(Shape.intersects))
+        self._patch(Shape, 'intersects_into', self._intersects(Shape.intersects_into))
+        self._patch(Intersection, 'prepare_computations', self._prepare(Intersection.prepare_computations))
+        self._patch(ShadowCache, 'record_hit', self._shadow_cache('hits', ShadowCache.record_hit))
+        self._patch(ShadowCache, 'record_miss', self._shadow_cache('misses', ShadowCache.record_miss))
+
+    def disable(self):
+        global _active
+        while self._originals:
+            owner, method, original = self._originals.pop()
+            setattr(owner, method, original)
+        if _active is self:
+            _active = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+
+    @contextmanager
+    def thread(self):
+        # A new profiler counting the calling thread's calls while this one is enabled, so threads never share the
+        # counters or the stacks of ray kinds and timed calls
+        profiler = type(self)()
+        previous = getattr(_threads, 'profiler', None)
+        _threads.profiler = profiler
+        try:
+            yield profiler
+        finally:
+            _threads.profiler = previous
+
+    def _counting(self):
+        # The profiler the calling thread counts into
+        return getattr(_threads, 'profiler', None) or self
+
+    def _patch(self, owner, method, wrapper):
+        self._originals.append((owner, method, owner.__dict__[method]))
+        setattr(owner, method, wrapper)
+
+    def _timed(self, name, original):
+        def wrapper(*args, **kwargs):
+            profiler = self._counting()
+            profiler.calls[name] += 1
+            if name == 'is_shadowed':
+                profiler.rays['shadow'] += 1
+            if name == 'pattern':
+                profiler.pattern_evaluations += 1
+            elif name == 'pattern_batch':
+                profiler.pattern_evaluations += len(args[2])
+            depth = profiler._depth.get(name, 0)
+            profiler._depth[name] = depth + 1
+            start = perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profiler._depth[name] = depth
+                if depth == 0:
+                    profiler.seconds[name] += perf_counter() - start
+        return wrapper
+
+    def _ray(self, original):
+        def wrapper(world, ray, *args, **kwargs):
+            profiler = self._counting()
+            profiler.rays[profiler._kinds[-1]] += 1
+            return original(world, ray, *args, **kwargs)
+        return wrapper
+
+    def _secondary(self, kind, original):
+        # Any colour_at call made while a reflected or refracted colour is being computed is a ray of that kind
+        def wrapper(*args, **kwargs):
+            kinds = self._counting()._kinds
+            kinds.append(kind)
+            try:
+                return original(*args, **kwargs)
+            finally:
+                kinds.pop()
+        return wrapper
+
+    def _intersects(self, original):
+        def wrapper(shape, *args):
+            name = type(shape).__name__
+            intersections = self._counting().intersections
+            intersections[name] = intersections.get(name, 0) + 1
+            return original(shape, *args)
+        return wrapper
+
+    def _prepare(self, original):
+        def wrapper(*args, **kwargs):
+            self._counting().prepare_computations += 1
+            return original(*args, **kwargs)
+        return wrapper
+
+    def _shadow_cache(self, name, original):
+        def wrapper(*args, **kwargs):
+            self._counting().shadow_cache[name] += 1
+            return original(*args, **kwargs)
+        return wrapper
+
+    def report(self):
+        return {
+            'render_seconds': self.render_seconds,
+            'rays': dict(self.rays),
+            'intersection_tests': dict(sorted(self.intersections.items())),
+            'prepare_computations': self.prepare_computations,
+            'pattern_evaluations': self.pattern_evaluations,
+            'shadow_cache': dict(self.shadow_cache),
+            'calls': dict(self.calls),
+            'seconds': dict(self.seconds),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+    def merge(self, report):
+        # Adds the counts and times from another profiler's report, e.g. one collected in a render worker process.
+        # Phase times from several workers are summed, so they can exceed the render's wall-clock time.
+        for kind, count in report['rays'].items():
+            self.rays[kind] += count
+        for name, count in report['intersection_tests'].items():
+            self.intersections[name] = self.intersections.get(name, 0) + count
+        self.prepare_computations += report['prepare_computations']
+        self.pattern_evaluations += report['pattern_evaluations']
+        for name, count in report['shadow_cache'].items():
+            self.shadow_cache[name] += count
+        for name in TIMED:
+            self.calls[name] += report['calls'][name]
+            self.seconds[name] += report['seconds'][name]
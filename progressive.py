@@ -0,0 +1,213 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from time import perf_counter
+from canvas import Canvas
+from matrices import Matrix
+from tuples import Tuple
+
+
+def scene_fingerprint(camera, world, reflect_depth):
+    # A digest of everything that affects the rendered image, used to refuse resuming a checkpoint against a
+    # different scene
+    digest = hashlib.sha256()
+    _describe((camera.hsize, camera.vsize, camera.field_of_view, camera.transform, world, reflect_depth), digest)
+    return digest.hexdigest()
+
+
+def _describe(value, digest):
+    if isinstance(value, np.ndarray):
+        digest.update(b'ndarray' + np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, Matrix):
+        digest.update(b'Matrix' + np.ascontiguousarray(value.matrix, dtype=float).tobytes())
+    elif isinstance(value, Tuple):
+        digest.update(f'{type(value).__name__}({value.x!r},{value.y!r},{value.z!r},{value.w!r})'.encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}[{len(value)}]'.encode())
+        for item in value:
+            _describe(item, digest)
+    elif isinstance(value, (int, float, str, bool)) or value is None:
+        digest.update(repr(value).encode())
+    elif isinstance(value, dict):
+        digest.update(f'dict[{len(value)}]'.encode())
+        for key, item in sorted(value.items(), key=lambda pair: repr(pair[0])):
+            _describe(key, digest)
+            _describe(item, digest)
+    else:
+        digest.update(type(value).__name__.encode())
+        for name, attribute in sorted(_attributes(value).items()):
+            digest.update(name.encode())
+            _describe(attribute, digest)
+
+
+def _attributes(value):
+    # Classes which keep render caches leave them out through a __fingerprint__ method returning the attributes which
+    # describe them. Anything else is described by every attribute it holds, in its __dict__ or its __slots__.
+    if hasattr(value, '__fingerprint__'):
+        return value.__fingerprint__()
+    attributes = dict(getattr(value, '__dict__', {}))
+    for cls in type(value).__mro__:
+        slots = getattr(cls, '__slots__', ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if not name.startswith('__') and hasattr(value, name):
+                attributes[name] = getattr(value, name)
+    return attributes
+
+
+def pass_offsets(step):
+    # Pixel offsets within a step x step block, coarse to fine: the block's corner first, then the points halving the
+    # spacing of those already rendered, so every pass fills in a progressively finer interleaved lattice
+    if step < 1 or step & (step - 1):
+        raise ValueError('step must be a power of two')
+    offsets = []
+    spacing = step
+    while spacing >= 1:
+        for y in range(0, step, spacing):
+            for x in range(0, step, spacing):
+                if (x, y) not in offsets:
+                    offsets.append((x, y))
+        spacing //= 2
+    return offsets
+
+
+class ProgressiveRender:
+    """Renders an image in interleaved passes which can be previewed, interrupted, checkpointed and resumed.
+
+    The first pass renders one pixel in each step x step block, and each later pass fills in a finer lattice until
+    every pixel has its centre sample. With samples > 1 the passes then repeat with jittered sub-pixel offsets, and
+    every pixel's colour is the mean of the samples accumulated so far."""
+
+    def __init__(self, camera, world, reflect_depth=5, step=8, samples=1, tile_size=64, seed=0, checkpoint=None,
+                 checkpoint_interval=60.0):
+        self.camera = camera
+        self.world = world
+        self.reflect_depth = reflect_depth
+        self.offsets = pass_offsets(step)
+        self.step = step
+        self.samples = samples
+        self.tile_size = tile_size
+        self.tiles = list(camera.tiles(tile_size))
+        self.seed = seed
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.fingerprint = scene_fingerprint(camera, world, reflect_depth)
+        self.total = self.samples * len(self.offsets) * len(self.tiles)
+        self.completed = 0
+        self.sum = np.zeros((camera.vsize, camera.hsize, 3))
+        self.count = np.zeros((camera.vsize, camera.hsize), dtype=np.int32)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self.load(checkpoint)
+
+    @property
+    def progress(self):
+        return self.completed / self.total
+
+    @property
+    def finished(self):
+        return self.completed == self.total
+
+    def units(self):
+        # Every (sample, offset, tile) unit of work in render order
+        for sample in range(self.samples):
+            for offset in self.offsets:
+                for tile in self.tiles:
+                    yield sample, offset, tile
+
+    def render_unit(self, index, sample, offset, tile):
+        # Returns the pixel coordinates and colours of one pass over one tile. Sub-pixel jitter is drawn from a
+        # generator seeded by the unit, so a resumed render takes exactly the samples the uninterrupted one would have.
+        x0, y0, x1, y1 = tile
+        xs = np.arange(x0 + (offset[0] - x0) % self.step, x1, self.step)
+        ys = np.arange(y0 + (offset[1] - y0) % self.step, y1, self.step)
+        xs, ys = np.meshgrid(xs, ys)
+        xs, ys = xs.ravel(), ys.ravel()
+        if sample == 0:
+            jitter = np.full((len(xs), 2), 0.5)
+        else:
+            jitter = np.random.default_rng((self.seed, index)).random((len(xs), 2))
+        colours = np.empty((len(xs), 3))
+        for i, (x, y, sub_x, sub_y) in enumerate(zip(xs.tolist(), ys.tolist(), *jitter.T.tolist())):
+            colour = self.world.colour_at(self.camera.ray_for_pixel(x, y, sub_x, sub_y), self.reflect_depth)
+            colours[i] = (colour.red, colour.green, colour.blue)
+        return ys, xs, colours
+
+    def run(self):
+        # Renders until every pass is complete or stop() is called, checkpointing every checkpoint_interval seconds
+        # and whenever the render ends, including by KeyboardInterrupt. Returns the image rendered so far.
+        self._stop.clear()
+        self.world.prepare()
+        last_checkpoint = perf_counter()
+        try:
+            for index, (sample, offset, tile) in enumerate(self.units()):
+                if index < self.completed:
+                    continue
+                if self._stop.is_set():
+                    break
+                ys, xs, colours = self.render_unit(index, sample, offset, tile)
+                with self._lock:
+                    self.sum[ys, xs] += colours
+                    self.count[ys, xs] += 1
+                    self.completed = index + 1
+                if self.checkpoint is not None and perf_counter() - last_checkpoint >= self.checkpoint_interval:
+                    self.save(self.checkpoint)
+                    last_checkpoint = perf_counter()
+        finally:
+            if self.checkpoint is not None:
+                self.save(self.checkpoint)
+        return self.preview()
+
+    def start(self):
+        # Runs the render on a background thread, leaving the caller free to take previews or stop it
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, wait=True):
+        # The render stops once the unit in progress is complete
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.finished
+
+    def preview(self):
+        # The image so far. Pixels not rendered yet take the colour of the rendered pixel at the corner of their
+        # step x step block, which the first pass covers, or stay black before that.
+        with self._lock:
+            total = self.sum.copy()
+            count = self.count.copy()
+        pixels = total / np.maximum(count, 1)[:, :, None]
+        missing = count == 0
+        if missing.any():
+            coarse = np.repeat(np.repeat(pixels[::self.step, ::self.step], self.step, axis=0), self.step, axis=1)
+            pixels[missing] = coarse[:self.camera.vsize, :self.camera.hsize][missing]
+        image = Canvas(self.camera.hsize, self.camera.vsize)
+        image.write_tile(0, 0, pixels)
+        return image
+
+    def save(self, file_name):
+        # Written to a temporary file first so an interruption mid-write never leaves a corrupt checkpoint
+        with self._lock:
+            state = dict(sum=self.sum, count=self.count, completed=self.completed, fingerprint=self.fingerprint,
+                         layout=(self.step, self.samples, self.tile_size, self.seed))
+            with open(file_name + '.tmp', 'wb') as f:
+                np.savez(f, **state)
+        os.replace(file_name + '.tmp', file_name)
+
+    def load(self, file_name):
+        with np.load(file_name) as state:
+            if str(state['fingerprint']) != self.fingerprint:
+                raise ValueError(f'Checkpoint {file_name} was saved for a different scene')
+            if tuple(state['layout']) != (self.step, self.samples, self.tile_size, self.seed):
+                raise ValueError(f'Checkpoint {file_name} was saved with different pass settings')
+            with self._lock:
+                self.sum = state['sum']
+                self.count = state['count']
+                self.completed = int(state['completed'])
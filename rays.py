@@ -1,4 +1,5 @@
-from tuples import Point
+import numpy as np
+from tuples import Point, Vector
 
 
 class Ray:
@@ -10,4 +11,47 @@ class Ray:
         return Point.from_tuple(self.origin + self.direction * t)
 
     def transform(self, matrix):
-        return Ray(matrix * self.origin, matrix * self.direction)
+        if not matrix.is_affine:
+            return Ray(matrix * self.origin, matrix * self.direction)
+        # An affine matrix leaves a point a point and a vector a vector, so both are worked out directly from the
+        # matrix's cached rows without going through intermediate tuples
+        (a, b, c, d), (e, f, g, h), (i, j, k, l), _ = matrix.rows
+        origin = self.origin
+        direction = self.direction
+        x, y, z = origin.x, origin.y, origin.z
+        dx, dy, dz = direction.x, direction.y, direction.z
+        return Ray(Point(a * x + b * y + c * z + d, e * x + f * y + g * z + h, i * x + j * y + k * z + l),
+                   Vector(a * dx + b * dy + c * dz, e * dx + f * dy + g * dz, i * dx + j * dy + k * dz))
+
+
+class RayBatch:
+    """Structure-of-arrays bundle of rays, holding origins and directions as (N, 4) arrays"""
+    def __init__(self, origins, directions):
+        self.origins = np.asarray(origins, dtype=float).reshape(-1, 4)
+        self.directions = np.asarray(directions, dtype=float).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.origins)
+
+    def __getitem__(self, index):
+        ox, oy, oz, _ = self.origins[index].tolist()
+        dx, dy, dz, _ = self.directions[index].tolist()
+        return Ray(Point(ox, oy, oz), Vector(dx, dy, dz))
+
+    def __iter__(self):
+        for (ox, oy, oz, _), (dx, dy, dz, _) in zip(self.origins.tolist(), self.directions.tolist()):
+            yield Ray(Point(ox, oy, oz), Vector(dx, dy, dz))
+
+    def select(self, indices):
+        # A batch of the rays at the given indices
+        return RayBatch(self.origins[indices], self.directions[indices])
+
+    @classmethod
+    def from_rays(cls, rays):
+        return cls([r.origin.vec for r in rays], [r.direction.vec for r in rays])
+
+    def position(self, t):
+        return self.origins + self.directions * np.asarray(t, dtype=float).reshape(-1, 1)
+
+    def transform(self, matrix):
+        return RayBatch(self.origins @ matrix.matrix.T, self.directions @ matrix.matrix.T)
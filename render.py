@@ -0,0 +1,199 @@
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+from multiprocessing import Pool
+from pathlib import Path
+from time import perf_counter
+from camera import BACKENDS, Camera
+from scene import SceneError, load_data, load_scene
+
+
+FORMATS = ('ppm', 'png', 'jpeg', 'bmp', 'tiff')
+SCENE_SUFFIXES = ('.json', '.yaml', '.yml')
+
+# Keys a manifest job may set, with the defaults used when neither the job nor the command line gives one
+JOB_DEFAULTS = {
+    'scene': None,
+    'output': None,
+    'format': None,
+    'width': None,
+    'height': None,
+    'depth': 5,
+    'tile-size': 16,
+}
+
+
+def scene_builder(spec):
+    # The builder function named by 'module:function', where module is a .py file or an importable module name and
+    # the function defaults to build_scene
+    module_name, _, function = spec.partition(':')
+    function = function or 'build_scene'
+    if module_name.endswith('.py'):
+        path = Path(module_name).resolve()
+        if not path.exists():
+            raise SceneError(f'{module_name}: no such scene module')
+        # Scene modules may import their neighbours, as the chapters do when run from their own directory
+        if str(path.parent) not in sys.path:
+            sys.path.append(str(path.parent))
+        module_spec = importlib.util.spec_from_file_location(path.stem, path)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    if not callable(getattr(module, function, None)):
+        raise SceneError(f'{module_name} has no scene builder {function}()')
+    return getattr(module, function)
+
+
+def build(scene, width=None, height=None):
+    # A (world, camera) pair from a scene file or builder. A scene file's camera is resized when a width or height is
+    # given, while a builder is passed them to use in place of its own defaults.
+    if Path(scene).suffix.lower() in SCENE_SUFFIXES:
+        world, camera = load_scene(scene)
+        if width is not None or height is not None:
+            resized = Camera(width or camera.hsize, height or camera.vsize, camera.field_of_view)
+            resized.transform = camera.transform
+            camera = resized
+        return world, camera
+    size = {name: value for name, value in (('width', width), ('height', height)) if value is not None}
+    return scene_builder(scene)(**size)
+
+
+def write_image(canvas, file_name, format):
+    # PPM is written by the canvas itself as plain text, as the chapters do, and the other formats by PIL
+    if format == 'ppm':
+        canvas.canvas_to_ppm(file_name)
+    else:
+        canvas.image.save(file_name, format=format.upper())
+
+
+def output_settings(job):
+    format = job['format']
+    output = job['output']
+    if format is None:
+        suffix = Path(output).suffix.lower().lstrip('.') if output else ''
+        format = {'jpg': 'jpeg', 'tif': 'tiff'}.get(suffix, suffix) if suffix else 'ppm'
+    if format not in FORMATS:
+        raise SceneError(f'unknown output format {format!r}, expected one of {", ".join(FORMATS)}')
+    if output is None:
+        output = f'{Path(job["scene"].partition(":")[0]).stem}.{format}'
+    return output, format
+
+
+def render_job(job, workers=1, pool=None, backend='process'):
+    # Renders one job and returns its timing record. Failures are recorded rather than raised, so one bad job
+    # doesn't stop a batch, whatever a scene builder raises.
+    record = {'scene': job['scene'], 'output': job['output'], 'status': 'ok'}
+    start = perf_counter()
+    try:
+        output, format = output_settings(job)
+        record['output'] = output
+        world, camera = build(job['scene'], job['width'], job['height'])
+        loaded = perf_counter()
+        canvas = camera.render(world, job['depth'], workers=workers, tile_size=job['tile-size'], pool=pool,
+                               backend=backend)
+        rendered = perf_counter()
+        write_image(canvas, output, format)
+        written = perf_counter()
+    except Exception as error:
+        record.update(status='error', error=f'{type(error).__name__}: {error}',
+                      total_seconds=perf_counter() - start)
+        return record
+
+    record.update(width=camera.hsize, height=camera.vsize, depth=job['depth'], format=format,
+                  load_seconds=loaded - start, render_seconds=rendered - loaded, write_seconds=written - rendered,
+                  total_seconds=written - start,
+                  pixels_per_second=camera.hsize * camera.vsize / (rendered - loaded))
+    return record
+
+
+def read_manifest(file_name, defaults):
+    # A manifest is a JSON or YAML list of jobs, each a mapping of JOB_DEFAULTS keys. Relative scene and output paths
+    # are taken from the manifest's directory.
+    jobs = load_data(file_name)
+    if not isinstance(jobs, list):
+        raise SceneError(f'{file_name}: expected a list of jobs')
+    directory = Path(file_name).parent
+    result = []
+    for index, job in enumerate(jobs):
+        if not isinstance(job, dict) or 'scene' not in job:
+            raise SceneError(f'{file_name}: job {index + 1}: expected a mapping with a scene')
+        unknown = job.keys() - JOB_DEFAULTS.keys()
+        if unknown:
+            raise SceneError(f'{file_name}: job {index + 1}: unknown keys {", ".join(sorted(unknown))}')
+        job = {**defaults, **job}
+        module, colon, function = job['scene'].partition(':')
+        if module.endswith('.py') or Path(module).suffix.lower() in SCENE_SUFFIXES:
+            job['scene'] = str(directory / module) + colon + function
+        if job['output'] is not None:
+            job['output'] = str(directory / job['output'])
+        result.append(job)
+    return result
+
+
+def run(jobs, workers=1, stream=None, backend='process'):
+    # Renders every job, sharing one pool of worker processes between them (threads are cheap enough to start for
+    # each job), and writes a JSON timing record for each job and then for the whole batch, one per line, to stream
+    # or by default stdout. Returns the number of jobs which failed.
+    stream = sys.stdout if stream is None else stream
+    start = perf_counter()
+    pool = Pool(workers) if backend == 'process' and workers > 1 and len(jobs) > 1 else None
+    pool_seconds = perf_counter() - start
+    failed = 0
+    try:
+        for index, job in enumerate(jobs):
+            record = render_job(job, workers, pool, backend)
+            failed += record['status'] != 'ok'
+            stream.write(json.dumps({'job': index + 1, **record}) + '\n')
+            stream.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    stream.write(json.dumps({'jobs': len(jobs), 'failed': failed, 'workers': workers, 'backend': backend,
+                             'pool_seconds': pool_seconds, 'total_seconds': perf_counter() - start}) + '\n')
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render scene files or Python scene builders, one at a time or as a '
+                                                 'batch from a manifest, writing a JSON timing record for each job')
+    parser.add_argument('scene', nargs='?', help='a .yaml, .yml or .json scene, or a Python scene builder given as '
+                                                 'module.py or module.py:function (default function: build_scene)')
+    parser.add_argument('-m', '--manifest', help='a .json or .yaml list of jobs, each with a scene and optionally '
+                                                 'output, format, width, height, depth and tile-size')
+    parser.add_argument('-o', '--output', help='image file (default: the scene name with the format as extension)')
+    parser.add_argument('-f', '--format', choices=FORMATS, help='image format (default: from the output file, or ppm)')
+    parser.add_argument('--width', type=int, help="image width (default: the scene's own)")
+    parser.add_argument('--height', type=int, help="image height (default: the scene's own)")
+    parser.add_argument('-d', '--depth', type=int, default=5, help='reflection and refraction depth (default: 5)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='workers, shared by every job (default: one per CPU)')
+    parser.add_argument('-b', '--backend', choices=BACKENDS, default='process',
+                        help='run the workers as processes or as threads. Threads share one copy of the scene but '
+                             'only render in parallel on a free-threaded Python build (default: process)')
+    parser.add_argument('-t', '--tile-size', type=int, default=16, help='tile edge in pixels (default: 16)')
+    arguments = parser.parse_args(argv)
+    if (arguments.scene is None) == (arguments.manifest is None):
+        parser.error('give either a scene or a --manifest')
+    if arguments.manifest is not None and arguments.output is not None:
+        parser.error('--output applies to a single scene; give each manifest job its own output')
+
+    defaults = dict(JOB_DEFAULTS, format=arguments.format, width=arguments.width, height=arguments.height,
+                    depth=arguments.depth)
+    defaults['tile-size'] = arguments.tile_size
+    if arguments.manifest is None:
+        jobs = [dict(defaults, scene=arguments.scene, output=arguments.output)]
+    else:
+        try:
+            jobs = read_manifest(arguments.manifest, defaults)
+        except (SceneError, ImportError, OSError) as error:
+            parser.error(str(error))
+    return 1 if run(jobs, max(1, arguments.workers), backend=arguments.backend) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,384 @@
+import json
+import numpy as np
+from math import pi
+from pathlib import Path
+from camera import Camera
+from colours import Colour
+from lights import PointLight
+from materials import Material
+from matrices import Matrix
+from mesh import Mesh, load_obj
+from patterns import StripePattern, GradientPattern, DoubleGradientPattern, RingPattern, GradientRingPattern, \
+    DoubleGradientRingPattern, CheckersPattern, BlendedPattern, NestedPattern, PerturbedPattern
+from primitives import Sphere, Plane, Cube, Cylinder, Cone, Group
+from transformations import Transformations
+from tuples import Point, Vector
+from world import World
+
+
+class SceneError(ValueError):
+    pass
+
+
+SHAPES = {
+    'sphere': Sphere,
+    'plane': Plane,
+    'cube': Cube,
+    'cylinder': Cylinder,
+    'cone': Cone,
+    'group': Group,
+    'obj': Mesh,
+}
+
+# Patterns taking two colours
+COLOUR_PATTERNS = {
+    'stripes': StripePattern,
+    'gradient': GradientPattern,
+    'double-gradient': DoubleGradientPattern,
+    'rings': RingPattern,
+    'gradient-rings': GradientRingPattern,
+    'double-gradient-rings': DoubleGradientRingPattern,
+    'checkers': CheckersPattern,
+}
+
+# Scene keys for each Material constructor argument
+MATERIAL_KEYS = {
+    'color': 'colour',
+    'ambient': 'ambient',
+    'diffuse': 'diffuse',
+    'specular': 'specular',
+    'shininess': 'shininess',
+    'reflective': 'reflective',
+    'transparency': 'transparency',
+    'refractive-index': 'refractive_index',
+    'casts-shadow': 'casts_shadow',
+    'shadow-transmission': 'shadow_transmission',
+}
+
+TRANSFORMS = {
+    'translate': (3, Matrix.translation),
+    'scale': (3, Matrix.scaling),
+    'rotate-x': (1, Matrix.rotation_x),
+    'rotate-y': (1, Matrix.rotation_y),
+    'rotate-z': (1, Matrix.rotation_z),
+    'shear': (6, Matrix.shearing),
+}
+
+
+def load_scene(file_name):
+    # A (world, camera) pair from a .json, .yaml or .yml scene file
+    return SceneLoader(str(file_name), Path(file_name).parent).load(load_data(file_name))
+
+
+def load_data(file_name):
+    file_name = Path(file_name)
+    if file_name.suffix.lower() not in ('.json', '.yaml', '.yml'):
+        raise SceneError(f'{file_name}: expected a .json, .yaml or .yml file')
+    with open(file_name, encoding='utf-8') as f:
+        return parse_data(f.read(), 'json' if file_name.suffix.lower() == '.json' else 'yaml', str(file_name))
+
+
+def parse_scene(text, format='yaml', source='<scene>'):
+    return SceneLoader(source).load(parse_data(text, format, source))
+
+
+def parse_data(text, format='yaml', source='<scene>'):
+    # The data in a JSON or YAML document. PyYAML is only needed for YAML.
+    if format == 'json':
+        try:
+            items = json.loads(text)
+        except json.JSONDecodeError as error:
+            raise SceneError(f'{source}: {error}') from error
+    elif format == 'yaml':
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError('PyYAML is required to load YAML scenes: pip install pyyaml, or use a JSON scene') \
+                from None
+        try:
+            items = yaml.load(text, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        except yaml.YAMLError as error:
+            raise SceneError(f'{source}: {error}') from error
+    else:
+        raise SceneError(f'Unknown scene format {format!r}')
+    return items
+
+
+class SceneLoader:
+    """Builds a World and Camera from a scene description in the style of the Ray Tracer Challenge's YAML scenes.
+
+    A scene is a list of items, each either adding a camera, light or shape or defining a named material, pattern or
+    transform for later items to use. Named materials and patterns are built once and shared by every object that
+    refers to them, and a definition can extend an earlier one, overriding some of its keys. OBJ files added as
+    meshes are found relative to directory, which is the scene file's own when loaded from a file."""
+
+    def __init__(self, source='<scene>', directory='.'):
+        self.source = source
+        self.directory = Path(directory)
+        self.definitions = {}
+        self.materials = {}
+        self.patterns = {}
+        self.transforms = {}
+        # Names whose definitions are being built, to catch definitions which refer back to themselves
+        self.building = set()
+
+    def error(self, where, message):
+        return SceneError(f'{self.source}: {where}: {message}')
+
+    def load(self, items):
+        if not isinstance(items, list):
+            raise self.error('scene', 'expected a list of items')
+        world = World()
+        camera = None
+        for index, item in enumerate(items):
+            where = f'item {index + 1}'
+            if not isinstance(item, dict):
+                raise self.error(where, 'expected a mapping')
+            if 'define' in item:
+                self.define(item, where)
+            elif 'add' in item:
+                kind = item['add']
+                if not isinstance(kind, str):
+                    raise self.error(where, 'expected the name of the item to add')
+                where = f'{where} ({kind})'
+                if kind == 'camera':
+                    if camera is not None:
+                        raise self.error(where, 'the scene already has a camera')
+                    camera = self.camera(item, where)
+                elif kind == 'light':
+                    world.lights.append(self.light(item, where))
+                elif kind in SHAPES:
+                    world.objects.append(self.shape(item, where))
+                else:
+                    raise self.error(where, f'unknown item, expected one of camera, light, {", ".join(SHAPES)}')
+            else:
+                raise self.error(where, "expected an 'add' or 'define' key")
+        if camera is None:
+            raise self.error('scene', 'no camera was added')
+        return world, camera
+
+    def define(self, item, where):
+        self.check_keys(item, where, {'define', 'value'}, {'extend'})
+        name = item['define']
+        if not isinstance(name, str):
+            raise self.error(where, 'the name of a definition must be a string')
+        where = f'{where} ({name})'
+        if name in self.definitions:
+            raise self.error(where, f'{name!r} is already defined')
+        value = item['value']
+        if 'extend' in item:
+            parent = self.definitions.get(item['extend']) if isinstance(item['extend'], str) else None
+            if parent is None:
+                raise self.error(where, f'cannot extend {item["extend"]!r}, which has not been defined')
+            if not isinstance(parent, dict) or not isinstance(value, dict):
+                raise self.error(where, 'only mappings can be extended')
+            value = {**parent, **value}
+        self.definitions[name] = value
+
+    def camera(self, item, where):
+        self.check_keys(item, where, {'add', 'width', 'height', 'field-of-view', 'from', 'to', 'up'})
+        field_of_view = self.number(item['field-of-view'], f'{where} field-of-view')
+        if not 0 < field_of_view < pi:
+            raise self.error(f'{where} field-of-view', f'expected an angle between 0 and pi, got {field_of_view!r}')
+        camera = Camera(self.integer(item['width'], f'{where} width'), self.integer(item['height'], f'{where} height'),
+                        field_of_view)
+        origin = Point(*self.triple(item['from'], f'{where} from'))
+        target = Point(*self.triple(item['to'], f'{where} to'))
+        if origin == target:
+            raise self.error(f'{where} to', "expected a point away from the camera's 'from' point")
+        try:
+            camera.transform = Transformations.view_transform(origin, target,
+                                                              Vector(*self.triple(item['up'], f'{where} up')))
+        except (ZeroDivisionError, np.linalg.LinAlgError):
+            raise self.error(f'{where} up', 'expected a direction which is not along the line of sight') from None
+        return camera
+
+    def light(self, item, where):
+        self.check_keys(item, where, {'add', 'at', 'intensity'})
+        return PointLight(Point(*self.triple(item['at'], f'{where} at')),
+                          Colour(*self.triple(item['intensity'], f'{where} intensity')))
+
+    def shape(self, item, where):
+        kind = item['add']
+        if kind == 'group':
+            return self.group(item, where)
+        extents = {'min', 'max', 'closed'} if kind in ('cylinder', 'cone') else set()
+        required = {'add', 'file'} if kind == 'obj' else {'add'}
+        self.check_keys(item, where, required, {'material', 'transform'} | extents)
+        obj = self.mesh(item['file'], f'{where} file') if kind == 'obj' else SHAPES[kind]()
+        if 'transform' in item:
+            self.set_transform(obj, item['transform'], f'{where} transform')
+        if 'material' in item:
+            obj.material = self.material(item['material'], f'{where} material')
+        if 'min' in item:
+            obj.minimum = self.number(item['min'], f'{where} min')
+        if 'max' in item:
+            obj.maximum = self.number(item['max'], f'{where} max')
+        if 'closed' in item:
+            if not isinstance(item['closed'], bool):
+                raise self.error(f'{where} closed', 'expected true or false')
+            obj.closed = item['closed']
+        return obj
+
+    def mesh(self, file_name, where):
+        if not isinstance(file_name, str):
+            raise self.error(where, 'expected the name of an OBJ file')
+        try:
+            return load_obj(self.directory / file_name)
+        except OSError as error:
+            raise self.error(where, f'cannot read {file_name!r}: {error.strerror or error}') from None
+        except ValueError as error:
+            raise self.error(where, str(error)) from None
+
+    def group(self, item, where):
+        # Children are shape items, including further groups, and share the group's transform
+        self.check_keys(item, where, {'add', 'children'}, {'transform'})
+        if not isinstance(item['children'], list):
+            raise self.error(f'{where} children', 'expected a list of shapes')
+        group = Group()
+        for index, child in enumerate(item['children']):
+            child_where = f'{where} child {index + 1}'
+            if not isinstance(child, dict) or not isinstance(child.get('add'), str) or child['add'] not in SHAPES:
+                raise self.error(child_where, f'expected a shape, one of {", ".join(SHAPES)}')
+            group.add_child(self.shape(child, f'{child_where} ({child["add"]})'))
+        if 'transform' in item:
+            self.set_transform(group, item['transform'], f'{where} transform')
+        return group
+
+    def material(self, value, where):
+        # A named material is built once and shared, while a mapping builds a new one
+        if isinstance(value, str):
+            return self.named(value, where, self.materials, self.material)
+        if not isinstance(value, dict):
+            raise self.error(where, 'expected a mapping or the name of a defined material')
+        self.check_keys(value, where, set(), set(MATERIAL_KEYS) | {'pattern'})
+        arguments = {}
+        for key, item in value.items():
+            if key == 'pattern':
+                continue
+            argument = MATERIAL_KEYS[key]
+            if argument == 'colour':
+                arguments[argument] = self.colour(item, f'{where} {key}')
+            elif argument == 'casts_shadow':
+                if not isinstance(item, bool):
+                    raise self.error(f'{where} {key}', 'expected true or false')
+                arguments[argument] = item
+            else:
+                arguments[argument] = self.number(item, f'{where} {key}')
+        material = Material(**arguments)
+        if 'pattern' in value:
+            material.pattern = self.pattern(value['pattern'], f'{where} pattern')
+        return material
+
+    def pattern(self, value, where):
+        if isinstance(value, str):
+            return self.named(value, where, self.patterns, self.pattern)
+        if not isinstance(value, dict) or 'type' not in value:
+            raise self.error(where, "expected a mapping with a 'type' or the name of a defined pattern")
+        kind = value['type']
+        if not isinstance(kind, str):
+            raise self.error(where, f'unknown pattern type {kind!r}')
+        if kind in COLOUR_PATTERNS:
+            self.check_keys(value, where, {'type', 'colors'}, {'transform'})
+            colours = value['colors']
+            if not isinstance(colours, list) or len(colours) != 2:
+                raise self.error(f'{where} colors', 'expected a list of two colours')
+            pattern = COLOUR_PATTERNS[kind](*(self.colour(colour, f'{where} colors') for colour in colours))
+        elif kind in ('blended', 'nested'):
+            self.check_keys(value, where, {'type', 'patterns'} | ({'pattern'} if kind == 'nested' else set()),
+                            {'transform'})
+            patterns = value['patterns']
+            if not isinstance(patterns, list) or len(patterns) != 2:
+                raise self.error(f'{where} patterns', 'expected a list of two patterns')
+            patterns = [self.pattern(pattern, f'{where} patterns') for pattern in patterns]
+            if kind == 'blended':
+                pattern = BlendedPattern(*patterns)
+            else:
+                pattern = NestedPattern(self.pattern(value['pattern'], f'{where} pattern'), *patterns)
+        elif kind == 'perturbed':
+            self.check_keys(value, where, {'type', 'pattern'},
+                            {'transform', 'scale', 'octaves', 'persistence', 'lacunarity'})
+            settings = {key: self.number(value[key], f'{where} {key}') for key in
+                        ('scale', 'persistence', 'lacunarity') if key in value}
+            if 'octaves' in value:
+                settings['octaves'] = self.integer(value['octaves'], f'{where} octaves')
+            pattern = PerturbedPattern(self.pattern(value['pattern'], f'{where} pattern'), **settings)
+        else:
+            raise self.error(where, f'unknown pattern type {kind!r}')
+        if 'transform' in value:
+            self.set_transform(pattern, value['transform'], f'{where} transform')
+        return pattern
+
+    def transform(self, value, where):
+        # A list of transforms applied in order, so the first one listed is applied to the object first. Entries are
+        # either [operation, arguments...] or the name of a defined transform list.
+        if isinstance(value, str):
+            return self.named(value, where, self.transforms, self.transform)
+        if not isinstance(value, list):
+            raise self.error(where, 'expected a list of transforms or the name of a defined transform')
+        matrix = None
+        for step in value:
+            if isinstance(step, str):
+                step_matrix = self.transform(step, where)
+                matrix = step_matrix if matrix is None else step_matrix * matrix
+                continue
+            if not isinstance(step, list) or not step or not isinstance(step[0], str) or step[0] not in TRANSFORMS:
+                raise self.error(where, f'expected [operation, arguments...] with an operation from '
+                                        f'{", ".join(TRANSFORMS)}, got {step!r}')
+            count, operation = TRANSFORMS[step[0]]
+            if len(step) != count + 1:
+                raise self.error(where, f'{step[0]} takes {count} argument{"s" if count > 1 else ""}')
+            step_matrix = operation(*(self.number(argument, where) for argument in step[1:]))
+            matrix = step_matrix if matrix is None else step_matrix * matrix
+        return Matrix.identity(4) if matrix is None else matrix
+
+    def set_transform(self, target, value, where):
+        # Shapes and patterns invert their transforms as soon as they are set
+        matrix = self.transform(value, where)
+        try:
+            target.transform = matrix
+        except np.linalg.LinAlgError:
+            raise self.error(where, 'the transform cannot be inverted, as it scales an axis to zero') from None
+
+    def named(self, name, where, built, build):
+        # A defined material, pattern or transform, built by build the first time it is used and shared after that
+        if name not in built:
+            if name in self.building:
+                raise self.error(where, f'{name!r} is defined in terms of itself')
+            self.building.add(name)
+            try:
+                built[name] = build(self.lookup(name, where), f'{where} ({name})')
+            finally:
+                self.building.discard(name)
+        return built[name]
+
+    def lookup(self, name, where):
+        if name not in self.definitions:
+            raise self.error(where, f'{name!r} has not been defined')
+        return self.definitions[name]
+
+    def check_keys(self, item, where, required, optional=frozenset()):
+        missing = required - item.keys()
+        if missing:
+            raise self.error(where, f'missing {", ".join(sorted(missing))}')
+        unknown = item.keys() - required - optional
+        if unknown:
+            raise self.error(where, f'unknown key{"s" if len(unknown) > 1 else ""} {", ".join(sorted(unknown))}')
+
+    def number(self, value, where):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise self.error(where, f'expected a number, got {value!r}')
+        return value
+
+    def integer(self, value, where):
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise self.error(where, f'expected a positive integer, got {value!r}')
+        return value
+
+    def triple(self, value, where):
+        if not isinstance(value, list) or len(value) != 3:
+            raise self.error(where, f'expected a list of three numbers, got {value!r}')
+        return [self.number(item, where) for item in value]
+
+    def colour(self, value, where):
+        return Colour(*self.triple(value, where))
@@ -0,0 +1,214 @@
+import sys
+sys.path.append('..')
+import unittest
+from bounds import BoundingBox, ray_hits_box
+from primitives import *
+from matrices import Matrix
+from rays import Ray
+from math import pi, inf
+
+
+class BoundingBoxTestCase(unittest.TestCase):
+    def test_creating_an_empty_bounding_box(self):
+        # Arrange
+
+        # Act
+        box = BoundingBox()
+
+        # Assert
+        self.assertEqual((box.minimum.x, box.minimum.y, box.minimum.z), (inf, inf, inf))
+        self.assertEqual((box.maximum.x, box.maximum.y, box.maximum.z), (-inf, -inf, -inf))
+
+    def test_adding_points_to_an_empty_bounding_box(self):
+        # Arrange
+        box = BoundingBox()
+
+        # Act
+        box.add_point(Point(-5, 2, 0))
+        box.add_point(Point(7, 0, -3))
+
+        # Assert
+        self.assertEqual(box.minimum, Point(-5, 0, -3))
+        self.assertEqual(box.maximum, Point(7, 2, 0))
+
+    def test_a_sphere_has_a_bounding_box(self):
+        # Arrange
+        s = Sphere()
+
+        # Act
+        box = s.bounds()
+
+        # Assert
+        self.assertEqual(box.minimum, Point(-1, -1, -1))
+        self.assertEqual(box.maximum, Point(1, 1, 1))
+
+    def test_a_plane_has_an_unbounded_bounding_box(self):
+        # Arrange
+        p = Plane()
+
+        # Act
+        box = p.bounds()
+
+        # Assert
+        self.assertEqual(box.minimum.y, 0)
+        self.assertEqual(box.maximum.y, 0)
+        self.assertFalse(box.is_finite)
+
+    def test_a_bounded_cylinder_has_a_bounding_box(self):
+        # Arrange
+        c = Cylinder()
+        c.minimum = -5
+        c.maximum = 3
+
+        # Act
+        box = c.bounds()
+
+        # Assert
+        self.assertEqual(box.minimum, Point(-1, -5, -1))
+        self.assertEqual(box.maximum, Point(1, 3, 1))
+
+    def test_a_bounded_cone_has_a_bounding_box(self):
+        # Arrange
+        c = Cone()
+        c.minimum = -5
+        c.maximum = 3
+
+        # Act
+        box = c.bounds()
+
+        # Assert
+        self.assertEqual(box.minimum, Point(-5, -5, -5))
+        self.assertEqual(box.maximum, Point(5, 3, 5))
+
+    def test_transforming_a_bounding_box(self):
+        # Arrange
+        box = BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+        matrix = Matrix.rotation_x(pi / 4) * Matrix.rotation_y(pi / 4)
+
+        # Act
+        box2 = box.transform(matrix)
+
+        # Assert
+        self.assertEqual(box2.minimum, Point(-1.41421, -1.70711, -1.70711))
+        self.assertEqual(box2.maximum, Point(1.41421, 1.70711, 1.70711))
+
+    def test_intersecting_a_ray_with_a_bounding_box_at_the_origin(self):
+        # Arrange
+        box = BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+        scenarios = [(Point(5, 0.5, 0), Vector(-1, 0, 0), True),
+                     (Point(-5, 0.5, 0), Vector(1, 0, 0), True),
+                     (Point(0.5, 5, 0), Vector(0, -1, 0), True),
+                     (Point(0, 0.5, 0), Vector(0, 0, 1), True),
+                     (Point(0, 0, 5), Vector(0, 0, 1), True),
+                     (Point(-2, 0, 0), Vector(2, 4, 6), False),
+                     (Point(0, -2, 0), Vector(6, 2, 4), False),
+                     (Point(2, 2, 0), Vector(-1, 0, 0), False),
+                     (Point(0, 2, 2), Vector(0, -1, 0), False)]
+
+        for origin, direction, expected in scenarios:
+            with self.subTest(origin=origin, direction=direction):
+                # Act
+                result = box.intersects(Ray(origin, direction.normalise()))
+
+                # Assert
+                self.assertEqual(result, expected)
+
+    def test_a_cube_has_a_bounding_box(self):
+        # Arrange
+        c = Cube()
+
+        # Act
+        box = c.bounds()
+
+        # Assert
+        self.assertEqual(box.minimum, Point(-1, -1, -1))
+        self.assertEqual(box.maximum, Point(1, 1, 1))
+
+    def test_an_unbounded_cylinder_and_cone_have_infinite_bounding_boxes(self):
+        for shape in (Cylinder(), Cone()):
+            with self.subTest(shape=type(shape).__name__):
+                # Arrange
+                # Act
+                box = shape.bounds()
+
+                # Assert
+                self.assertFalse(box.is_finite)
+                self.assertEqual((box.minimum.y, box.maximum.y), (-inf, inf))
+
+    def test_the_slab_test_on_raw_coordinates(self):
+        # Arrange
+        box = (5, -2, 0, 11, 4, 7)
+        scenarios = [((15, 1, 2), (-1, 0, 0), True),
+                     ((-5, -1, 4), (1, 0, 0), True),
+                     ((7, 6, 5), (0, -1, 0), True),
+                     ((9, -5, 6), (0, 1, 0), True),
+                     ((8, 2, 12), (0, 0, -1), True),
+                     ((6, 0, -5), (0, 0, 1), True),
+                     ((8, 1, 3.5), (0, 0, 1), True),
+                     ((9, -1, -8), (2, 4, 6), False),
+                     ((8, 3, -4), (6, 2, 4), False),
+                     ((9, -1, -2), (4, 6, 2), False),
+                     ((4, 0, 9), (0, 0, -1), False),
+                     ((8, 6, -1), (0, -1, 0), False),
+                     ((12, 5, 4), (-1, 0, 0), False)]
+
+        for origin, direction, expected in scenarios:
+            with self.subTest(origin=origin, direction=direction):
+                inverse = [1 / d if d else 1e300 for d in direction]
+
+                # Act
+                result = ray_hits_box(*origin, *inverse, *box)
+
+                # Assert
+                self.assertEqual(result, expected)
+
+    def test_world_bounds_are_cached_until_the_transform_changes(self):
+        # Arrange
+        s = Sphere()
+        s.transform = Matrix.translation(1, 2, 3)
+        first = s.world_bounds()
+
+        # Act
+        second = s.world_bounds()
+        s.transform = Matrix.scaling(2, 2, 2)
+        third = s.world_bounds()
+
+        # Assert
+        self.assertIs(second, first)
+        self.assertEqual(first.minimum, Point(0, 1, 2))
+        self.assertEqual(third.maximum, Point(2, 2, 2))
+
+    def test_world_bounds_follow_a_cylinders_extents(self):
+        # Arrange
+        c = Cylinder()
+        c.transform = Matrix.translation(0, 1, 0)
+        c.minimum = 0
+        c.maximum = 1
+        c.world_bounds()
+
+        # Act
+        c.maximum = 3
+        box = c.world_bounds()
+
+        # Assert
+        self.assertEqual(box.maximum, Point(1, 4, 1))
+
+    def test_world_bounds_of_a_shape_in_a_group_include_the_groups_transform(self):
+        # Arrange
+        s = Sphere()
+        s.transform = Matrix.translation(2, 0, 0)
+        g = Group([s])
+        g.transform = Matrix.scaling(2, 2, 2)
+        s.world_bounds()
+
+        # Act
+        g.transform = Matrix.scaling(3, 3, 3)
+        box = s.world_bounds()
+
+        # Assert
+        self.assertEqual(box.minimum, Point(3, -3, -3))
+        self.assertEqual(box.maximum, Point(9, 3, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
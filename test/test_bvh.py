@@ -0,0 +1,77 @@
+import sys
+sys.path.append('..')
+import unittest
+import numpy as np
+from bvh import BVH
+from rays import Ray, RayBatch
+from tuples import *
+
+
+class BVHTestCase(unittest.TestCase):
+    def test_an_empty_hierarchy_has_no_candidates(self):
+        # Arrange
+        bvh = BVH([], [])
+
+        # Act
+        result = bvh.candidates(Ray(Point(0, 0, -5), Vector(0, 0, 1)))
+
+        # Assert
+        self.assertEqual(result, [])
+
+    def test_every_item_is_stored_in_a_leaf(self):
+        # Arrange
+        lower = [(i, 0, 0) for i in range(20)]
+        upper = [(i + 0.5, 1, 1) for i in range(20)]
+
+        # Act
+        bvh = BVH(lower, upper, [f'item{i}' for i in range(20)])
+
+        # Assert
+        self.assertEqual(len(bvh), 20)
+        self.assertEqual(sorted(bvh.order), sorted(f'item{i}' for i in range(20)))
+
+    def test_only_items_along_the_ray_are_candidates(self):
+        # Arrange
+        lower = [(i * 3, 0, 0) for i in range(20)]
+        upper = [(i * 3 + 1, 1, 1) for i in range(20)]
+        bvh = BVH(lower, upper, leaf_size=1)
+        ray = Ray(Point(9.5, 0.5, -5), Vector(0, 0, 1))
+
+        # Act
+        result = bvh.candidates(ray)
+
+        # Assert
+        self.assertEqual(result, [3])
+
+    def test_items_behind_the_ray_origin_are_candidates(self):
+        # Arrange
+        bvh = BVH([(-1, -1, -10)], [(1, 1, -8)])
+        ray = Ray(Point(0, 0, 0), Vector(0, 0, 1))
+
+        # Act
+        result = bvh.candidates(ray)
+
+        # Assert
+        self.assertEqual(result, [0])
+
+
+    def test_batch_candidates_match_the_candidates_of_each_ray(self):
+        # Arrange
+        generator = np.random.default_rng(3)
+        lower = generator.uniform(-10, 10, (60, 3))
+        bvh = BVH(lower, lower + generator.uniform(0, 2, (60, 3)), leaf_size=2)
+        rays = [Ray(Point(*generator.uniform(-12, 12, 3).tolist()), Vector(*generator.normal(size=3).tolist()))
+                for _ in range(200)]
+        rays.append(Ray(Point(0, 0, -20), Vector(0, 0, 1)))
+        batch = RayBatch.from_rays(rays)
+
+        # Act
+        found = bvh.candidates_batch(batch.origins, batch.directions)
+
+        # Assert
+        for index, ray in enumerate(rays):
+            batched = sorted(item for item, indices in found.items() if index in indices)
+            self.assertEqual(batched, sorted(bvh.candidates(ray)))
+
+if __name__ == '__main__':
+    unittest.main()
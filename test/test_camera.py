@@ -1,6 +1,7 @@
 import sys
 sys.path.append('..')
 import unittest
+import numpy as np
 from math import pi, sqrt
 from camera import Camera
 from matrices import Matrix
@@ -8,6 +9,41 @@ from tuples import *
 from transformations import Transformations
 from colours import Colour
 from world import World
+from canvas import Canvas
+from primitives import Group, Plane, Sphere
+from patterns import BlendedPattern, CheckersPattern, NestedPattern, RingPattern, StripePattern
+from lights import PointLight
+from profiling import Profiler
+from multiprocessing import Pool
+
+
+def patterned_world():
+    # Shapes sharing blended and nested patterns, which depend on the shape being shaded, inside a transformed group
+    # and behind glass, so every pixel needs per-shape pattern state and several bounces
+    w = World.default_world()
+    stripes = StripePattern(Colour(1, 0, 0), Colour(0, 0, 1))
+    stripes.transform = Matrix.scaling(0.2, 0.2, 0.2)
+    rings = RingPattern(Colour(0, 1, 0), Colour(1, 1, 1))
+    rings.transform = Matrix.rotation_x(pi / 2) * Matrix.scaling(0.3, 0.3, 0.3)
+    blended = BlendedPattern(stripes, rings)
+    nested = NestedPattern(CheckersPattern(Colour(1, 1, 1), Colour(0, 0, 0)), stripes, blended)
+    w.objects[0].material.pattern = blended
+    w.objects[1].material.transparency = 0.8
+    w.objects[1].material.refractive_index = 1.5
+    left = Sphere()
+    left.transform = Matrix.translation(-1.5, 0, 0) * Matrix.scaling(0.6, 1, 0.6)
+    left.material.pattern = blended
+    right = Sphere()
+    right.transform = Matrix.translation(1.5, 0, 0) * Matrix.rotation_z(0.5)
+    right.material.pattern = nested
+    right.material.reflective = 0.5
+    group = Group([left, right])
+    group.transform = Matrix.translation(0, 0.5, 1)
+    floor = Plane()
+    floor.transform = Matrix.translation(0, -1, 0)
+    floor.material.pattern = nested
+    w.objects += [group, floor]
+    return w
 
 
 class CameraTestCase(unittest.TestCase):
@@ -110,8 +146,7 @@ class CameraTestCase(unittest.TestCase):
         to_pt = Point(0, 0, 0)
         up_vec = Vector(0, 1, 0)
         c.transform = Transformations.view_transform(from_pt, to_pt, up_vec)
-        # expected = Colour(0.38066, 0.47583, 0.2855)
-        expected = Colour(0.38039, 0.47451, 0.28627)
+        expected = Colour(0.38066, 0.47583, 0.2855)
 
         # Act
         image = c.render(w)
@@ -119,6 +154,231 @@ class CameraTestCase(unittest.TestCase):
         # Assert
         self.assertEqual(image.get_pixel(5, 5), expected)
 
+    def test_tiles_cover_the_canvas_exactly_once(self):
+        # Arrange
+        c = Camera(10, 7, pi / 2)
+        covered = []
+
+        # Act
+        for x0, y0, x1, y1 in c.tiles(4):
+            covered.extend((x, y) for y in range(y0, y1) for x in range(x0, x1))
+
+        # Assert
+        self.assertEqual(len(covered), 70)
+        self.assertEqual(set(covered), {(x, y) for y in range(7) for x in range(10)})
+
+    def test_rendering_with_multiple_workers_matches_the_serial_render(self):
+        # Arrange
+        w = World.default_world()
+        c = Camera(11, 9, pi / 2)
+        c.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        serial = c.render(w)
+
+        # Act
+        parallel = c.render(w, workers=2, tile_size=4)
+
+        # Assert
+        self.assertEqual(parallel.get_image_data(), serial.get_image_data())
+
+    def test_rendering_with_threads_matches_the_serial_render(self):
+        # Arrange
+        w = patterned_world()
+        c = Camera(24, 16, pi / 2)
+        c.transform = Transformations.view_transform(Point(0, 1.5, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        serial = c.render(w)
+        interval = sys.getswitchinterval()
+
+        # Act
+        # Switching threads as often as possible makes any state shared between them show up as wrong pixels
+        sys.setswitchinterval(1e-6)
+        try:
+            threaded = [c.render(w, workers=workers, tile_size=2, backend='thread') for workers in (2, 4, 8)]
+        finally:
+            sys.setswitchinterval(interval)
+
+        # Assert
+        for image in threaded:
+            self.assertEqual(image.get_image_data(), serial.get_image_data())
+
+    def test_an_unknown_backend_is_an_error(self):
+        # Arrange
+        c = Camera(4, 4, pi / 2)
+
+        # Act
+        # Assert
+        self.assertRaises(ValueError, c.render, World.default_world(), workers=2, backend='fibre')
+
+    def test_renders_sharing_a_pool_match_their_serial_renders(self):
+        # Arrange
+        w1 = World.default_world()
+        w2 = World.default_world()
+        w2.objects[0].material.colour = Colour(0.2, 0.4, 1)
+        c1 = Camera(11, 9, pi / 2)
+        c1.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        c2 = Camera(7, 5, pi / 3)
+        c2.transform = Transformations.view_transform(Point(1, 1, -5), Point(0, 0, 0), Vector(0, 1, 0))
+
+        # Act
+        with Pool(2) as pool:
+            first = c1.render(w1, tile_size=4, pool=pool)
+            second = c2.render(w2, tile_size=4, pool=pool)
+
+        # Assert
+        self.assertEqual(first.get_image_data(), c1.render(w1).get_image_data())
+        self.assertEqual(second.get_image_data(), c2.render(w2).get_image_data())
+
+    def test_the_camera_origin_is_computed_when_the_transform_is_set(self):
+        # Arrange
+        c = Camera(201, 101, pi / 2)
+
+        # Act
+        c.transform = Matrix.rotation_y(pi / 4) * Matrix.translation(0, -2, 5)
+
+        # Assert
+        self.assertEqual(c.origin, Point(0, 2, -5))
+
+    def test_constructing_rays_for_a_tile_matches_rays_for_each_pixel(self):
+        # Arrange
+        c = Camera(201, 101, pi / 2)
+        c.transform = Matrix.rotation_y(pi / 4) * Matrix.translation(0, -2, 5)
+
+        # Act
+        batch = c.rays_for_tile(98, 49, 103, 52)
+
+        # Assert
+        self.assertEqual(len(batch), 15)
+        for i, (x, y) in enumerate((x, y) for y in range(49, 52) for x in range(98, 103)):
+            expected = c.ray_for_pixel(x, y)
+            self.assertEqual(batch[i].origin, expected.origin)
+            self.assertEqual(batch[i].direction, expected.direction)
+
+    def test_constructing_rays_for_the_whole_image(self):
+        # Arrange
+        c = Camera(201, 101, pi / 2)
+
+        # Act
+        batch = c.rays_for_image()
+
+        # Assert
+        self.assertEqual(len(batch), 201 * 101)
+        self.assertEqual(batch[201 * 50 + 100].direction, Vector(0, 0, -1))
+        self.assertEqual(batch[0].direction, Vector(0.66519, 0.33259, -0.66851))
+
+    def test_constructing_a_ray_through_a_point_within_a_pixel(self):
+        # Arrange
+        c = Camera(200, 100, pi / 2)
+
+        # Act
+        r = c.ray_for_pixel(100, 50, 0, 0)
+
+        # Assert
+        self.assertEqual(r.origin, Point(0, 0, 0))
+        self.assertEqual(r.direction, Vector(0, 0, -1))
+
+    def test_edges_mark_pixels_differing_from_a_neighbour(self):
+        # Arrange
+        c = Camera(5, 5, pi / 2)
+        image = Canvas(5, 5)
+        image.write_pixel(2, 2, Colour(1, 1, 1))
+
+        # Act
+        edges = c.edges(image, 0.1)
+
+        # Assert
+        self.assertEqual(sorted(zip(*edges.nonzero())), [(1, 2), (2, 1), (2, 2), (2, 3), (3, 2)])
+
+    def test_adaptive_rendering_takes_one_sample_in_flat_regions(self):
+        # Arrange
+        w = World()
+        w.lights.append(PointLight(Point(0, 100, 0), Colour(1, 1, 1)))
+        floor = Plane()
+        floor.material.specular = 0
+        w.objects.append(floor)
+        c = Camera(11, 11, pi / 3)
+        c.transform = Transformations.view_transform(Point(0, 1, 0), Point(0, 0, 0), Vector(0, 0, 1))
+        profiler = Profiler()
+
+        # Act
+        image = c.render_adaptive(w, profiler=profiler)
+
+        # Assert
+        self.assertEqual(profiler.rays['primary'], 11 * 11)
+        self.assertEqual(image.get_image_data(), c.render(w).get_image_data())
+
+    def test_adaptive_rendering_supersamples_only_edge_pixels(self):
+        # Arrange
+        w = World.default_world()
+        c = Camera(11, 11, pi / 2)
+        c.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        single = c.render(w)
+        edges = c.edges(single, 0.1)
+
+        # Act
+        image = c.render_adaptive(w, threshold=0.1, max_samples=16)
+
+        # Assert
+        changed = (image.pixels != single.pixels).any(axis=2)
+        self.assertTrue(changed.any())
+        self.assertFalse((changed & ~edges).any())
+
+    def test_adaptive_rendering_is_repeatable_for_a_seed(self):
+        # Arrange
+        w = World.default_world()
+        c = Camera(11, 11, pi / 2)
+        c.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+
+        # Act
+        first = c.render_adaptive(w, seed=3)
+        second = c.render_adaptive(w, seed=3)
+
+        # Assert
+        self.assertEqual(first.get_image_data(), second.get_image_data())
+
+    def test_adaptive_rendering_caps_the_samples_per_pixel(self):
+        # Arrange
+        w = World.default_world()
+        c = Camera(11, 11, pi / 2)
+        c.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        edge_count = c.edges(c.render(w), 0.1).sum()
+
+        for max_samples, refinement in ((5, 0), (6, 1), (14, 9), (16, 9)):
+            with self.subTest(max_samples=max_samples):
+                profiler = Profiler()
+
+                # Act
+                c.render_adaptive(w, threshold=0.1, max_samples=max_samples, profiler=profiler)
+
+                # Assert
+                extra = profiler.rays['primary'] - 11 * 11
+                self.assertGreaterEqual(extra, 4 * edge_count)
+                self.assertLessEqual(extra, (4 + refinement) * edge_count)
+                self.assertEqual((extra - 4 * edge_count) % max(refinement, 1), 0)
+
+    def test_adaptive_rendering_averages_in_the_centre_sample(self):
+        # Arrange
+        w = World.default_world()
+        c = Camera(11, 11, pi / 2)
+        c.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        single = c.render(w)
+        y, x = next(zip(*c.edges(single, 0.1).nonzero()))
+        grid = c.jittered_samples(w, x, y, 4, np.random.default_rng((0, y, x)))
+
+        # Act
+        image = c.render_adaptive(w, threshold=0.1, max_samples=5)
+
+        # Assert
+        expected = (single.pixels[y, x] + grid.sum(axis=0)) / 5
+        np.testing.assert_allclose(image.pixels[y, x], expected, rtol=1e-6)
+
+    def test_adaptive_rendering_needs_one_sample_or_enough_to_supersample(self):
+        # Arrange
+        c = Camera(11, 11, pi / 2)
+
+        for max_samples in (0, 2, 3, 4):
+            with self.subTest(max_samples=max_samples):
+                # Act
+                # Assert
+                self.assertRaises(ValueError, c.render_adaptive, World.default_world(), max_samples=max_samples)
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import io
+import numpy as np
 from colours import *
 from canvas import Canvas
 from pathlib import Path
@@ -106,6 +108,88 @@ class CanvasTestCase(unittest.TestCase):
         # Assert
         self.assertEqual(last_char, expected)
 
+    def test_pixels_keep_values_outside_the_displayable_range(self):
+        # Arrange
+        c = Canvas(10, 20)
+        bright = Colour(1.5, -0.25, 0.38066)
+
+        # Act
+        c.write_pixel(2, 3, bright)
+
+        # Assert
+        self.assertEqual(c.get_pixel(2, 3), bright)
+
+    def test_writing_a_tile_of_pixels(self):
+        # Arrange
+        c = Canvas(4, 3)
+        tile = np.full((2, 3, 3), 0.5)
+
+        # Act
+        c.write_tile(1, 1, tile)
+
+        # Assert
+        self.assertEqual(c.get_pixel(0, 0), Colour(0, 0, 0))
+        self.assertEqual(c.get_pixel(1, 1), Colour(0.5, 0.5, 0.5))
+        self.assertEqual(c.get_pixel(3, 2), Colour(0.5, 0.5, 0.5))
+
+    def test_writing_rows_of_pixels(self):
+        # Arrange
+        c = Canvas(2, 3)
+        rows = [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 1)]
+
+        # Act
+        c.write_rows(1, rows)
+
+        # Assert
+        self.assertEqual(c.get_pixel(0, 0), Colour(0, 0, 0))
+        self.assertEqual(c.get_pixel(1, 1), Colour(0, 1, 0))
+        self.assertEqual(c.get_pixel(0, 2), Colour(0, 0, 1))
+
+    def test_quantising_the_canvas_clamps_and_rounds(self):
+        # Arrange
+        c = Canvas(3, 1)
+        c.write_pixel(0, 0, Colour(1.5, 0, 0))
+        c.write_pixel(1, 0, Colour(0, 0.5, 0))
+        c.write_pixel(2, 0, Colour(-0.5, 0, 1))
+
+        # Act
+        data = c.to_bytes()
+
+        # Assert
+        self.assertEqual(data.dtype, np.uint8)
+        self.assertListEqual(data.tolist(), [[[255, 0, 0], [0, 128, 0], [0, 0, 255]]])
+        self.assertEqual(c.image.getpixel((1, 0)), (0, 128, 0))
+
+    def test_constructing_binary_ppm_data(self):
+        # Arrange
+        c = Canvas(2, 1)
+        c.write_pixel(0, 0, Colour(1.5, 0, 0))
+        c.write_pixel(1, 0, Colour(0, 0.5, 1))
+        expected = b'P6\n2 1\n255\n' + bytes([255, 0, 0, 0, 128, 255])
+
+        # Act
+        c.canvas_to_ppm('test.ppm', binary=True)
+        with open('test.ppm', 'rb') as f:
+            data = f.read()
+
+        # Assert
+        self.assertEqual(data, expected)
+
+    def test_wrapped_ppm_lines_hold_every_value_of_a_long_row(self):
+        # Arrange
+        c = Canvas(100, 1)
+        for x in range(100):
+            c.write_pixel(x, 0, Colour(x / 99, 0.5, (99 - x) / 99))
+        stream = io.BytesIO()
+
+        # Act
+        c.write_ppm(stream)
+        lines = stream.getvalue().decode('ascii').splitlines()[3:]
+
+        # Assert
+        self.assertTrue(all(len(line) <= 69 for line in lines))
+        self.assertEqual(' '.join(lines).split(), [str(v) for v in c.to_bytes().ravel()])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 from primitives import *
+from intersections import Intersection, IntersectionBuffer
 from rays import Ray
 from tuples import *
 from matrices import Matrix
@@ -188,6 +189,36 @@ class IntersectionsTestCase(unittest.TestCase):
                 self.assertEqual(comps.n1, scenario[0])
                 self.assertEqual(comps.n2, scenario[1])
 
+    def test_refractive_indices_are_only_computed_when_needed(self):
+        # Arrange
+        a = Sphere.glass_sphere()
+        r = Ray(Point(0, 0, -4), Vector(0, 0, 1))
+        intersections = Intersection.intersections(Intersection(3, a), Intersection(5, a))
+
+        # Act
+        comps = intersections[0].prepare_computations(r, intersections)
+        unresolved = comps._refractive_indices
+
+        # Assert
+        self.assertIsNone(unresolved)
+        self.assertEqual((comps.n1, comps.n2), (1, 1.5))
+
+    def test_containers_are_told_apart_by_identity(self):
+        # Arrange
+        a = Sphere.glass_sphere()
+        a.transform = Matrix.scaling(2, 2, 2)
+        b = Sphere.glass_sphere()
+        b.transform = Matrix.scaling(2, 2, 2)
+        r = Ray(Point(0, 0, -4), Vector(0, 0, 1))
+        intersections = Intersection.intersections(Intersection(2, a), Intersection(2.5, b), Intersection(5.5, b),
+                                                   Intersection(6, a))
+
+        # Act
+        comps = intersections[1].prepare_computations(r, intersections)
+
+        # Assert
+        self.assertEqual((comps.n1, comps.n2), (1.5, 1.5))
+
     def test_the_under_point_is_offset_below_the_surface(self):
         # Arrange
         shape = Sphere.glass_sphere()
@@ -243,6 +274,123 @@ class IntersectionsTestCase(unittest.TestCase):
         # Assert
         self.assertAlmostEqual(reflectance, 0.48873, 5)
 
+    def test_an_intersection_buffer_grows_as_intersections_are_appended(self):
+        # Arrange
+        s = Sphere()
+        buffer = IntersectionBuffer(2)
+
+        # Act
+        for t in (3, 1, 2):
+            buffer.append(t, s)
+
+        # Assert
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.t[:3], [3, 1, 2])
+        self.assertEqual(buffer.objects[:3], [s, s, s])
+
+    def test_the_buffer_hit_is_the_first_lowest_non_negative_t_value(self):
+        # Arrange
+        s1 = Sphere()
+        s2 = Sphere()
+        buffer = IntersectionBuffer()
+        for t, s in ((5, s1), (-3, s1), (2, s1), (2, s2), (7, s2)):
+            buffer.append(t, s)
+
+        # Act
+        index = buffer.hit()
+
+        # Assert
+        self.assertEqual(index, 2)
+
+    def test_the_buffer_hit_when_all_intersections_have_negative_t_values(self):
+        # Arrange
+        buffer = IntersectionBuffer()
+        buffer.append(-1, Sphere())
+
+        # Act
+        index = buffer.hit()
+
+        # Assert
+        self.assertIsNone(index)
+
+    def test_buffer_intersections_are_sorted_up_to_a_limit(self):
+        # Arrange
+        s1 = Sphere()
+        s2 = Sphere()
+        buffer = IntersectionBuffer()
+        for t, s in ((5, s1), (-3, s1), (2, s2), (2, s1), (7, s2)):
+            buffer.append(t, s)
+
+        # Act
+        xs = buffer.intersections(6)
+
+        # Assert
+        self.assertEqual([(i.t, i.object) for i in xs], [(-3, s1), (2, s2), (2, s1), (5, s1)])
+
+    def test_clearing_a_buffer_keeps_its_storage(self):
+        # Arrange
+        buffer = IntersectionBuffer(2)
+        buffer.append(1, Sphere())
+        storage = buffer.t
+
+        # Act
+        buffer.clear()
+
+        # Assert
+        self.assertEqual(len(buffer), 0)
+        self.assertIs(buffer.t, storage)
+
+    def test_intersections_keep_the_object_space_ray_they_were_found_with(self):
+        # Arrange
+        s = Sphere()
+        s.transform = Matrix.translation(0, 0, 2) * Matrix.scaling(2, 2, 2)
+        r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+        buffer = IntersectionBuffer()
+
+        # Act
+        s.intersects_into(r, buffer)
+        x = buffer.intersection(buffer.hit())
+
+        # Assert
+        self.assertEqual(x.local_ray.origin, Point(0, 0, -3.5))
+        self.assertEqual(x.local_ray.direction, Vector(0, 0, 0.5))
+        self.assertNotIn('_saved_ray', vars(s))
+
+    def test_the_normal_from_the_object_space_ray_matches_the_transformed_point(self):
+        # Arrange
+        c = Cube()
+        c.transform = Matrix.translation(0.5, 1, 2) * Matrix.rotation_y(0.7) * Matrix.scaling(1, 2, 1)
+        r = Ray(Point(0.2, 0.4, -6), Vector(0.1, 0.2, 1).normalise())
+        x = c.intersects(r)[0]
+
+        # Act
+        n = c.normal_at(r.position(x.t), x)
+
+        # Assert
+        self.assertIsNotNone(x.local_ray)
+        self.assertEqual(n, c.normal_at(r.position(x.t)))
+
+    def test_shapes_append_the_same_intersections_they_return(self):
+        # Arrange
+        r = Ray(Point(0, 0.5, -5), Vector(0.1, 0, 1).normalise())
+        cylinder = Cylinder()
+        cylinder.minimum = 0
+        cylinder.maximum = 1
+        cylinder.closed = True
+        shapes = [Sphere(), Plane(), Cube(), cylinder, Cone()]
+        shapes[1].transform = Matrix.rotation_x(1)
+
+        for shape in shapes:
+            with self.subTest(shape=type(shape).__name__):
+                buffer = IntersectionBuffer()
+
+                # Act
+                shape.intersects_into(r, buffer)
+
+                # Assert
+                self.assertEqual(buffer.t[:buffer.count], [i.t for i in shape.intersects(r)])
+                self.assertEqual(buffer.objects[:buffer.count], [shape] * buffer.count)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 from matrices import Matrix
 from tuples import *
 from math import pi, sqrt
@@ -689,6 +690,67 @@ class MatricesTestCase(unittest.TestCase):
         # Assert
         self.assertEqual(result, expected)
 
+    def test_transformation_matrices_are_affine(self):
+        # Arrange
+        a = Matrix.translation(1, 2, 3) * Matrix.rotation_y(pi / 3) * Matrix.shearing(1, 0, 0, 1, 0, 0)
+        b = Matrix([[-5, 2, 6, -8], [1, -5, 1, 8], [7, 7, -6, -7], [1, -3, 7, 4]])
+
+        # Act
+
+        # Assert
+        self.assertTrue(a.is_affine)
+        self.assertFalse(b.is_affine)
+        self.assertFalse(Matrix.identity(3).is_affine)
+
+    def test_the_affine_inverse_matches_the_general_inverse(self):
+        # Arrange
+        a = Matrix.translation(3, -4, 5) * Matrix.rotation_x(pi / 5) * Matrix.scaling(2, 0.5, 3) * \
+            Matrix.shearing(0.5, 0, 1, 0, 0, 2)
+        expected = Matrix(np.linalg.inv(a.matrix))
+
+        # Act
+        result = a.inverse()
+
+        # Assert
+        self.assertEqual(result, expected)
+        self.assertTrue(result.is_affine)
+
+    def test_inverting_a_singular_affine_matrix_raises_an_error(self):
+        # Arrange
+        a = Matrix.scaling(1, 0, 1)
+
+        # Act
+
+        # Assert
+        with self.assertRaises(np.linalg.LinAlgError):
+            a.inverse()
+
+    def test_the_inverse_and_transpose_are_cached(self):
+        # Arrange
+        a = Matrix.translation(1, 2, 3) * Matrix.rotation_z(pi / 7)
+
+        # Act
+        inverse = a.inverse()
+        transpose = a.transpose()
+
+        # Assert
+        self.assertIs(a.inverse(), inverse)
+        self.assertIs(inverse.inverse(), a)
+        self.assertIs(a.transpose(), transpose)
+        self.assertIs(transpose.transpose(), a)
+
+    def test_multiplying_a_tuple_by_a_non_affine_matrix(self):
+        # Arrange
+        a = Matrix([[1, 2, 3, 4], [2, 4, 4, 2], [8, 6, 4, 1], [1, 2, 3, 4]])
+        b = Tuple(1, 2, 3, 1)
+        expected = Tuple(18, 24, 33, 18)
+
+        # Act
+        result = a * b
+
+        # Assert
+        self.assertEqual(result, expected)
+
 
 if __name__ == '__main__':
     unittest.main()
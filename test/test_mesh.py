@@ -0,0 +1,221 @@
+import sys
+sys.path.append('..')
+import pickle
+import unittest
+import numpy as np
+from intersections import IntersectionBuffer
+from mesh import Mesh, parse_obj
+from primitives import Triangle
+from rays import Ray
+from tuples import *
+
+GIBBERISH = '''There was a young lady named Bright
+who traveled much faster than light.
+She set out one day
+in a relative way,
+and came back the previous night.'''
+
+TRIANGLES = '''
+v -1 1 0
+v -1 0 0
+v 1 0 0
+v 1 1 0
+
+f 1 2 3
+f 1 3 4
+'''
+
+POLYGON = '''
+v -1 1 0
+v -1 0 0
+v 1 0 0
+v 1 1 0
+v 0 2 0
+
+f 1 2 3 4 5
+'''
+
+NORMALS = '''
+v 0 1 0
+v -1 0 0
+v 1 0 0
+vn 0 1 0
+vn -1 0 0
+vn 1 0 0
+vt 0.5 0.5
+f 1//1 2//2 3//3
+f 1/1/1 2/1/2 3/1/3
+'''
+
+
+def sphere_mesh(n=8):
+    # A unit UV sphere, and the same triangles as separate Triangle shapes
+    theta, phi = np.meshgrid(np.linspace(0, np.pi, n + 1), np.linspace(0, 2 * np.pi, 2 * n + 1), indexing='ij')
+    vertices = np.stack((np.sin(theta) * np.cos(phi), np.cos(theta), np.sin(theta) * np.sin(phi)), axis=-1)
+    vertices = vertices.reshape(-1, 3)
+    i, j = np.meshgrid(np.arange(1, n - 1), np.arange(2 * n), indexing='ij')
+    a = (i * (2 * n + 1) + j).ravel()
+    b, c = a + 1, a + 2 * n + 1
+    faces = np.concatenate((np.stack((a, c, b), axis=1), np.stack((b, c, c + 1), axis=1)))
+    triangles = [Triangle(*(Point(*vertices[index].tolist()) for index in face)) for face in faces]
+    return Mesh(vertices, faces), triangles
+
+
+class ObjTestCase(unittest.TestCase):
+    def test_ignoring_unrecognised_lines(self):
+        # Arrange
+        # Act
+        mesh = parse_obj(GIBBERISH.splitlines())
+
+        # Assert
+        self.assertEqual(len(mesh), 0)
+
+    def test_vertex_records_and_triangle_faces(self):
+        # Arrange
+        # Act
+        mesh = parse_obj(TRIANGLES.splitlines())
+
+        # Assert
+        self.assertEqual(mesh.vertices.tolist(), [[-1, 1, 0], [-1, 0, 0], [1, 0, 0], [1, 1, 0]])
+        self.assertEqual(mesh.faces.tolist(), [[0, 1, 2], [0, 2, 3]])
+        self.assertEqual(mesh.triangles[0].tolist(), [-1, 1, 0, 0, -1, 0, 2, -1, 0])
+        self.assertIsNone(mesh.normal_faces)
+
+    def test_polygons_are_split_into_fans_of_triangles(self):
+        # Arrange
+        # Act
+        mesh = parse_obj(POLYGON.splitlines())
+
+        # Assert
+        self.assertEqual(mesh.faces.tolist(), [[0, 1, 2], [0, 2, 3], [0, 3, 4]])
+
+    def test_negative_indices_count_back_from_the_last_vertex(self):
+        # Arrange
+        lines = ['v 0 0 0', 'v 1 0 0', 'v 0 1 0', 'f -3 -2 -1', 'v 0 0 1', 'f 1 -1 -2']
+
+        # Act
+        mesh = parse_obj(lines)
+
+        # Assert
+        self.assertEqual(mesh.faces.tolist(), [[0, 1, 2], [0, 3, 2]])
+
+    def test_faces_with_normals(self):
+        # Arrange
+        # Act
+        mesh = parse_obj(NORMALS.splitlines())
+
+        # Assert
+        self.assertEqual(mesh.normals.tolist(), [[0, 1, 0], [-1, 0, 0], [1, 0, 0]])
+        self.assertEqual(mesh.normal_faces.tolist(), [[0, 1, 2], [0, 1, 2]])
+        self.assertEqual(mesh.faces.tolist(), [[0, 1, 2], [0, 1, 2]])
+
+    def test_faces_without_normals_are_flat_in_a_smooth_mesh(self):
+        # Arrange
+        lines = NORMALS.splitlines() + ['f 1 2 3']
+
+        # Act
+        mesh = parse_obj(lines)
+
+        # Assert
+        self.assertEqual(mesh.normal_faces.tolist()[2], [-1, -1, -1])
+
+    def test_errors_give_the_line_number(self):
+        cases = {
+            'v 1 2': 'line 4: expected three coordinates',
+            'v 1 two 3': 'line 4: could not convert',
+            'f 1 2': 'line 4: a face needs at least three vertices',
+            'f 1 2 9': 'line 4: a face refers to a vertex',
+            'f 1//1 2//1 3//1': 'line 4: a face refers to a normal',
+        }
+        for line, message in cases.items():
+            with self.subTest(line=line):
+                # Arrange
+                lines = ['v 0 0 0', 'v 1 0 0', 'v 0 1 0', line]
+
+                # Act
+                # Assert
+                with self.assertRaisesRegex(ValueError, message):
+                    parse_obj(lines, 'model.obj')
+
+
+class MeshTestCase(unittest.TestCase):
+    def test_faces_must_refer_to_existing_vertices(self):
+        # Arrange
+        # Act
+        # Assert
+        with self.assertRaises(ValueError):
+            Mesh([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 3]])
+
+    def test_mesh_intersections_match_separate_triangles(self):
+        # Arrange
+        mesh, triangles = sphere_mesh()
+        rng = np.random.default_rng(1)
+        rays = [Ray(Point(*rng.uniform(-3, 3, 3).tolist()), Vector(*rng.normal(size=3).tolist()).normalise())
+                for _ in range(50)]
+        rays += [Ray(Point(x, y, -5), Vector(0, 0, 1)) for x, y in rng.uniform(-0.9, 0.9, (50, 2)).tolist()]
+
+        for ray in rays:
+            with self.subTest(ray=ray):
+                # Act
+                xs = mesh.intersects(ray)
+
+                # Assert
+                expected = sorted(x.t for triangle in triangles for x in triangle.intersects(ray))
+                self.assertEqual(len(xs), len(expected))
+                for x, t in zip(sorted(xs, key=lambda x: x.t), expected):
+                    self.assertAlmostEqual(x.t, t)
+                    self.assertEqual(mesh.normal_at(ray.position(x.t), x), triangles[x.face].normal)
+
+    def test_mesh_hits_record_the_face_and_its_u_and_v(self):
+        # Arrange
+        mesh = parse_obj(TRIANGLES.splitlines())
+        buffer = IntersectionBuffer()
+
+        # Act
+        mesh.intersects_into(Ray(Point(0.5, 0.75, -2), Vector(0, 0, 1)), buffer)
+
+        # Assert
+        x = buffer.intersection(0)
+        self.assertEqual(len(buffer), 1)
+        self.assertEqual((x.t, x.face), (2, 1))
+        self.assertAlmostEqual(x.u, 0.25)
+        self.assertAlmostEqual(x.v, 0.5)
+
+    def test_a_smooth_mesh_interpolates_its_normals(self):
+        # Arrange
+        mesh = parse_obj(NORMALS.splitlines()[:-1])
+        r = Ray(Point(-0.2, 0.3, -2), Vector(0, 0, 1))
+        x = mesh.intersects(r)[0]
+
+        # Act
+        comps = x.prepare_computations(r, [x])
+
+        # Assert
+        self.assertEqual(comps.normal_vector, Vector(-0.5547, 0.83205, 0))
+
+    def test_the_bounds_of_a_mesh(self):
+        # Arrange
+        mesh = parse_obj(POLYGON.splitlines())
+
+        # Act
+        box = mesh.bounds()
+
+        # Assert
+        self.assertEqual(box.minimum, Point(-1, 0, 0))
+        self.assertEqual(box.maximum, Point(1, 2, 0))
+
+    def test_a_pickled_mesh_still_intersects(self):
+        # Arrange
+        mesh, _ = sphere_mesh()
+        r = Ray(Point(0.1, 0.2, -5), Vector(0, 0, 1))
+        expected = [x.t for x in mesh.intersects(r)]
+
+        # Act
+        copy = pickle.loads(pickle.dumps(mesh))
+
+        # Assert
+        self.assertEqual([x.t for x in copy.intersects(r)], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
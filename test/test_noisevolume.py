@@ -0,0 +1,189 @@
+import sys
+sys.path.append('..')
+import pickle
+import tempfile
+from pathlib import Path
+from unittest import mock
+import unittest
+import numpy as np
+import noisevolume
+from noise import pnoise3
+from noisevolume import NoiseVolume
+from bounds import BoundingBox
+from colours import Colour
+from patterns import PerturbedPattern, StripePattern
+from tuples import Point
+
+
+class NoiseVolumeTestCase(unittest.TestCase):
+    def setUp(self):
+        noisevolume._volumes.clear()
+        self.pattern = PerturbedPattern(StripePattern(Colour(1, 0, 0), Colour(0, 0, 1)), octaves=2)
+        self.bounds = BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+        self.points = np.random.default_rng(2).uniform(-0.9, 0.9, (100, 3))
+
+    def tearDown(self):
+        noisevolume._volumes.clear()
+
+    def live_displacements(self, points):
+        settings = dict(octaves=self.pattern.octaves, persistence=self.pattern.persistence,
+                        lacunarity=self.pattern.lacunarity)
+        return np.array([(pnoise3(x, y + 1, z + 1, **settings), pnoise3(x + 1, y, z + 1, **settings),
+                          pnoise3(x + 1, y + 1, z, **settings)) for x, y, z in points.tolist()]) * self.pattern.scale
+
+    def test_baked_displacement_is_exact_at_grid_points(self):
+        # Arrange
+        volume = NoiseVolume.for_pattern(self.pattern, 4, self.bounds, cache_dir=None)
+        grid_points = np.array([[-1, -1, -1], [0.25, -0.5, 0.75], [1, 1, 1]])
+
+        # Act
+        displacements = volume.displacement_batch(grid_points)
+
+        # Assert
+        np.testing.assert_allclose(displacements, self.live_displacements(grid_points), atol=1e-12)
+
+    def test_baked_displacement_approximates_live_noise(self):
+        # Arrange
+        volume = NoiseVolume.for_pattern(self.pattern, 16, self.bounds, cache_dir=None)
+
+        # Act
+        error = np.abs(volume.displacement_batch(self.points) - self.live_displacements(self.points))
+
+        # Assert
+        self.assertLess(error.max(), 0.02)
+
+    def test_volumes_with_the_same_settings_are_shared(self):
+        # Arrange
+        other = PerturbedPattern(StripePattern(Colour(1, 1, 1), Colour(0, 0, 0)), octaves=2)
+
+        # Act
+        volume = NoiseVolume.for_pattern(self.pattern, 4, self.bounds, cache_dir=None)
+        same = NoiseVolume.for_pattern(other, 4, self.bounds, cache_dir=None)
+        finer = NoiseVolume.for_pattern(other, 8, self.bounds, cache_dir=None)
+
+        # Assert
+        self.assertIs(same, volume)
+        self.assertIsNot(finer, volume)
+
+    def test_volume_is_loaded_from_the_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Arrange
+            baked = NoiseVolume.for_pattern(self.pattern, 4, self.bounds, cache_dir)
+            noisevolume._volumes.clear()
+
+            # Act
+            loaded = NoiseVolume.for_pattern(self.pattern, 4, self.bounds, cache_dir)
+
+            # Assert
+            self.assertIsNot(loaded, baked)
+            self.assertEqual(loaded.key, baked.key)
+            np.testing.assert_array_equal(loaded.values, baked.values)
+
+    def test_baked_batch_uses_live_noise_outside_the_volume(self):
+        # Arrange
+        live = PerturbedPattern(StripePattern(Colour(1, 0, 0), Colour(0, 0, 1)), octaves=2)
+        self.pattern.bake(4, self.bounds, cache_dir=None)
+        outside = np.array([[1.5, 0, 0], [-3.2, 2.1, 0.4]])
+
+        # Act
+        colours = self.pattern.pattern_at_batch(outside)
+
+        # Assert
+        np.testing.assert_array_equal(colours, live.pattern_at_batch(outside))
+
+    def test_baked_batch_matches_live_pattern_away_from_stripe_edges(self):
+        # Arrange
+        live = PerturbedPattern(StripePattern(Colour(1, 0, 0), Colour(0, 0, 1)), octaves=2)
+        self.pattern.bake(16, self.bounds, cache_dir=None)
+        perturbed_x = self.points[:, 0] + self.live_displacements(self.points)[:, 0]
+        away = np.abs(perturbed_x - np.round(perturbed_x)) > 0.05
+
+        # Act
+        colours = self.pattern.pattern_at_batch(self.points[away])
+
+        # Assert
+        np.testing.assert_array_equal(colours, live.pattern_at_batch(self.points[away]))
+
+    def test_single_lookups_match_batched_lookups(self):
+        # Arrange
+        volume = NoiseVolume.for_pattern(self.pattern, 4, self.bounds)
+        points = np.vstack((self.points, [[1, 1, 1], [-1, -1, -1], [1.5, 0, 0]]))
+
+        # Act
+        displacements = [volume.displacement(x, y, z) for x, y, z in points.tolist()]
+
+        # Assert
+        self.assertIsNone(displacements[-1])
+        np.testing.assert_allclose(displacements[:-1], volume.displacement_batch(points[:-1]), rtol=0, atol=1e-15)
+
+    def test_a_baked_pattern_uses_the_volume_for_single_points(self):
+        # Arrange
+        self.pattern.bake(4, self.bounds)
+        points = np.vstack((self.points, [[1.5, 0, 0], [-3.2, 2.1, 0.4]]))
+
+        # Act
+        colours = [self.pattern.pattern_at(Point(x, y, z)) for x, y, z in points.tolist()]
+
+        # Assert
+        expected = self.pattern.pattern_at_batch(points)
+        self.assertEqual(colours, [Colour(*rgb) for rgb in expected.tolist()])
+
+    def test_volumes_are_only_saved_to_disk_when_asked(self):
+        # Arrange
+        with mock.patch.object(NoiseVolume, 'save') as save:
+            # Act
+            self.pattern.bake(4, self.bounds)
+
+            # Assert
+            save.assert_not_called()
+
+    def test_saves_of_the_same_volume_write_separate_temporary_files(self):
+        # Arrange
+        volume = NoiseVolume.for_pattern(self.pattern, 4, self.bounds, cache_dir=None)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            file_name = Path(cache_dir) / 'volume.npz'
+            temporaries = []
+            real_savez = np.savez
+
+            def savez(f, **arrays):
+                temporaries.append(f.name)
+                # Another process's save of the same volume is partway through
+                if len(temporaries) == 1:
+                    volume.save(file_name)
+                real_savez(f, **arrays)
+
+            # Act
+            with mock.patch.object(np, 'savez', savez):
+                volume.save(file_name)
+
+            # Assert
+            self.assertEqual(len(set(temporaries)), 2)
+            self.assertEqual(sorted(path.name for path in Path(cache_dir).iterdir()), ['volume.npz'])
+            np.testing.assert_array_equal(np.load(file_name)['values'], volume.values)
+
+    def test_a_failed_save_leaves_no_temporary_file_behind(self):
+        # Arrange
+        volume = NoiseVolume.for_pattern(self.pattern, 4, self.bounds, cache_dir=None)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Act
+            with mock.patch.object(np, 'savez', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    volume.save(Path(cache_dir) / 'volume.npz')
+
+            # Assert
+            self.assertEqual(list(Path(cache_dir).iterdir()), [])
+
+    def test_a_pickled_volume_still_gives_single_lookups(self):
+        # Arrange
+        volume = NoiseVolume.for_pattern(self.pattern, 4, self.bounds)
+        expected = volume.displacement(0.1, 0.2, 0.3)
+
+        # Act
+        copy = pickle.loads(pickle.dumps(volume))
+
+        # Assert
+        self.assertEqual(copy.displacement(0.1, 0.2, 0.3), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
+import sys
+import threading
 import unittest
+import numpy as np
 from patterns import *
 from colours import Colour
 from primitives import *
@@ -392,6 +395,117 @@ class BlendedPatternTestCase(unittest.TestCase):
         self.assertTrue(all([r == GREY for i, r in enumerate(results2) if i == 0 % 2]))
         self.assertTrue(all([r == BLACK for i, r in enumerate(results2) if i == 1 % 2]))
 
+    def test_a_blended_pattern_within_a_nested_pattern_sees_the_shape_being_shaded(self):
+        # Arrange
+        s1 = Sphere()
+        s2 = Sphere()
+        s2.transform = Matrix.translation(0.5, 0, 0)
+        blended = self.ground.material.pattern
+        nested = NestedPattern(CheckersPattern(WHITE, BLACK), StripePattern(WHITE, BLACK), blended)
+        point = Point(0.25, 0, 0.25)
+
+        # Act
+        colour2 = nested.pattern_at_shape(s2, point)
+        colour1 = nested.pattern_at_shape(s1, point)
+
+        # Assert
+        self.assertEqual(colour2, Colour(0.5, 0.5, 0.5))
+        self.assertEqual(colour1, WHITE)
+
+    def test_a_shared_blended_pattern_shades_each_thread_s_shape(self):
+        # Arrange
+        pattern = BlendedPattern(StripePattern(WHITE, BLACK), RingPattern(Colour(0, 1, 0), Colour(1, 0, 0)))
+        shapes = []
+        for i in range(4):
+            s = Sphere()
+            s.transform = Matrix.translation(i * 0.37, 0, 0) * Matrix.scaling(1 + i, 1, 1)
+            shapes.append(s)
+        point = Point(0.3, 0.2, 0.1)
+        expected = [pattern.pattern_at_shape(s, point) for s in shapes]
+        wrong = []
+
+        def shade(index):
+            for _ in range(5000):
+                if not pattern.pattern_at_shape(shapes[index], point) == expected[index]:
+                    wrong.append(index)
+
+        threads = [threading.Thread(target=shade, args=(i,)) for i in range(len(shapes))]
+        interval = sys.getswitchinterval()
+
+        # Act
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        # Assert
+        self.assertEqual(wrong, [])
+
+
+class PatternBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        red = Colour(1, 0, 0)
+        blue = Colour(0, 0, 1)
+        self.shape = Sphere()
+        self.shape.transform = Matrix.translation(0.3, -0.2, 0.5) * Matrix.scaling(1.5, 0.5, 2)
+        rotated = StripePattern(red, blue)
+        rotated.transform = Matrix.rotation_y(pi / 3)
+        self.patterns = {
+            'stripe': StripePattern(red, blue),
+            'gradient': GradientPattern(red, blue),
+            'double gradient': DoubleGradientPattern(red, blue),
+            'ring': RingPattern(red, blue),
+            'gradient ring': GradientRingPattern(red, blue),
+            'double gradient ring': DoubleGradientRingPattern(red, blue),
+            'checkers': CheckersPattern(red, blue),
+            'blended': BlendedPattern(StripePattern(WHITE, BLACK), rotated),
+            'nested': NestedPattern(CheckersPattern(WHITE, BLACK), StripePattern(red, blue), rotated),
+            'perturbed': PerturbedPattern(RingPattern(red, blue)),
+            'fallback': TestPattern(),
+        }
+        for pattern in self.patterns.values():
+            pattern.transform = pattern.transform * Matrix.scaling(0.5, 0.7, 0.4)
+        self.points = np.random.default_rng(1).uniform(-3, 3, (200, 3))
+        self.points[0] = (1, 0, 0)
+
+    def test_batched_patterns_match_point_by_point_evaluation(self):
+        for name, pattern in self.patterns.items():
+            with self.subTest(pattern=name):
+                # Arrange
+                expected = [pattern.pattern_at_shape(self.shape, Point(*point)) for point in self.points.tolist()]
+
+                # Act
+                colours = pattern.pattern_at_shape_batch(self.shape, self.points)
+
+                # Assert
+                self.assertEqual(colours.shape, (200, 3))
+                self.assertTrue(np.allclose(colours, [(c.red, c.green, c.blue) for c in expected]))
+
+    def test_batched_patterns_accept_homogeneous_points(self):
+        # Arrange
+        pattern = self.patterns['checkers']
+        points = np.hstack((self.points, np.ones((200, 1))))
+
+        # Act
+        colours = pattern.pattern_at_batch(points)
+
+        # Assert
+        self.assertTrue(np.array_equal(colours, pattern.pattern_at_batch(self.points)))
+
+    def test_a_gradient_is_its_second_colour_at_exactly_one(self):
+        # Arrange
+        pattern = GradientPattern(WHITE, BLACK)
+
+        # Act
+        colours = pattern.pattern_at_batch(np.array([(1.0, 0, 0), (0.25, 0, 0)]))
+
+        # Assert
+        self.assertTrue(np.allclose(colours, [(0, 0, 0), (0.75, 0.75, 0.75)]))
+
 
 if __name__ == '__main__':
     unittest.main()
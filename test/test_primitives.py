@@ -1,16 +1,22 @@
 import unittest
-from rays import Ray
+from rays import Ray, RayBatch
 from primitives import *
 from matrices import Matrix
 from materials import Material
+from intersections import Intersection
+from bounds import BoundingBox
 from math import sqrt, pi
 
 
 class TestShape(Shape):
+    saved_ray = None
+
     def intersects(self, ray):
         return super(TestShape, self).intersects(ray)
 
     def local_intersect(self, local_ray):
+        # Kept so tests can see the ray in object space; real shapes hold no per-ray state
+        self.saved_ray = local_ray
         primitive_to_ray = local_ray.origin - self.origin
         a = local_ray.direction.dot(local_ray.direction)
         b = 2 * local_ray.direction.dot(primitive_to_ray)
@@ -23,12 +29,15 @@ class TestShape(Shape):
             t2 = (-b + sqrt(discriminant)) / (2 * a)
             return [Intersection(t1, self), Intersection(t2, self)]
 
-    def normal_at(self, point):
-        return super(TestShape, self).normal_at(point)
+    def normal_at(self, point, hit=None):
+        return super(TestShape, self).normal_at(point, hit)
 
     def local_normal_at(self, point):
         return Vector.from_tuple(point - Point(0, 0, 0))
 
+    def bounds(self):
+        return BoundingBox(Point(-1, -1, -1), Point(1, 1, 1))
+
 
 class PrimitiveTestCase(unittest.TestCase):
     def test_shape_is_created_at_the_origin(self):
@@ -728,5 +737,306 @@ class ConeTestCase(unittest.TestCase):
                 self.assertEqual(n, expected_normal)
 
 
+class BatchIntersectionTestCase(unittest.TestCase):
+    def test_batched_intersections_match_single_ray_intersections(self):
+        # Arrange
+        cylinder = Cylinder()
+        cylinder.minimum = -1
+        cylinder.maximum = 2
+        cylinder.closed = True
+        cone = Cone()
+        cone.minimum = -1.5
+        cone.maximum = 1
+        cone.closed = True
+        shapes = [Sphere(), Plane(), Cube(), Cylinder(), Cone(), cylinder, cone]
+        rays = [Ray(Point(0, 0, -5), Vector(0, 0, 1)),
+                Ray(Point(0.5, 0.5, -5), Vector(0.1, 0.2, 1).normalise()),
+                Ray(Point(0, 5, 0), Vector(0, -1, 0)),
+                Ray(Point(0, 0.5, -5), Vector(0, 1, 1).normalise()),
+                Ray(Point(3, 3, 3), Vector(-1, -1, -1).normalise()),
+                Ray(Point(0, 10, -5), Vector(0, 0, 1)),
+                Ray(Point(0, 0, 0), Vector(0.3, 0.9, -0.1).normalise())]
+        batch = RayBatch.from_rays(rays)
+
+        for s in shapes:
+            s.transform = Matrix.translation(0.2, 0.1, 0.3) * Matrix.rotation_x(0.3)
+            with self.subTest(shape=type(s).__name__):
+                # Act
+                t, mask = s.intersects_batch(batch)
+
+                # Assert
+                for i, ray in enumerate(rays):
+                    expected = [x.t for x in s.intersects(ray)]
+                    self.assertEqual(len(t[i][mask[i]]), len(expected))
+                    for result, value in zip(t[i][mask[i]], expected):
+                        self.assertAlmostEqual(result, value)
+
+    def test_masked_batch_intersections_hold_infinity(self):
+        # Arrange
+        s = Sphere()
+        batch = RayBatch.from_rays([Ray(Point(0, 2, -5), Vector(0, 0, 1)), Ray(Point(0, 0, -5), Vector(0, 0, 1))])
+
+        # Act
+        t, mask = s.intersects_batch(batch)
+
+        # Assert
+        self.assertListEqual(mask.tolist(), [[False, False], [True, True]])
+        self.assertListEqual(t.tolist(), [[float('inf'), float('inf')], [4, 6]])
+
+
+class TriangleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.t = Triangle(Point(0, 1, 0), Point(-1, 0, 0), Point(1, 0, 0))
+
+    def test_constructing_a_triangle(self):
+        # Arrange
+        # Act
+        # Assert
+        self.assertEqual(self.t.e1, Vector(-1, -1, 0))
+        self.assertEqual(self.t.e2, Vector(1, -1, 0))
+        self.assertEqual(self.t.normal, Vector(0, 0, -1))
+
+    def test_finding_the_normal_on_a_triangle(self):
+        # Arrange
+        points = [Point(0, 0.5, 0), Point(-0.5, 0.75, 0), Point(0.5, 0.25, 0)]
+
+        for point in points:
+            with self.subTest(point=point):
+                # Act
+                n = self.t.local_normal_at(point)
+
+                # Assert
+                self.assertEqual(n, self.t.normal)
+
+    def test_a_ray_misses_a_triangle(self):
+        # Arrange
+        rays = [Ray(Point(0, -1, -2), Vector(0, 1, 0)),
+                Ray(Point(1, 1, -2), Vector(0, 0, 1)),
+                Ray(Point(-1, 1, -2), Vector(0, 0, 1)),
+                Ray(Point(0, -1, -2), Vector(0, 0, 1))]
+
+        for r in rays:
+            with self.subTest(ray=r):
+                # Act
+                xs = self.t.local_intersect(r)
+
+                # Assert
+                self.assertEqual(len(xs), 0)
+
+    def test_a_ray_strikes_a_triangle(self):
+        # Arrange
+        r = Ray(Point(0, 0.5, -2), Vector(0, 0, 1))
+
+        # Act
+        xs = self.t.local_intersect(r)
+
+        # Assert
+        self.assertEqual(len(xs), 1)
+        self.assertAlmostEqual(xs[0].t, 2)
+
+    def test_an_intersection_with_a_triangle_stores_u_and_v(self):
+        # Arrange
+        r = Ray(Point(-0.2, 0.3, -2), Vector(0, 0, 1))
+
+        # Act
+        xs = self.t.local_intersect(r)
+
+        # Assert
+        self.assertAlmostEqual(xs[0].u, 0.45)
+        self.assertAlmostEqual(xs[0].v, 0.25)
+        self.assertIs(xs[0].object, self.t)
+
+
+class SmoothTriangleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tri = SmoothTriangle(Point(0, 1, 0), Point(-1, 0, 0), Point(1, 0, 0),
+                                  Vector(0, 1, 0), Vector(-1, 0, 0), Vector(1, 0, 0))
+
+    def test_a_smooth_triangle_uses_u_and_v_to_interpolate_the_normal(self):
+        # Arrange
+        i = Intersection(1, self.tri, 0.45, 0.25)
+
+        # Act
+        n = self.tri.normal_at(Point(0, 0, 0), i)
+
+        # Assert
+        self.assertEqual(n, Vector(-0.5547, 0.83205, 0))
+
+    def test_preparing_the_normal_on_a_smooth_triangle(self):
+        # Arrange
+        i = Intersection(1, self.tri, 0.45, 0.25)
+        r = Ray(Point(-0.2, 0.3, -2), Vector(0, 0, 1))
+
+        # Act
+        comps = i.prepare_computations(r, [i])
+
+        # Assert
+        self.assertEqual(comps.normal_vector, Vector(-0.5547, 0.83205, 0))
+
+
+
+class GroupTestCase(unittest.TestCase):
+    def test_creating_a_new_group(self):
+        # Arrange
+        # Act
+        g = Group()
+
+        # Assert
+        self.assertEqual(g.transform, Matrix.identity(4))
+        self.assertEqual(len(g), 0)
+
+    def test_adding_a_child_to_a_group(self):
+        # Arrange
+        g = Group()
+        s = TestShape()
+
+        # Act
+        g.add_child(s)
+
+        # Assert
+        self.assertIn(s, g.children)
+        self.assertIs(s.parent, g)
+
+    def test_intersecting_a_ray_with_an_empty_group(self):
+        # Arrange
+        g = Group()
+        r = Ray(Point(0, 0, 0), Vector(0, 0, 1))
+
+        # Act
+        xs = g.local_intersect(r)
+
+        # Assert
+        self.assertEqual(xs, [])
+
+    def test_intersecting_a_ray_with_a_nonempty_group(self):
+        # Arrange
+        s1 = Sphere()
+        s2 = Sphere()
+        s2.transform = Matrix.translation(0, 0, -3)
+        s3 = Sphere()
+        s3.transform = Matrix.translation(5, 0, 0)
+        g = Group([s1, s2, s3])
+        r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+
+        # Act
+        xs = sorted(g.local_intersect(r))
+
+        # Assert
+        self.assertEqual([x.object for x in xs], [s2, s2, s1, s1])
+
+    def test_intersecting_a_transformed_group(self):
+        # Arrange
+        s = Sphere()
+        s.transform = Matrix.translation(5, 0, 0)
+        g = Group([s])
+        g.transform = Matrix.scaling(2, 2, 2)
+        r = Ray(Point(10, 0, -10), Vector(0, 0, 1))
+
+        # Act
+        xs = g.intersects(r)
+
+        # Assert
+        self.assertEqual(len(xs), 2)
+
+    def test_a_ray_missing_the_groups_bounds_skips_its_children(self):
+        # Arrange
+        s = TestShape()
+        g = Group([s])
+        r = Ray(Point(0, 0, -5), Vector(0, 1, 0))
+
+        # Act
+        xs = g.intersects(r)
+
+        # Assert
+        self.assertEqual(xs, [])
+        self.assertIsNone(s.saved_ray)
+
+    def test_a_groups_bounds_contain_its_transformed_children(self):
+        # Arrange
+        s = Sphere()
+        s.transform = Matrix.translation(2, 5, -3) * Matrix.scaling(2, 2, 2)
+        c = Cylinder()
+        c.minimum = -2
+        c.maximum = 2
+        c.transform = Matrix.translation(-4, -1, 4) * Matrix.scaling(0.5, 1, 0.5)
+        g = Group([s, c])
+
+        # Act
+        box = g.bounds()
+
+        # Assert
+        self.assertEqual(box.minimum, Point(-4.5, -3, -5))
+        self.assertEqual(box.maximum, Point(4, 7, 4.5))
+
+    def test_converting_a_point_from_world_to_object_space(self):
+        # Arrange
+        g1 = Group()
+        g1.transform = Matrix.rotation_y(pi / 2)
+        g2 = Group()
+        g2.transform = Matrix.scaling(2, 2, 2)
+        g1.add_child(g2)
+        s = Sphere()
+        s.transform = Matrix.translation(5, 0, 0)
+        g2.add_child(s)
+
+        # Act
+        p = s.world_to_object * Point(-2, 0, -10)
+
+        # Assert
+        self.assertEqual(p, Point(0, 0, -1))
+
+    def test_finding_the_normal_on_a_child_object(self):
+        # Arrange
+        g1 = Group()
+        g1.transform = Matrix.rotation_y(pi / 2)
+        g2 = Group()
+        g2.transform = Matrix.scaling(1, 2, 3)
+        g1.add_child(g2)
+        s = Sphere()
+        s.transform = Matrix.translation(5, 0, 0)
+        g2.add_child(s)
+
+        # Act
+        n = s.normal_at(Point(1.7321, 1.1547, -5.5774))
+
+        # Assert
+        self.assertEqual(n, Vector(0.2857, 0.42854, -0.85716))
+
+    def test_changing_a_groups_transform_updates_its_childrens_matrices_and_its_parents_bounds(self):
+        # Arrange
+        s = Sphere()
+        g2 = Group([s])
+        g1 = Group([g2])
+        before = s.world_to_object * Point(0, 0, 0)
+        g1.bounds()
+
+        # Act
+        g2.transform = Matrix.translation(0, 3, 0)
+
+        # Assert
+        self.assertEqual(before, Point(0, 0, 0))
+        self.assertEqual(s.world_to_object * Point(0, 0, 0), Point(0, -3, 0))
+        self.assertEqual(g1.bounds().maximum, Point(1, 4, 1))
+
+    def test_changing_a_childs_extents_updates_the_bounds_of_every_group_above_it(self):
+        for shape in (Cylinder, Cone):
+            with self.subTest(shape.__name__):
+                # Arrange
+                child = shape()
+                child.minimum = -1
+                child.maximum = 1
+                g2 = Group([child])
+                g1 = Group([g2])
+                g1.bounds()
+
+                # Act
+                child.maximum = 3
+                child.minimum = 0
+
+                # Assert
+                self.assertEqual(g2.bounds().minimum.y, 0)
+                self.assertEqual(g1.bounds().maximum.y, 3)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,161 @@
+import sys
+sys.path.append('..')
+import json
+import unittest
+from math import pi, sqrt
+from camera import Camera
+from profiling import Profiler
+from primitives import Plane
+from world import World
+from matrices import Matrix
+from patterns import StripePattern
+from transformations import Transformations
+from tuples import *
+from colours import Colour
+from rays import Ray
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.world = World.default_world()
+        self.camera = Camera(11, 11, pi / 2)
+        self.camera.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+
+    def test_a_render_without_a_profiler_runs_the_original_methods(self):
+        # Arrange
+        colour_at = World.__dict__['colour_at']
+        profiler = Profiler()
+
+        # Act
+        self.camera.render(self.world, profiler=profiler)
+
+        # Assert
+        self.assertIs(World.__dict__['colour_at'], colour_at)
+        self.assertFalse(profiler.enabled)
+
+    def test_profiling_a_render_counts_primary_and_shadow_rays(self):
+        # Arrange
+        profiler = Profiler()
+
+        # Act
+        self.camera.render(self.world, profiler=profiler)
+        report = profiler.report()
+
+        # Assert
+        self.assertEqual(report['rays']['primary'], 121)
+        self.assertEqual(report['rays']['shadow'], report['calls']['is_shadowed'])
+        self.assertEqual(report['rays']['shadow'], report['prepare_computations'])
+        self.assertEqual(report['rays']['reflection'], 0)
+        self.assertEqual(report['calls']['intersect_batch'], self.camera.vsize)
+        self.assertGreater(report['intersection_tests']['Sphere'], 0)
+        self.assertGreater(report['render_seconds'], 0)
+
+    def test_profiling_counts_reflected_rays(self):
+        # Arrange
+        shape = Plane()
+        shape.material.reflective = 0.5
+        shape.transform = Matrix.translation(0, -1, 0)
+        self.world.objects.append(shape)
+        r = Ray(Point(0, 0, -3), Vector(0, -sqrt(2) / 2, sqrt(2) / 2))
+
+        # Act
+        with Profiler() as profiler:
+            self.world.colour_at(r)
+
+        # Assert
+        self.assertEqual(profiler.rays, {'primary': 1, 'shadow': 2, 'reflection': 1, 'refraction': 0})
+        self.assertEqual(profiler.prepare_computations, 2)
+        self.assertEqual(profiler.calls['shade_hit'], 2)
+
+    def test_profiling_counts_pattern_evaluations(self):
+        # Arrange
+        self.world.objects[0].material.pattern = StripePattern(Colour(1, 1, 1), Colour(0, 0, 0))
+        profiler = Profiler()
+
+        patterned_hits = 0
+        for ray in self.camera.rays_for_image():
+            comps = self.world.hit_computations(ray)
+            if comps is not None and comps.object is self.world.objects[0]:
+                patterned_hits += 1
+
+        # Act
+        self.camera.render(self.world, profiler=profiler)
+
+        # Assert
+        self.assertGreater(profiler.calls['pattern_batch'], 0)
+        self.assertEqual(profiler.pattern_evaluations, profiler.calls['pattern'] + patterned_hits)
+
+    def test_the_report_is_json_serialisable(self):
+        # Arrange
+        profiler = Profiler()
+        self.camera.render(self.world, profiler=profiler)
+
+        # Act
+        report = json.loads(profiler.to_json())
+
+        # Assert
+        self.assertEqual(report, profiler.report())
+
+    def test_only_one_profiler_can_be_enabled_at_a_time(self):
+        # Arrange
+        with Profiler():
+            # Act
+            # Assert
+            self.assertRaises(RuntimeError, Profiler().enable)
+
+    def test_worker_counts_are_merged_into_the_parallel_render_report(self):
+        # Arrange
+        serial = Profiler()
+        parallel = Profiler()
+        self.camera.render(self.world, profiler=serial)
+
+        # Act
+        self.camera.render(self.world, workers=2, tile_size=4, profiler=parallel)
+
+        # Assert
+        self.assertEqual(parallel.rays, serial.rays)
+        self.assertEqual(parallel.intersections, serial.intersections)
+        self.assertEqual(parallel.calls['intersect_world'], serial.calls['intersect_world'])
+        self.assertEqual(parallel.calls['shade_hit'], serial.calls['shade_hit'])
+        self.assertEqual(parallel.calls['ray_generation'], len(list(self.camera.tiles(4))))
+
+    def test_each_threads_counts_are_merged_into_the_threaded_render_report(self):
+        # Arrange
+        serial = Profiler()
+        threaded = Profiler()
+        self.camera.render(self.world, profiler=serial)
+        interval = sys.getswitchinterval()
+
+        # Act
+        # Switching threads as often as possible makes any counter shared between them lose counts
+        sys.setswitchinterval(1e-6)
+        try:
+            self.camera.render(self.world, workers=4, tile_size=2, profiler=threaded, backend='thread')
+        finally:
+            sys.setswitchinterval(interval)
+
+        # Assert
+        self.assertFalse(threaded.enabled)
+        self.assertEqual(threaded.rays, serial.rays)
+        self.assertEqual(threaded.intersections, serial.intersections)
+        self.assertEqual(threaded.prepare_computations, serial.prepare_computations)
+        self.assertEqual(threaded.calls['shade_hit'], serial.calls['shade_hit'])
+        self.assertEqual(threaded.calls['ray_generation'], len(list(self.camera.tiles(2))))
+        self.assertGreater(threaded.render_seconds, 0)
+
+    def test_a_threads_counts_go_to_its_own_profiler(self):
+        # Arrange
+        ray = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+
+        # Act
+        with Profiler() as profiler:
+            with profiler.thread() as thread_profiler:
+                self.world.colour_at(ray)
+
+        # Assert
+        self.assertEqual(profiler.rays['primary'], 0)
+        self.assertEqual(thread_profiler.rays['primary'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
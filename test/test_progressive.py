@@ -0,0 +1,204 @@
+import sys
+sys.path.append('..')
+import os
+import tempfile
+import unittest
+import numpy as np
+from math import pi
+from camera import Camera
+from progressive import ProgressiveRender, pass_offsets, scene_fingerprint
+from transformations import Transformations
+from matrices import Matrix
+from tuples import *
+from world import World
+from primitives import Group, Sphere
+from mesh import Mesh
+
+
+class Slotted:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ProgressiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.world = World.default_world()
+        self.camera = Camera(11, 9, pi / 2)
+        self.camera.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, 'render.npz')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def stop_after(self, render, units):
+        # Makes render stop once the given number of units are complete
+        render_unit = render.render_unit
+
+        def unit(index, *args):
+            if index == units - 1:
+                render.stop(wait=False)
+            return render_unit(index, *args)
+        render.render_unit = unit
+
+    def test_pass_offsets_run_from_coarse_to_fine(self):
+        # Arrange
+        # Act
+        offsets = pass_offsets(4)
+
+        # Assert
+        self.assertEqual(offsets[:4], [(0, 0), (2, 0), (0, 2), (2, 2)])
+        self.assertEqual(sorted(offsets), [(x, y) for x in range(4) for y in range(4)])
+
+    def test_the_pass_step_must_be_a_power_of_two(self):
+        # Arrange
+        # Act
+        # Assert
+        self.assertRaises(ValueError, pass_offsets, 6)
+
+    def test_a_completed_progressive_render_matches_a_normal_render(self):
+        # Arrange
+        render = ProgressiveRender(self.camera, self.world, step=4, tile_size=4)
+
+        # Act
+        image = render.run()
+
+        # Assert
+        self.assertTrue(render.finished)
+        self.assertTrue(np.allclose(image.pixels, self.camera.render(self.world).pixels, atol=1e-6))
+
+    def test_the_preview_fills_unrendered_pixels_from_the_first_pass(self):
+        # Arrange
+        render = ProgressiveRender(self.camera, self.world, step=4, tile_size=16)
+        self.stop_after(render, 1)
+
+        # Act
+        render.run()
+        image = render.preview()
+
+        # Assert
+        self.assertEqual(render.completed, 1)
+        self.assertTrue((render.count[::4, ::4] == 1).all())
+        self.assertEqual(render.count.sum(), 9)
+        self.assertEqual(image.get_pixel(5, 5), image.get_pixel(4, 4))
+        self.assertEqual(image.get_pixel(10, 8), image.get_pixel(8, 8))
+
+    def test_an_interrupted_render_resumes_from_its_checkpoint(self):
+        # Arrange
+        expected = ProgressiveRender(self.camera, self.world, step=2, samples=2, tile_size=4).run()
+        first = ProgressiveRender(self.camera, self.world, step=2, samples=2, tile_size=4, checkpoint=self.checkpoint)
+        self.stop_after(first, 7)
+        first.run()
+
+        # Act
+        resumed = ProgressiveRender(self.camera, self.world, step=2, samples=2, tile_size=4,
+                                    checkpoint=self.checkpoint)
+        image = resumed.run()
+
+        # Assert
+        self.assertEqual(first.completed, 7)
+        self.assertFalse(first.finished)
+        self.assertTrue(resumed.finished)
+        self.assertTrue((image.pixels == expected.pixels).all())
+        self.assertTrue((resumed.count == 2).all())
+
+    def test_a_render_resumes_against_the_same_scene_built_again(self):
+        # Arrange
+        first = ProgressiveRender(self.camera, self.world, step=2, tile_size=4, checkpoint=self.checkpoint)
+        self.stop_after(first, 3)
+        first.run()
+        world = World.default_world()
+        camera = Camera(11, 9, pi / 2)
+        camera.transform = Transformations.view_transform(Point(0, 0, -5), Point(0, 0, 0), Vector(0, 1, 0))
+
+        # Act
+        resumed = ProgressiveRender(camera, world, step=2, tile_size=4, checkpoint=self.checkpoint)
+
+        # Assert
+        self.assertEqual(resumed.completed, 3)
+
+    def test_a_checkpoint_cannot_be_resumed_with_a_different_tile_size(self):
+        # Arrange
+        first = ProgressiveRender(self.camera, self.world, step=2, tile_size=12, checkpoint=self.checkpoint)
+        self.stop_after(first, 1)
+        first.run()
+
+        # Act
+        # Assert
+        self.assertEqual(len(list(self.camera.tiles(16))), len(first.tiles))
+        self.assertRaises(ValueError, ProgressiveRender, self.camera, self.world, step=2, tile_size=16,
+                          checkpoint=self.checkpoint)
+
+    def test_a_checkpoint_cannot_be_resumed_against_a_different_scene(self):
+        # Arrange
+        first = ProgressiveRender(self.camera, self.world, step=2, checkpoint=self.checkpoint)
+        self.stop_after(first, 1)
+        first.run()
+        self.world.objects[1].transform = Matrix.scaling(0.25, 0.25, 0.25)
+
+        # Act
+        # Assert
+        self.assertRaises(ValueError, ProgressiveRender, self.camera, self.world, step=2, checkpoint=self.checkpoint)
+
+    def test_the_fingerprint_ignores_render_caches(self):
+        # Arrange
+        before = scene_fingerprint(self.camera, self.world, 5)
+
+        # Act
+        self.camera.render(self.world)
+
+        # Assert
+        self.assertEqual(scene_fingerprint(self.camera, self.world, 5), before)
+
+    def test_the_fingerprint_ignores_the_caches_of_groups_and_meshes(self):
+        # Arrange
+        mesh = Mesh([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]])
+        self.world.objects.append(Group([Group([Sphere()]), mesh]))
+        before = scene_fingerprint(self.camera, self.world, 5)
+
+        # Act
+        self.camera.render(self.world)
+
+        # Assert
+        self.assertEqual(scene_fingerprint(self.camera, self.world, 5), before)
+
+    def test_the_fingerprint_describes_the_contents_of_dictionaries(self):
+        # Arrange
+        self.world.objects[0].material.tag = {'a': 1}
+        before = scene_fingerprint(self.camera, self.world, 5)
+
+        # Act
+        self.world.objects[0].material.tag = {'a': 2}
+
+        # Assert
+        self.assertNotEqual(scene_fingerprint(self.camera, self.world, 5), before)
+
+    def test_the_fingerprint_describes_slotted_objects(self):
+        # Arrange
+        self.world.objects[0].material.tag = Slotted(1)
+        before = scene_fingerprint(self.camera, self.world, 5)
+
+        # Act
+        self.world.objects[0].material.tag = Slotted(2)
+
+        # Assert
+        self.assertNotEqual(scene_fingerprint(self.camera, self.world, 5), before)
+
+    def test_a_background_render_can_be_previewed_and_waited_for(self):
+        # Arrange
+        render = ProgressiveRender(self.camera, self.world, step=2, tile_size=4)
+
+        # Act
+        render.start()
+        render.preview()
+        finished = render.wait()
+
+        # Assert
+        self.assertTrue(finished)
+        self.assertEqual(render.progress, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 from tuples import Point, Vector
 from matrices import Matrix
-from rays import Ray
+from rays import Ray, RayBatch
 
 
 class RaysTestCase(unittest.TestCase):
@@ -51,6 +51,21 @@ class RaysTestCase(unittest.TestCase):
         self.assertEqual(r2.origin, exp_origin)
         self.assertEqual(r2.direction, exp_direction)
 
+    def test_transforming_a_ray_gives_a_point_and_a_vector_for_any_matrix(self):
+        # Arrange
+        r = Ray(Point(1, 2, 3), Vector(0.5, 1, -2))
+        affine = Matrix.translation(1, -2, 3) * Matrix.rotation_z(0.4) * Matrix.scaling(2, 1, 3)
+        projective = Matrix([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0.5, 1]])
+
+        for m in (affine, projective):
+            with self.subTest(affine=m.is_affine):
+                # Act
+                r2 = r.transform(m)
+
+                # Assert
+                self.assertEqual(r2.origin, m * r.origin)
+                self.assertEqual(r2.direction, m * r.direction)
+
     def test_scaling_a_ray(self):
         # Arrange
         r = Ray(Point(1, 2, 3), Vector(0, 1, 0))
@@ -65,6 +80,42 @@ class RaysTestCase(unittest.TestCase):
         self.assertEqual(r2.origin, exp_origin)
         self.assertEqual(r2.direction, exp_direction)
 
+    def test_creating_a_ray_batch_from_rays(self):
+        # Arrange
+        rays = [Ray(Point(1, 2, 3), Vector(4, 5, 6)), Ray(Point(-1, 0, 2), Vector(0, 0, 1))]
+
+        # Act
+        batch = RayBatch.from_rays(rays)
+
+        # Assert
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.origins.shape, (2, 4))
+        self.assertEqual(batch[1].origin, Point(-1, 0, 2))
+        self.assertEqual(batch[1].direction, Vector(0, 0, 1))
+
+    def test_computing_positions_along_a_ray_batch(self):
+        # Arrange
+        batch = RayBatch.from_rays([Ray(Point(2, 3, 4), Vector(1, 0, 0)), Ray(Point(0, 0, 0), Vector(0, 2, 0))])
+
+        # Act
+        positions = batch.position([2.5, -1])
+
+        # Assert
+        self.assertEqual(Point(*positions[0][:3]), Point(4.5, 3, 4))
+        self.assertEqual(Point(*positions[1][:3]), Point(0, -2, 0))
+
+    def test_transforming_a_ray_batch(self):
+        # Arrange
+        batch = RayBatch.from_rays([Ray(Point(1, 2, 3), Vector(0, 1, 0))])
+        m = Matrix.scaling(2, 3, 4)
+
+        # Act
+        batch2 = batch.transform(m)
+
+        # Assert
+        self.assertEqual(batch2[0].origin, Point(2, 6, 12))
+        self.assertEqual(batch2[0].direction, Vector(0, 3, 0))
+
 
 if __name__ == '__main__':
     unittest.main()
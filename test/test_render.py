@@ -0,0 +1,173 @@
+import sys
+sys.path.append('..')
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from PIL import Image
+import render
+from scene import SceneError
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENE = str(ROOT / 'scenes' / 'pattern_test_Ch10.yaml')
+CHAPTER = str(ROOT / 'chapters' / 'chap07.py')
+
+
+class RenderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def job(self, **settings):
+        return {**render.JOB_DEFAULTS, 'scene': SCENE, 'width': 8, 'height': 4, **settings}
+
+    def test_building_a_scene_file_resizes_its_camera(self):
+        # Arrange
+        # Act
+        world, camera = render.build(SCENE, 40, 30)
+
+        # Assert
+        self.assertEqual((camera.hsize, camera.vsize), (40, 30))
+        self.assertEqual(len(world.objects), 2)
+
+    def test_building_a_scene_module_passes_the_size_to_its_builder(self):
+        # Arrange
+        # Act
+        world, camera = render.build(f'{CHAPTER}:build_scene', 12, 6)
+
+        # Assert
+        self.assertEqual((camera.hsize, camera.vsize), (12, 6))
+        self.assertGreater(len(world.objects), 0)
+
+    def test_a_missing_scene_builder_is_an_error(self):
+        # Arrange
+        # Act
+        # Assert
+        with self.assertRaises(SceneError):
+            render.scene_builder(f'{CHAPTER}:no_such_function')
+
+    def test_the_output_format_defaults_from_the_output_file(self):
+        cases = {
+            (None, None): ('pattern_test_Ch10.ppm', 'ppm'),
+            ('out.png', None): ('out.png', 'png'),
+            ('out.jpg', None): ('out.jpg', 'jpeg'),
+            (None, 'bmp'): ('pattern_test_Ch10.bmp', 'bmp'),
+        }
+        for (output, format), expected in cases.items():
+            with self.subTest(output=output, format=format):
+                # Arrange
+                job = self.job(output=output, format=format)
+
+                # Act
+                settings = render.output_settings(job)
+
+                # Assert
+                self.assertEqual(settings, expected)
+
+    def test_running_jobs_writes_images_and_a_timing_record_for_each(self):
+        # Arrange
+        jobs = [self.job(output=str(self.path / 'a.png')),
+                self.job(scene=CHAPTER, output=str(self.path / 'b.ppm'), depth=2)]
+        stream = io.StringIO()
+
+        # Act
+        failed = render.run(jobs, workers=2, stream=stream)
+
+        # Assert
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(failed, 0)
+        self.assertEqual([record['status'] for record in records[:2]], ['ok', 'ok'])
+        self.assertEqual(records[1]['depth'], 2)
+        self.assertGreater(records[0]['render_seconds'], 0)
+        self.assertEqual(records[2]['jobs'], 2)
+        with Image.open(self.path / 'a.png') as image:
+            self.assertEqual(image.size, (8, 4))
+        self.assertTrue((self.path / 'b.ppm').read_bytes().startswith(b'P3\n8 4\n'))
+
+    def test_a_failed_job_is_recorded_without_stopping_the_batch(self):
+        # Arrange
+        jobs = [self.job(scene=str(self.path / 'missing.yaml')), self.job(output=str(self.path / 'a.ppm'))]
+        stream = io.StringIO()
+
+        # Act
+        failed = render.run(jobs, stream=stream)
+
+        # Assert
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(failed, 1)
+        self.assertEqual(records[0]['status'], 'error')
+        self.assertIn('FileNotFoundError', records[0]['error'])
+        self.assertEqual(records[1]['status'], 'ok')
+
+    def test_an_error_raised_by_a_scene_builder_is_recorded_without_stopping_the_batch(self):
+        # Arrange
+        builder = self.path / 'broken.py'
+        builder.write_text("def build_scene(width=8, height=4):\n    return {}['world']\n")
+        jobs = [self.job(scene=str(builder), output=str(self.path / 'broken.ppm')),
+                self.job(output=str(self.path / 'a.ppm'))]
+        stream = io.StringIO()
+
+        # Act
+        failed = render.run(jobs, stream=stream)
+
+        # Assert
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(failed, 1)
+        self.assertEqual(records[0]['status'], 'error')
+        self.assertIn('KeyError', records[0]['error'])
+        self.assertEqual(records[1]['status'], 'ok')
+
+    def test_manifest_paths_are_relative_to_the_manifest(self):
+        # Arrange
+        manifest = self.path / 'jobs.json'
+        manifest.write_text(json.dumps([{'scene': 'scene.yaml', 'output': 'out.png', 'depth': 3},
+                                        {'scene': 'chapters.chap07'}]))
+
+        # Act
+        jobs = render.read_manifest(manifest, dict(render.JOB_DEFAULTS, width=20))
+
+        # Assert
+        self.assertEqual(jobs[0]['scene'], str(self.path / 'scene.yaml'))
+        self.assertEqual(jobs[0]['output'], str(self.path / 'out.png'))
+        self.assertEqual((jobs[0]['depth'], jobs[0]['width']), (3, 20))
+        self.assertEqual(jobs[1]['scene'], 'chapters.chap07')
+
+    def test_manifest_jobs_with_unknown_keys_are_rejected(self):
+        # Arrange
+        manifest = self.path / 'jobs.json'
+        manifest.write_text(json.dumps([{'scene': 'scene.yaml', 'resolution': 100}]))
+
+        # Act
+        # Assert
+        with self.assertRaises(SceneError):
+            render.read_manifest(manifest, render.JOB_DEFAULTS)
+
+    def test_command_line_renders_a_scene(self):
+        # Arrange
+        output = self.path / 'scene.ppm'
+        stream = io.StringIO()
+
+        # Act
+        with redirect_stdout(stream):
+            status = render.main([SCENE, '--width', '6', '--height', '3', '-w', '1', '-o', str(output)])
+
+        # Assert
+        self.assertEqual(status, 0)
+        self.assertTrue(output.read_bytes().startswith(b'P3\n6 3\n'))
+        self.assertEqual(json.loads(stream.getvalue().splitlines()[0])['status'], 'ok')
+
+    def test_command_line_needs_a_scene_or_a_manifest(self):
+        # Arrange
+        # Act
+        # Assert
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            render.main([])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,317 @@
+import sys
+sys.path.append('..')
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from colours import Colour
+from matrices import Matrix
+from mesh import Mesh
+from patterns import BlendedPattern, PerturbedPattern, StripePattern
+from primitives import Cylinder, Group, Plane, Sphere
+from scene import SceneError, load_scene, parse_scene
+from tuples import Point
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'chapters'))
+import pattern_test_Ch10
+
+CAMERA = {'add': 'camera', 'width': 20, 'height': 10, 'field-of-view': 1.2, 'from': [0, 1, -5], 'to': [0, 0, 0],
+          'up': [0, 1, 0]}
+
+
+def scene(*items):
+    return parse_scene(json.dumps([CAMERA, *items]), 'json')
+
+
+class SceneTestCase(unittest.TestCase):
+    def test_yaml_scene_matches_the_scene_built_in_python(self):
+        # Arrange
+        expected_world, expected_camera = pattern_test_Ch10.build_scene()
+
+        # Act
+        world, camera = load_scene(ROOT / 'scenes' / 'pattern_test_Ch10.yaml')
+
+        # Assert
+        self.assertEqual((camera.hsize, camera.vsize), (expected_camera.hsize, expected_camera.vsize))
+        self.assertEqual(camera.transform, expected_camera.transform)
+        self.assertEqual(world.lights, expected_world.lights)
+        self.assertEqual([type(obj) for obj in world.objects], [Plane, Sphere])
+        self.assertIsInstance(world.objects[0].material.pattern, BlendedPattern)
+        for x, y in ((100, 300), (400, 450), (390, 250), (10, 590), (450, 350)):
+            ray = camera.ray_for_pixel(x, y)
+            self.assertEqual(world.colour_at(ray), expected_world.colour_at(ray))
+
+    def test_camera_and_lights_are_added(self):
+        # Arrange
+        light = {'add': 'light', 'at': [-10, 10, -10], 'intensity': [1, 0.5, 0.25]}
+
+        # Act
+        world, camera = scene(light, dict(light, at=[10, 10, -10]))
+
+        # Assert
+        self.assertEqual((camera.hsize, camera.vsize, camera.field_of_view), (20, 10, 1.2))
+        self.assertEqual(len(world.lights), 2)
+        self.assertEqual(world.lights[0].position, Point(-10, 10, -10))
+        self.assertEqual(world.lights[0].intensity, Colour(1, 0.5, 0.25))
+
+    def test_transforms_are_applied_in_the_order_listed(self):
+        # Arrange
+        item = {'add': 'sphere', 'transform': [['scale', 2, 2, 2], ['translate', 1, 0, 0], ['rotate-y', 0.5]]}
+
+        # Act
+        world, _ = scene(item)
+
+        # Assert
+        self.assertEqual(world.objects[0].transform,
+                         Matrix.rotation_y(0.5) * Matrix.translation(1, 0, 0) * Matrix.scaling(2, 2, 2))
+
+    def test_named_transforms_can_be_used_within_a_transform(self):
+        # Arrange
+        define = {'define': 'unit', 'value': [['translate', 1, 1, 1], ['scale', 0.5, 0.5, 0.5]]}
+        item = {'add': 'cube', 'transform': ['unit', ['translate', 0, 2, 0]]}
+
+        # Act
+        world, _ = scene(define, item)
+
+        # Assert
+        self.assertEqual(world.objects[0].transform,
+                         Matrix.translation(0, 2, 0) * Matrix.scaling(0.5, 0.5, 0.5) * Matrix.translation(1, 1, 1))
+
+    def test_named_materials_are_shared(self):
+        # Arrange
+        define = {'define': 'glass', 'value': {'color': [0.1, 0.1, 0.1], 'transparency': 0.9,
+                                               'refractive-index': 1.5}}
+
+        # Act
+        world, _ = scene(define, {'add': 'sphere', 'material': 'glass'}, {'add': 'sphere', 'material': 'glass'},
+                         {'add': 'sphere', 'material': {'transparency': 0.9}})
+
+        # Assert
+        first, second, third = (obj.material for obj in world.objects)
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+        self.assertEqual(first.refractive_index, 1.5)
+        self.assertEqual(first.colour, Colour(0.1, 0.1, 0.1))
+
+    def test_definitions_can_extend_earlier_ones(self):
+        # Arrange
+        base = {'define': 'base', 'value': {'color': [1, 0, 0], 'diffuse': 0.7, 'ambient': 0.2}}
+        shiny = {'define': 'shiny', 'extend': 'base', 'value': {'diffuse': 0.3, 'reflective': 0.5}}
+
+        # Act
+        world, _ = scene(base, shiny, {'add': 'sphere', 'material': 'shiny'})
+
+        # Assert
+        material = world.objects[0].material
+        self.assertEqual(material.colour, Colour(1, 0, 0))
+        self.assertEqual((material.diffuse, material.ambient, material.reflective), (0.3, 0.2, 0.5))
+
+    def test_named_patterns_are_shared(self):
+        # Arrange
+        stripes = {'define': 'stripes', 'value': {'type': 'stripes', 'colors': [[1, 1, 1], [0, 0, 0]],
+                                                  'transform': [['scale', 0.25, 1, 1]]}}
+        noisy = {'define': 'noisy', 'value': {'type': 'perturbed', 'pattern': 'stripes', 'octaves': 2}}
+
+        # Act
+        world, _ = scene(stripes, noisy, {'add': 'plane', 'material': {'pattern': 'noisy'}},
+                         {'add': 'sphere', 'material': {'pattern': 'stripes'}})
+
+        # Assert
+        perturbed = world.objects[0].material.pattern
+        self.assertIsInstance(perturbed, PerturbedPattern)
+        self.assertIsInstance(perturbed.pattern, StripePattern)
+        self.assertIs(perturbed.pattern, world.objects[1].material.pattern)
+        self.assertEqual(perturbed.octaves, 2)
+        self.assertEqual(perturbed.transform, Matrix.scaling(0.25, 1, 1))
+
+    def test_cylinder_extents_are_set(self):
+        # Arrange
+        item = {'add': 'cylinder', 'min': -1, 'max': 2, 'closed': True}
+
+        # Act
+        world, _ = scene(item)
+
+        # Assert
+        cylinder = world.objects[0]
+        self.assertIsInstance(cylinder, Cylinder)
+        self.assertEqual((cylinder.minimum, cylinder.maximum, cylinder.closed), (-1, 2, True))
+
+    def test_groups_hold_their_children_under_a_shared_transform(self):
+        # Arrange
+        item = {'add': 'group', 'transform': [['translate', 0, 0, 5]],
+                'children': [{'add': 'plane', 'transform': [['rotate-x', 1.5]]},
+                             {'add': 'group', 'children': [{'add': 'sphere'}]}]}
+
+        # Act
+        world, _ = scene(item)
+
+        # Assert
+        group = world.objects[0]
+        self.assertIsInstance(group, Group)
+        self.assertIsInstance(group.children[0], Plane)
+        self.assertIsInstance(group.children[1].children[0], Sphere)
+        self.assertEqual(group.children[1].children[0].world_to_object, Matrix.translation(0, 0, -5))
+
+    def test_scene_files_are_read_by_their_extension(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, 'scene.json')
+            with open(file_name, 'w') as f:
+                json.dump([CAMERA, {'add': 'sphere'}], f)
+
+            # Act
+            world, camera = load_scene(file_name)
+
+        # Assert
+        self.assertEqual(len(world.objects), 1)
+        self.assertEqual(camera.hsize, 20)
+
+    def test_obj_files_are_found_relative_to_the_scene_file(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, 'models'))
+            with open(os.path.join(directory, 'models', 'square.obj'), 'w') as f:
+                f.write('v -1 1 0\nv -1 0 0\nv 1 0 0\nv 1 1 0\nf 1 2 3 4\n')
+            file_name = os.path.join(directory, 'scene.json')
+            with open(file_name, 'w') as f:
+                json.dump([CAMERA, {'add': 'obj', 'file': 'models/square.obj', 'material': {'color': [1, 0, 0]},
+                                    'transform': [['translate', 0, 0, 2]]}], f)
+
+            # Act
+            world, camera = load_scene(file_name)
+
+        # Assert
+        mesh = world.objects[0]
+        self.assertIsInstance(mesh, Mesh)
+        self.assertEqual(len(mesh), 2)
+        self.assertEqual(mesh.material.colour, Colour(1, 0, 0))
+        self.assertEqual(mesh.world_to_object, Matrix.translation(0, 0, -2))
+
+    def test_unreadable_obj_files_are_reported_against_the_item(self):
+        cases = {
+            'missing file': ('missing.obj', None, 'item 2 (obj) file: cannot read'),
+            'bad vertex': ('bad.obj', 'v 1 2\n', 'item 2 (obj) file: '),
+        }
+        for name, (obj_name, contents, message) in cases.items():
+            with self.subTest(name):
+                # Arrange
+                with tempfile.TemporaryDirectory() as directory:
+                    if contents is not None:
+                        with open(os.path.join(directory, obj_name), 'w') as f:
+                            f.write(contents)
+                    file_name = os.path.join(directory, 'scene.json')
+                    with open(file_name, 'w') as f:
+                        json.dump([CAMERA, {'add': 'obj', 'file': obj_name}], f)
+
+                    # Act
+                    with self.assertRaises(SceneError) as context:
+                        load_scene(file_name)
+
+                # Assert
+                self.assertIn(message, str(context.exception))
+
+    def test_invalid_scenes_are_rejected(self):
+        cases = {
+            'not a list': {'add': 'sphere'},
+            'no camera': [{'add': 'sphere'}],
+            'two cameras': [CAMERA, CAMERA],
+            'unknown item': [CAMERA, {'add': 'teapot'}],
+            'unknown key': [CAMERA, {'add': 'sphere', 'colour': [1, 0, 0]}],
+            'missing key': [CAMERA, {'add': 'light', 'at': [0, 0, 0]}],
+            'undefined material': [CAMERA, {'add': 'sphere', 'material': 'glass'}],
+            'bad material key': [CAMERA, {'add': 'sphere', 'material': {'difuse': 0.5}}],
+            'bad number': [CAMERA, {'add': 'sphere', 'material': {'diffuse': 'high'}}],
+            'bad colour': [CAMERA, {'add': 'sphere', 'material': {'color': [1, 0]}}],
+            'bad transform': [CAMERA, {'add': 'sphere', 'transform': [['translate', 1, 2]]}],
+            'unknown transform': [CAMERA, {'add': 'sphere', 'transform': [['twist', 1]]}],
+            'unknown pattern': [CAMERA, {'add': 'sphere', 'material': {'pattern': {'type': 'plaid'}}}],
+            'extents on a sphere': [CAMERA, {'add': 'sphere', 'min': 0}],
+            'group without children': [CAMERA, {'add': 'group'}],
+            'light in a group': [CAMERA, {'add': 'group', 'children': [{'add': 'light'}]}],
+            'redefinition': [{'define': 'a', 'value': {}}, {'define': 'a', 'value': {}}],
+            'bad extend': [{'define': 'a', 'extend': 'b', 'value': {}}],
+            'self-referencing transform': [{'define': 't', 'value': ['t']}, CAMERA,
+                                           {'add': 'sphere', 'transform': 't'}],
+            'transform cycle': [{'define': 't', 'value': ['u']}, {'define': 'u', 'value': [['scale', 2, 2, 2], 't']},
+                                CAMERA, {'add': 'sphere', 'transform': 't'}],
+            'self-referencing pattern': [{'define': 'p', 'value': {'type': 'perturbed', 'pattern': 'p'}}, CAMERA,
+                                         {'add': 'sphere', 'material': {'pattern': 'p'}}],
+            'obj without a file': [CAMERA, {'add': 'obj'}],
+            'obj file not a name': [CAMERA, {'add': 'obj', 'file': 3}],
+            'zero field of view': [dict(CAMERA, **{'field-of-view': 0})],
+            'negative field of view': [dict(CAMERA, **{'field-of-view': -1})],
+            'field of view of pi': [dict(CAMERA, **{'field-of-view': 3.1416})],
+            'camera looking at itself': [dict(CAMERA, to=CAMERA['from'])],
+            'up along the line of sight': [dict(CAMERA, up=[0, -1, 5])],
+            'zero up vector': [dict(CAMERA, up=[0, 0, 0])],
+            'singular transform': [CAMERA, {'add': 'sphere', 'transform': [['scale', 0, 1, 1]]}],
+            'singular pattern transform': [CAMERA, {'add': 'plane', 'material': {'pattern': {
+                'type': 'stripes', 'colors': [[1, 1, 1], [0, 0, 0]], 'transform': [['scale', 1, 0, 1]]}}}],
+            'singular group transform': [CAMERA, {'add': 'group', 'children': [], 'transform': [['scale', 0, 0, 0]]}],
+        }
+        for name, items in cases.items():
+            with self.subTest(case=name):
+                # Arrange
+                text = json.dumps(items)
+
+                # Act
+                # Assert
+                with self.assertRaises(SceneError):
+                    parse_scene(text, 'json')
+
+    def test_scene_errors_are_value_errors_naming_the_item(self):
+        # Arrange
+        text = json.dumps([CAMERA, {'add': 'sphere'}, {'add': 'cube', 'transform': [['scale', 1]]}])
+
+        # Act
+        with self.assertRaises(ValueError) as context:
+            parse_scene(text, 'json', 'test.json')
+
+        # Assert
+        self.assertIn('test.json: item 3 (cube) transform', str(context.exception))
+
+    def test_a_cycle_of_definitions_names_the_definition(self):
+        # Arrange
+        text = json.dumps([{'define': 't', 'value': ['t']}, CAMERA, {'add': 'sphere', 'transform': 't'}])
+
+        # Act
+        with self.assertRaises(SceneError) as context:
+            parse_scene(text, 'json', 'test.json')
+
+        # Assert
+        self.assertIn("'t' is defined in terms of itself", str(context.exception))
+
+    def test_a_degenerate_camera_names_the_setting_at_fault(self):
+        cases = {
+            'field-of-view': dict(CAMERA, **{'field-of-view': 4}),
+            'to': dict(CAMERA, to=[0, 1, -5]),
+            'up': dict(CAMERA, up=[0, 1, -5]),
+        }
+        for key, camera in cases.items():
+            with self.subTest(key):
+                # Arrange
+                text = json.dumps([camera])
+
+                # Act
+                with self.assertRaises(SceneError) as context:
+                    parse_scene(text, 'json', 'test.json')
+
+                # Assert
+                self.assertIn(f'test.json: item 1 (camera) {key}: expected', str(context.exception))
+
+    def test_a_singular_transform_names_the_object(self):
+        # Arrange
+        text = json.dumps([CAMERA, {'add': 'cube', 'transform': [['scale', 0, 1, 1]]}])
+
+        # Act
+        with self.assertRaises(SceneError) as context:
+            parse_scene(text, 'json', 'test.json')
+
+        # Assert
+        self.assertIn('test.json: item 2 (cube) transform: the transform cannot be inverted', str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
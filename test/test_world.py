@@ -1,13 +1,18 @@
+import threading
 import unittest
+from math import pi
+from camera import Camera
+from transformations import Transformations
 from world import World
 from lights import PointLight
 from primitives import *
 from matrices import Matrix
 from tuples import *
 from colours import Colour
-from rays import Ray
+from rays import Ray, RayBatch
 from intersections import Intersection
 from test_patterns import TestPattern
+from patterns import BlendedPattern, CheckersPattern, RingPattern, StripePattern
 
 
 class WorldTestCase(unittest.TestCase):
@@ -168,6 +173,144 @@ class WorldTestCase(unittest.TestCase):
         # Assert
         self.assertFalse(result)
 
+    def test_the_shadow_cache_remembers_the_last_occluder_for_each_light(self):
+        # Arrange
+        w = World.default_world()
+        w.is_shadowed(Point(10, -10, 10))
+
+        # Act
+        result = w.is_shadowed(Point(10, -9, 10))
+
+        # Assert
+        self.assertTrue(result)
+        self.assertIs(w.shadow_cache.occluder(w.lights[0], w.version()), w.objects[0])
+        self.assertEqual(w.shadow_cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_a_cached_occluder_which_misses_falls_back_to_a_full_query(self):
+        # Arrange
+        w = World.default_world()
+        elsewhere = Sphere()
+        elsewhere.transform = Matrix.translation(50, 0, 0)
+        w.shadow_cache.remember(w.lights[0], elsewhere, w.version())
+
+        # Act
+        result = w.is_shadowed(Point(10, -10, 10))
+
+        # Assert
+        self.assertTrue(result)
+        self.assertIs(w.shadow_cache.occluder(w.lights[0], w.version()), w.objects[0])
+        self.assertEqual(w.shadow_cache.hits, 0)
+
+    def test_the_shadow_cache_forgets_occluders_once_the_world_changes(self):
+        # Arrange
+        w = World.default_world()
+        point = Point(10, -10, 10)
+        w.is_shadowed(point)
+
+        # Act
+        w.objects.pop(0)
+        w.objects[0].transform = Matrix.translation(0, 20, 0)
+        shadowed = w.is_shadowed(point)
+
+        # Assert
+        self.assertFalse(shadowed)
+        self.assertIsNone(w.shadow_cache.occluder(w.lights[0], w.version()))
+
+    def test_the_shadow_cache_tells_equal_lights_apart(self):
+        # Arrange
+        w = World.default_world()
+        first = w.lights[0]
+        second = PointLight(first.position, first.intensity)
+        w.shadow_cache.remember(first, w.objects[0], w.version())
+
+        # Act
+        occluder = w.shadow_cache.occluder(second, w.version())
+
+        # Assert
+        self.assertEqual(first, second)
+        self.assertIsNone(occluder)
+
+    def test_each_thread_remembers_its_own_occluders(self):
+        # Arrange
+        w = World.default_world()
+        w.is_shadowed(Point(10, -10, 10))
+        seen = []
+
+        def shade():
+            seen.append(w.shadow_cache.occluder(w.lights[0], w.version()))
+            w.is_shadowed(Point(10, -10, 10))
+
+        thread = threading.Thread(target=shade)
+
+        # Act
+        thread.start()
+        thread.join()
+
+        # Assert
+        self.assertEqual(seen, [None])
+        self.assertEqual(w.shadow_cache.stats(), {'hits': 0, 'misses': 2, 'hit_rate': 0.0})
+
+    def test_the_shadow_cache_keeps_the_counts_of_finished_threads_without_keeping_the_threads(self):
+        # Arrange
+        w = World.default_world()
+
+        def shade():
+            w.is_shadowed(Point(10, -10, 10))
+            w.is_shadowed(Point(10, -10, 10))
+
+        # Act
+        for _ in range(5):
+            thread = threading.Thread(target=shade)
+            thread.start()
+            thread.join()
+        w.is_shadowed(Point(10, -10, 10))
+
+        # Assert
+        self.assertEqual(len(w.shadow_cache._counts), 1)
+        self.assertEqual(w.shadow_cache.stats(), {'hits': 5, 'misses': 6, 'hit_rate': 5 / 11})
+
+    def test_rendering_with_the_shadow_cache_matches_rendering_without_it(self):
+        # Arrange
+        w = World.default_world()
+        floor = Plane()
+        floor.transform = Matrix.translation(0, -1, 0)
+        w.objects.append(floor)
+        c = Camera(20, 10, pi / 2)
+        c.transform = Transformations.view_transform(Point(0, 3, -5), Point(0, 0, 0), Vector(0, 1, 0))
+        cached = c.render(w)
+
+        # Act
+        w.shadow_cache = None
+        uncached = c.render(w)
+
+        # Assert
+        self.assertEqual(cached.get_image_data(), uncached.get_image_data())
+
+    def test_objects_which_do_not_cast_shadows_do_not_occlude_the_light(self):
+        # Arrange
+        w = World.default_world()
+        for obj in w.objects:
+            obj.material.casts_shadow = False
+        point = Point(10, -10, 10)
+
+        # Act
+        result = w.occluded(point, w.lights[0])
+
+        # Assert
+        self.assertFalse(result)
+
+    def test_a_shadow_caster_behind_a_non_shadow_caster_still_occludes_the_light(self):
+        # Arrange
+        w = World.default_world()
+        w.objects[0].material.casts_shadow = False
+        point = Point(10, -10, 10)
+
+        # Act
+        result = w.occluded(point, w.lights[0])
+
+        # Assert
+        self.assertTrue(result)
+
     def test_when_shade_hit_is_given_an_intersection_in_shadow(self):
         # Arrange
         w = World()
@@ -401,6 +544,278 @@ class WorldTestCase(unittest.TestCase):
         # Assert
         self.assertEqual(colour, expected)
 
+    def test_intersecting_a_prepared_world_matches_testing_every_object(self):
+        # Arrange
+        w = World()
+        for i in range(12):
+            s = Sphere() if i % 2 == 0 else Cube()
+            s.transform = Matrix.translation(i - 6, (i % 3) - 1, i % 4) * Matrix.scaling(0.4, 0.4, 0.4)
+            w.objects.append(s)
+        w.objects.append(Plane())
+        ray = Ray(Point(-8, 0, 0.5), Vector(1, 0.01, 0.02).normalise())
+        expected = [(i.t, i.object) for i in w.intersect_world(ray)]
+
+        # Act
+        w.prepare()
+        result = [(i.t, i.object) for i in w.intersect_world(ray)]
+
+        # Assert
+        self.assertEqual(result, expected)
+
+    def test_the_hierarchy_is_rebuilt_when_a_transform_changes(self):
+        # Arrange
+        w = World.default_world()
+        w.prepare()
+        ray = Ray(Point(5, 0, -5), Vector(0, 0, 1))
+
+        # Act
+        w.objects[1].transform = Matrix.translation(5, 0, 0)
+        w.prepare()
+        xs = w.intersect_world(ray)
+
+        # Assert
+        self.assertEqual(len(xs), 2)
+        self.assertEqual(xs[0].object, w.objects[1])
+
+    def test_a_prepared_world_sees_objects_added_after_preparation(self):
+        # Arrange
+        w = World.default_world()
+        w.prepare()
+        s = Sphere()
+        s.transform = Matrix.translation(0, 0, 5)
+        ray = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+
+        # Act
+        w.objects.append(s)
+        xs = w.intersect_world(ray)
+
+        # Assert
+        self.assertEqual(len(xs), 6)
+        self.assertEqual(xs[-1].object, s)
+
+    def test_a_prepared_world_sees_objects_moved_after_preparation(self):
+        # Arrange
+        w = World.default_world()
+        w.prepare()
+        ray = Ray(Point(5, 0, -5), Vector(0, 0, 1))
+
+        # Act
+        w.objects[1].transform = Matrix.translation(5, 0, 0)
+        xs = w.intersect_world(ray)
+
+        # Assert
+        self.assertEqual([x.object for x in xs], [w.objects[1], w.objects[1]])
+
+    def test_a_prepared_world_sees_a_replaced_object_list(self):
+        # Arrange
+        w = World.default_world()
+        w.prepare()
+        s = Sphere()
+        s.transform = Matrix.translation(5, 0, 0)
+        ray = Ray(Point(5, 0, -5), Vector(0, 0, 1))
+
+        # Act
+        w.objects = [s]
+        xs = w.intersect_world(ray)
+        del w.objects[0]
+        after_removal = w.intersect_world(ray)
+
+        # Assert
+        self.assertEqual([x.object for x in xs], [s, s])
+        self.assertEqual(after_removal, [])
+
+    def test_finding_the_nearest_hits_of_a_ray_batch(self):
+        # Arrange
+        w = World.default_world()
+        batch = RayBatch.from_rays([Ray(Point(0, 0, -5), Vector(0, 0, 1)),
+                                    Ray(Point(0, 0, 0), Vector(0, 0, 1)),
+                                    Ray(Point(0, 5, -5), Vector(0, 0, 1))])
+
+        # Act
+        t, index = w.hit_batch(batch)
+
+        # Assert
+        self.assertListEqual(t.tolist(), [4, 0.5, float('inf')])
+        self.assertListEqual(index.tolist(), [0, 1, -1])
+
+    def test_a_prepared_world_finds_the_same_nearest_hits_of_a_batch(self):
+        # Arrange
+        w = World.default_world()
+        for x in range(-3, 4):
+            s = Sphere()
+            s.transform = Matrix.translation(x * 3, 0, 4)
+            w.objects.append(s)
+        rays = [Ray(Point(x / 2, 0, -5), Vector(0, 0, 1)) for x in range(-20, 21)]
+        batch = RayBatch.from_rays(rays)
+        t, index = w.hit_batch(batch)
+
+        # Act
+        w.prepare()
+        prepared_t, prepared_index = w.hit_batch(batch)
+
+        # Assert
+        self.assertListEqual(prepared_t.tolist(), t.tolist())
+        self.assertListEqual(prepared_index.tolist(), index.tolist())
+
+    def test_a_batch_leaves_only_the_nearest_object_to_test_where_it_is_certain(self):
+        # Arrange
+        w = World()
+        ball = Sphere()
+        glass = Sphere()
+        glass.transform = Matrix.translation(3, 0, 0)
+        glass.material.transparency = 0.5
+        floor = Plane()
+        twin = Plane()
+        group = Group([Sphere()])
+        group.transform = Matrix.translation(-3, 0, 0)
+        w.objects.extend([ball, glass, floor, twin, group])
+        w.prepare()
+        batch = RayBatch.from_rays([Ray(Point(0, 0.5, -5), Vector(0, 0, 1)),
+                                    Ray(Point(3, 0.5, -5), Vector(0, 0, 1)),
+                                    Ray(Point(1.5, 5, 0), Vector(0, -1, 0)),
+                                    Ray(Point(-3, 0.5, -5), Vector(0, 0, 1)),
+                                    Ray(Point(0, 5, -5), Vector(0, 1, 0))])
+
+        # Act
+        objects = w.nearest_objects(batch)
+
+        # Assert
+        # The group has no vectorised intersection, so it is tested by every ray crossing its leaf of the hierarchy,
+        # which with so few objects is the only leaf
+        self.assertEqual(objects, [[ball, group], None, None, [group], []])
+
+    def test_colours_for_many_rays_match_colours_for_one_ray_at_a_time(self):
+        # Arrange
+        w = World.default_world()
+        w.objects[0].material.pattern = StripePattern(Colour(1, 0, 0), Colour(0, 0, 1))
+        w.objects[0].material.reflective = 0.3
+        floor = Plane()
+        floor.material.pattern = CheckersPattern(Colour(1, 1, 1), Colour(0, 0, 0))
+        ball = Sphere()
+        ball.material.pattern = BlendedPattern(StripePattern(Colour(1, 1, 1), Colour(0, 1, 0)),
+                                               RingPattern(Colour(0, 0, 0), Colour(1, 1, 0)))
+        group = Group([floor, ball])
+        group.transform = Matrix.translation(0, -1, 0)
+        ball.transform = Matrix.translation(2, 1, 0)
+        w.objects.append(group)
+        glass = Sphere()
+        glass.transform = Matrix.translation(-2.5, 0, 0)
+        glass.material.transparency = 0.9
+        glass.material.refractive_index = 1.5
+        cube = Cube()
+        cube.transform = Matrix.translation(2.5, 0, 3)
+        # A second floor in the same place, so which one is hit comes down to their order
+        twin = Plane()
+        twin.transform = Matrix.translation(0, -1, 0)
+        w.objects.extend([glass, cube, twin])
+        rays = [Ray(Point(x / 4, 0.5, -5), Vector(0, -0.2, 1).normalise()) for x in range(-16, 17)]
+        rays.append(Ray(Point(0, 5, -5), Vector(0, 1, 0)))
+        expected = [w.colour_at(ray) for ray in rays]
+
+        for prepared in (False, True):
+            with self.subTest(prepared=prepared):
+                if prepared:
+                    w.prepare()
+
+                # Act
+                colours = w.colours_at(rays)
+                batched = w.colours_at(RayBatch.from_rays(rays))
+
+                # Assert
+                self.assertEqual(colours, expected)
+                self.assertEqual(batched, expected)
+
+    def test_a_material_made_transparent_after_preparation_is_refracted(self):
+        # A ray leaving the outer sphere from inside, where n1 comes from the sphere it starts in
+        r = Ray(Point(0, 0, 0.75), Vector(0, 0, 1))
+        for grouped in (False, True):
+            with self.subTest(grouped=grouped):
+                # Arrange
+                w = World.default_world()
+                outer = w.objects[0]
+                if grouped:
+                    w.objects[0] = Group([outer])
+                w.prepare()
+                outer.material.transparency = 0.5
+                outer.material.reflective = 0.5
+                outer.material.refractive_index = 1.5
+                xs = w.intersect_world(r)
+                comps = xs[3].prepare_computations(r, xs)
+
+                # Act
+                c = w.colour_at(r)
+
+                # Assert
+                self.assertEqual((comps.n1, comps.n2), (1.5, 1))
+                self.assertEqual(c, w.shade_hit(comps))
+
+    def test_the_colour_of_an_opaque_world_is_unchanged_by_preparation(self):
+        # Arrange
+        w = World.default_world()
+        r = Ray(Point(0, 0, -5), Vector(0, 0, 1))
+        expected = w.colour_at(r)
+
+        # Act
+        w.prepare()
+        c = w.colour_at(r)
+
+        # Assert
+        self.assertEqual(c, expected)
+
+    def test_shapes_in_a_group_which_dont_cast_shadows_are_ignored(self):
+        # Arrange
+        w = World.default_world()
+        s = Sphere()
+        s.transform = Matrix.translation(-5, 5, -5)
+        s.material.casts_shadow = False
+        w.objects.append(Group([s]))
+        p = Point(0, 1.1, 0)
+
+        # Act
+        shadowed = w.is_shadowed(p)
+
+        # Assert
+        self.assertFalse(shadowed)
+
+    def test_the_hierarchy_is_rebuilt_when_a_groups_child_moves(self):
+        # Arrange
+        w = World()
+        s = Sphere()
+        w.objects.append(Group([s]))
+        w.prepare()
+        ray = Ray(Point(5, 0, -5), Vector(0, 0, 1))
+
+        # Act
+        s.transform = Matrix.translation(5, 0, 0)
+        w.prepare()
+        xs = w.intersect_world(ray)
+
+        # Assert
+        self.assertEqual([x.object for x in xs], [s, s])
+
+    def test_the_hierarchy_is_rebuilt_when_a_cylinders_extents_change(self):
+        # Arrange
+        loose = Cylinder()
+        grouped = Cylinder()
+        grouped.transform = Matrix.translation(5, 0, 0)
+        w = World()
+        w.objects.extend([loose, Group([grouped])])
+        for c in (loose, grouped):
+            c.minimum = -1
+            c.maximum = 1
+        w.prepare()
+        rays = [(loose, Ray(Point(0, 1.5, -5), Vector(0, 0, 1))), (grouped, Ray(Point(5, 1.5, -5), Vector(0, 0, 1)))]
+
+        # Act
+        for c in (loose, grouped):
+            c.maximum = 2
+        w.prepare()
+
+        # Assert
+        for c, ray in rays:
+            xs = w.intersect_world(ray)
+            self.assertEqual([(x.t, x.object) for x in xs], [(4, c), (6, c)])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,18 +1,32 @@
 import numpy as np
-from math import fabs
+from math import fabs, sqrt
 
 
 class Tuple:
+    # Components are stored as plain numbers; the NumPy array, magnitude and normal are only built when asked for
+    __slots__ = ('x', 'y', 'z', 'w')
+
     def __init__(self, x, y, z, w):
         self.x = x
         self.y = y
         self.z = z
         self.w = w
-        self.vec = np.array([x, y, z, w])
-        self.is_point = w == 1.0
-        self.is_vector = w == 0.0
-        self.mag = np.linalg.norm(self.vec)
-        self.norm = self.vec / self.mag if self.mag != 0 else float('inf')
+
+    @property
+    def vec(self):
+        return np.array([self.x, self.y, self.z, self.w])
+
+    @property
+    def is_point(self):
+        return self.w == 1.0
+
+    @property
+    def is_vector(self):
+        return self.w == 0.0
+
+    @property
+    def mag(self):
+        return sqrt(self.x * self.x + self.y * self.y + self.z * self.z + self.w * self.w)
 
     def __eq__(self, other, epsilon=0.00001):
         return fabs(self.x - other.x) < epsilon and \
@@ -21,30 +35,36 @@ class Tuple:
             fabs(self.w - other.w) < epsilon
 
     def __add__(self, other):
-        return Tuple(*(self.vec + other.vec))
+        return Tuple(self.x + other.x, self.y + other.y, self.z + other.z, self.w + other.w)
 
     def __sub__(self, other):
-        return Tuple(*(self.vec - other.vec))
+        return Tuple(self.x - other.x, self.y - other.y, self.z - other.z, self.w - other.w)
 
     def __neg__(self):
-        return Tuple(*(np.zeros(4) - self.vec))
+        return Tuple(-self.x, -self.y, -self.z, -self.w)
 
     def __mul__(self, other):
-        return Tuple(*(other * self.vec))
+        return Tuple(self.x * other, self.y * other, self.z * other, self.w * other)
 
     def __truediv__(self, other):
-        return Tuple(*(self.vec / other))
+        return Tuple(self.x / other, self.y / other, self.z / other, self.w / other)
 
     def normalise(self):
-        return self.norm
+        mag = self.mag
+        return Tuple(self.x / mag, self.y / mag, self.z / mag, self.w / mag)
 
     def dot(self, other):
-        return np.dot(self.vec, other.vec)
+        return self.x * other.x + self.y * other.y + self.z * other.z + self.w * other.w
 
 
 class Point(Tuple):
+    __slots__ = ()
+
     def __init__(self, x, y, z):
-        Tuple.__init__(self, x, y, z, 1.0)
+        self.x = x
+        self.y = y
+        self.z = z
+        self.w = 1.0
 
     @classmethod
     def from_tuple(cls, in_tuple):
@@ -52,26 +72,33 @@ class Point(Tuple):
 
 
 class Vector(Tuple):
+    __slots__ = ()
+
     def __init__(self, x, y, z):
-        Tuple.__init__(self, x, y, z, 0.0)
+        self.x = x
+        self.y = y
+        self.z = z
+        self.w = 0.0
 
     def __mul__(self, other):
-        return Vector(*(self.vec[:3] * other))
+        return Vector(self.x * other, self.y * other, self.z * other)
 
     def __rmul__(self, other):
-        return Vector(*(self.vec[:3] * other))
+        return Vector(self.x * other, self.y * other, self.z * other)
 
     @classmethod
     def from_tuple(cls, in_tuple):
         return cls(in_tuple.x, in_tuple.y, in_tuple.z)
 
     def normalise(self):
-        return Vector(self.norm[0], self.norm[1], self.norm[2])
+        mag = self.mag
+        return Vector(self.x / mag, self.y / mag, self.z / mag)
 
     def cross(self, other):
-        cross_tuple = np.cross(self.vec[:3], other.vec[:3])
-        return Vector(cross_tuple[0], cross_tuple[1], cross_tuple[2])
+        return Vector(self.y * other.z - self.z * other.y,
+                      self.z * other.x - self.x * other.z,
+                      self.x * other.y - self.y * other.x)
 
     def reflect(self, normal):
-        refl = self - normal * 2 * self.dot(normal)
-        return Vector.from_tuple(refl)
+        scale = 2 * self.dot(normal)
+        return Vector(self.x - normal.x * scale, self.y - normal.y * scale, self.z - normal.z * scale)
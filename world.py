@@ -1,31 +1,284 @@
-from primitives import Sphere
+from primitives import Shape, Sphere
 from colours import Colour
 from matrices import Matrix
 from lights import PointLight
 from tuples import *
-from rays import Ray
-from intersections import Intersection
+from rays import Ray, RayBatch
+from intersections import Intersection, IntersectionBuffer
+from bvh import BVH
 from math import sqrt
+import threading
+import numpy as np
+
+
+class ShadowCache:
+    """Remembers the last object found blocking each light.
+
+    Neighbouring shading points tend to be shadowed by the same object, so it is tested first for the next shadow ray
+    to that light before falling back to a full query. Each thread remembers its own occluders, since the points it
+    shades neighbour each other rather than another thread's, and the statistics total every thread's lookups."""
+
+    def __init__(self):
+        self._local = threading.local()
+        # The hits and misses of each thread with state, and the totals of threads which have since finished
+        self._counts = {}
+        self._finished = [0, 0]
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Thread-local state can't be pickled, and a copy in another process starts afresh
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def _thread(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            state = self._local.state = _ShadowState()
+            with self._lock:
+                self._fold_finished()
+                self._counts[threading.current_thread()] = state.counts
+            return state
+
+    def _fold_finished(self):
+        # Every render in new threads would otherwise leave another entry behind
+        for thread in [thread for thread in self._counts if not thread.is_alive()]:
+            counts = self._counts.pop(thread)
+            self._finished[0] += counts[0]
+            self._finished[1] += counts[1]
+
+    def _totals(self):
+        with self._lock:
+            self._fold_finished()
+            return [sum(column) for column in zip(self._finished, *self._counts.values())]
+
+    @property
+    def hits(self):
+        return self._totals()[0]
+
+    @property
+    def misses(self):
+        return self._totals()[1]
+
+    def occluder(self, light, version):
+        # The object this thread last found blocking light, unless the world's version has changed since, as the
+        # object may have moved or left the world
+        entry = self._occluders(version).get(id(light))
+        return None if entry is None else entry[1]
+
+    def remember(self, light, occluder, version):
+        # Lights compare by value and so can't be dictionary keys. Each entry holds its light, which keeps the light's
+        # id from being reused by another while the entry exists.
+        self._occluders(version)[id(light)] = (light, occluder)
+
+    def _occluders(self, version):
+        state = self._thread()
+        if state.version != version:
+            state.occluders.clear()
+            state.version = version
+        return state.occluders
+
+    def reset(self):
+        # Forgets this thread's occluders but keeps the statistics
+        self._thread().occluders.clear()
+
+    def record_hit(self):
+        self._thread().counts[0] += 1
+
+    def record_miss(self):
+        self._thread().counts[1] += 1
+
+    def stats(self):
+        hits, misses = self._totals()
+        lookups = hits + misses
+        return {'hits': hits, 'misses': lookups - hits, 'hit_rate': hits / lookups if lookups else 0.0}
+
+
+class _ShadowState:
+    __slots__ = ('occluders', 'version', 'counts')
+
+    def __init__(self):
+        self.occluders = {}
+        # The world version the occluders were found in
+        self.version = None
+        # Hits and misses
+        self.counts = [0, 0]
+
+
+class _ObjectList(list):
+    # A world's objects, counting the edits made to the list so the world can tell when its hierarchy is out of date
+    edits = 0
+
+
+def _counting(name):
+    method = getattr(list, name)
+
+    def edit(self, *args, **kwargs):
+        self.edits += 1
+        return method(self, *args, **kwargs)
+    return edit
+
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse', '__setitem__', '__delitem__',
+              '__iadd__', '__imul__'):
+    setattr(_ObjectList, _name, _counting(_name))
 
 
 class World:
+    EPSILON = 0.00001
+
     def __init__(self):
-        self.objects = []
+        self._objects = _ObjectList()
         self.lights = []
+        self._bvh = None
+        self._bvh_version = None
+        self._unbounded = []
+        self.shadow_cache = ShadowCache()
+
+    def __setstate__(self, state):
+        # A copy in another process has its own count of shape changes, and its hierarchy is as current as the
+        # original's was
+        self.__dict__.update(state)
+        if self._bvh is not None and self._bvh_version is not None:
+            self._bvh_version = self.version()
+
+    def __fingerprint__(self):
+        # Attributes describing the scene for progressive.scene_fingerprint, without the hierarchy and caches built
+        # from it
+        state = vars(self).copy()
+        for name in ('_bvh', '_bvh_version', '_unbounded', 'shadow_cache'):
+            del state[name]
+        return state
+
+    @property
+    def objects(self):
+        return self._objects
+
+    @objects.setter
+    def objects(self, value):
+        objects = _ObjectList(value)
+        objects.edits = self._objects.edits + 1
+        self._objects = objects
+
+    def version(self):
+        # Changes whenever the object list is edited or any shape's transform or bounds change
+        return self._objects.edits, Shape.changes
+
+    def prepare(self):
+        # Called once per frame by Camera.render so the hierarchy is in place before the first ray. Once built, it is
+        # rebuilt by whichever query first finds the world has changed.
+        if self._bvh is None or self._bvh_version != self.version():
+            self.build_bvh()
+
+    def build_bvh(self):
+        version = self.version()
+        lower = []
+        upper = []
+        bounded = []
+        unbounded = []
+        for index, obj in enumerate(self.objects):
+            box = obj.world_bounds()
+            if box.is_finite:
+                # Pad the box slightly so grazing hits are never lost to rounding in the box test
+                lower.append((box.minimum.x - self.EPSILON, box.minimum.y - self.EPSILON, box.minimum.z - self.EPSILON))
+                upper.append((box.maximum.x + self.EPSILON, box.maximum.y + self.EPSILON, box.maximum.z + self.EPSILON))
+                bounded.append(index)
+            else:
+                unbounded.append(index)
+        self._unbounded = unbounded
+        self._bvh = BVH(lower, upper, bounded)
+        self._bvh_version = version
+
+    def candidates(self, ray):
+        # Objects the ray could intersect, in their original order so equal t values sort exactly as they would
+        # without the hierarchy
+        if self._bvh is None:
+            return self.objects
+        if self._bvh_version != self.version():
+            self.build_bvh()
+        indices = self._unbounded + self._bvh.candidates(ray)
+        indices.sort()
+        return [self.objects[i] for i in indices]
 
     def intersect_world(self, ray):
-        intersections = []
-        for obj in self.objects:
-            intersections.append(obj.intersects(ray))
-        flattened_intersections = World.flatten(intersections)
-        return sorted(flattened_intersections, key=lambda x: x.t)
+        return self.intersect_world_into(ray, IntersectionBuffer.for_thread()).intersections()
+
+    def intersect_world_into(self, ray, buffer):
+        buffer.clear()
+        for obj in self.candidates(ray):
+            obj.intersects_into(ray, buffer)
+        return buffer
+
+    def batch_candidates(self, ray_batch):
+        # (object index, indices of the rays in the batch which could hit it) pairs in the order of the objects, the
+        # rays being chosen by the hierarchy once the world is prepared
+        everything = np.arange(len(ray_batch))
+        if self._bvh is None:
+            return [(i, everything) for i in range(len(self.objects))]
+        if self._bvh_version != self.version():
+            self.build_bvh()
+        candidates = [(i, everything) for i in self._unbounded]
+        candidates.extend(self._bvh.candidates_batch(ray_batch.origins, ray_batch.directions).items())
+        candidates.sort(key=lambda pair: pair[0])
+        return candidates
+
+    def hit_batch(self, ray_batch):
+        # Nearest non-negative intersection for every ray in the batch, as (t, object index) arrays. Rays which hit
+        # nothing have t of inf and an index of -1.
+        nearest, index, _ = self.nearest_batch(ray_batch, self.batch_candidates(ray_batch))
+        return nearest, index
+
+    def nearest_batch(self, ray_batch, candidates):
+        # The nearest non-negative t of every ray among the candidate objects, the index of the object it belongs to
+        # and the nearest t of any other object. Objects are taken in order, so the earliest of equal hits is kept.
+        count = len(ray_batch)
+        nearest = np.full(count, np.inf)
+        second = np.full(count, np.inf)
+        index = np.full(count, -1)
+        for i, rays in candidates:
+            t, mask = self.objects[i].intersects_batch(ray_batch.select(rays))
+            t = np.where(mask & (t >= 0), t, np.inf).min(axis=1, initial=np.inf)
+            previous = nearest[rays]
+            closer = t < previous
+            second[rays] = np.where(closer, previous, np.minimum(second[rays], t))
+            nearest[rays[closer]] = t[closer]
+            index[rays[closer]] = i
+        return nearest, index, second
+
+    def nearest_objects(self, ray_batch):
+        # The objects hit_computations needs to test for each ray in the batch, in the order of the world's objects: the
+        # nearest the batch test finds, along with any the ray could reach which have no vectorised intersection, or
+        # None to leave the ray to the hierarchy. That is done where the nearest hit is transparent, as its refractive
+        # indices depend on the other intersections, or where a second object is hit within EPSILON of the nearest, so
+        # rounding could change which of them the scalar test finds first.
+        unbatched = [[] for _ in range(len(ray_batch))]
+        vectorised = []
+        for i, rays in self.batch_candidates(ray_batch):
+            if type(self.objects[i]).local_intersect_batch is Shape.local_intersect_batch:
+                for ray in rays.tolist():
+                    unbatched[ray].append(i)
+            else:
+                vectorised.append((i, rays))
+        nearest, index, second = self.nearest_batch(ray_batch, vectorised)
+        with np.errstate(invalid='ignore'):
+            unsure = (second - nearest <= self.EPSILON).tolist()
+        objects = self.objects
+        result = []
+        for ray_unsure, i, others in zip(unsure, index.tolist(), unbatched):
+            if ray_unsure or (i >= 0 and objects[i].material.transparency != 0):
+                result.append(None)
+            else:
+                result.append([objects[j] for j in sorted(others + [i] if i >= 0 else others)])
+        return result
 
     def shade_hit(self, comps, remaining=5):
         base_colour = Colour(0, 0, 0)
         for light in self.lights:
             shadowed = self.is_shadowed(comps.over_point, light)
             base_colour += comps.object.material.lighting(comps.object, light, comps.over_point, comps.eye_vector,
-                                                          comps.normal_vector, shadowed)
+                                                          comps.normal_vector, shadowed, comps.surface_colour)
             reflected = self.reflected_colour(comps, remaining)
             refracted = self.refracted_colour(comps, remaining)
             material = comps.object.material
@@ -37,31 +290,103 @@ class World:
         return base_colour
 
     def colour_at(self, ray, remaining=5):
-        intersections = self.intersect_world(ray)
-        hits = [i for i in intersections if i.t >= 0]
-        if len(hits) == 0:
+        comps = self.hit_computations(ray)
+        if comps is None:
             return Colour(0, 0, 0)
+        return self.shade_hit(comps, remaining)
+
+    def colours_at(self, rays, remaining=5):
+        # colour_at for many rays, such as a tile's primary rays. A RayBatch is intersected with each object it could
+        # reach in one call, leaving only the nearest object to test ray by ray. Every hit is prepared before any is
+        # shaded, so each patterned shape has its colours looked up in one pattern_at_shape_batch call rather than
+        # one pattern_at_shape call per hit.
+        if isinstance(rays, RayBatch):
+            hits = [self.hit_computations(ray, objects) for ray, objects in zip(rays, self.nearest_objects(rays))]
+        else:
+            hits = [self.hit_computations(ray) for ray in rays]
+        patterned = {}
+        for comps in hits:
+            if comps is not None and comps.object.material.pattern is not None:
+                patterned.setdefault(id(comps.object), []).append(comps)
+        for group in patterned.values():
+            obj = group[0].object
+            points = [(comps.over_point.x, comps.over_point.y, comps.over_point.z) for comps in group]
+            colours = obj.material.pattern.pattern_at_shape_batch(obj, points)
+            for comps, (red, green, blue) in zip(group, colours.tolist()):
+                comps.surface_colour = Colour(red, green, blue)
+        return [Colour(0, 0, 0) if comps is None else self.shade_hit(comps, remaining) for comps in hits]
+
+    def hit_computations(self, ray, objects=None):
+        # The prepared computations for the ray's hit, or None if it hits nothing. objects limits the test to the
+        # given objects, as nearest_objects finds them, in place of those the hierarchy chooses.
+        buffer = IntersectionBuffer.for_thread()
+        if objects is not None:
+            buffer.clear()
+            for obj in objects:
+                obj.intersects_into(ray, buffer)
+            index = buffer.hit()
+            if (index is None and objects) or (index is not None and buffer.objects[index].material.transparency != 0):
+                # The scalar test misses a hit the batch test found, or the hit needs the other intersections, so the
+                # ray gets the full test after all
+                objects = None
+        if objects is None:
+            self.intersect_world_into(ray, buffer)
+        index = buffer.hit()
+        if index is None:
+            return None
+        elif buffer.objects[index].material.transparency == 0:
+            # Refractive indices are only needed where a transparent material is hit, so neither are the other
+            # intersections
+            return buffer.intersection(index).prepare_computations(ray)
         else:
-            hit = min(hits)
-            comps = hit.prepare_computations(ray, intersections)
-            return self.shade_hit(comps, remaining)
+            # Only intersections up to the hit can change the refractive indices either side of it, so the rest are
+            # neither sorted nor turned into Intersection objects
+            order = buffer.sorted_indices(buffer.t[index] + self.EPSILON)
+            intersections = [buffer.intersection(i) for i in order]
+            return intersections[order.index(index)].prepare_computations(ray, intersections)
 
     def is_shadowed(self, point, light=None):
         if light is None:
             light = self.lights[0]
+        return self.occluded(point, light)
 
+    def occluded(self, point, light):
+        # Any-hit query: true as soon as one shadow-casting object lies between the point and the light. Objects which
+        # don't cast shadows are skipped without being intersected.
         v = Vector.from_tuple(light.position - point)
         distance = v.mag
-        direction = v.normalise()
+        r = Ray(point, v.normalise())
 
-        r = Ray(point, direction)
-        intersections = self.intersect_world(r)
+        buffer = IntersectionBuffer.for_thread()
+        cache = self.shadow_cache
+        occluder = None
+        if cache is not None:
+            version = self.version()
+            occluder = cache.occluder(light, version)
+            if occluder is not None and occluder.material.casts_shadow and self.blocks(occluder, r, distance, buffer):
+                cache.record_hit()
+                return True
+            cache.record_miss()
 
-        h = Intersection.hit(intersections)
-        if h is not None and h.t < distance and h.object.material.casts_shadow:
-            return True
-        else:
-            return False
+        # The cached occluder has already been tested, so it is skipped in the full query
+        for obj in self.candidates(r):
+            if obj is occluder or not obj.material.casts_shadow:
+                continue
+            if self.blocks(obj, r, distance, buffer):
+                if cache is not None:
+                    cache.remember(light, obj, self.version())
+                return True
+        return False
+
+    @staticmethod
+    def blocks(obj, ray, distance, buffer):
+        # The hit object is checked as well as obj, since a group may hold shapes which don't cast shadows
+        buffer.clear()
+        obj.intersects_into(ray, buffer)
+        for i in range(buffer.count):
+            if 0 <= buffer.t[i] < distance and buffer.objects[i].material.casts_shadow:
+                return True
+        return False
 
     def reflected_colour(self, comps, remaining=5):
         if comps.object.material.reflective == 0 or remaining < 1: